@@ -1,11 +1,37 @@
 from __future__ import annotations
 
+import asyncio
+import logging
 import os
+import threading
+import time
+from collections import OrderedDict
 from dataclasses import dataclass
+from typing import Any
 
 import httpx
+import jwt
 from fastapi import Header, HTTPException
 
+# Access tokens are verified locally when the project's signing key is known:
+# SUPABASE_JWT_SECRET for HS256 projects, otherwise the project's JWKS for
+# asymmetric signing keys. Tokens that cannot be checked locally (no secret,
+# unknown key id, JWKS unreachable) go to the Auth API unless
+# AUTH_REMOTE_FALLBACK=0; AUTH_TOKEN_VERIFICATION=remote always uses the API.
+#
+# Verified tokens are cached until min(exp, now + AUTH_TOKEN_CACHE_TTL_SECONDS),
+# except in remote mode, which asks the API on every request so revoked
+# sessions are rejected immediately.
+# Local checks cannot see server-side revocation, so a token stays usable until
+# it expires even after the session is signed out elsewhere; /auth/logout
+# evicts the caller's own token.
+
+logger = logging.getLogger("connected")
+
+_CLOCK_SKEW_SECONDS = 10
+_ASYMMETRIC_ALGS = {"RS256", "ES256", "EdDSA"}
+_JWKS_RETRY_SECONDS = 60
+
 
 @dataclass
 class AuthenticatedUser:
@@ -14,6 +40,16 @@ class AuthenticatedUser:
   access_token: str
 
 
+def _env_int(name: str, default: int) -> int:
+  raw = os.getenv(name)
+  if raw is None or raw == "":
+    return default
+  try:
+    return int(raw)
+  except Exception:
+    return default
+
+
 def _get_supabase_auth_base_url() -> str:
   url = os.getenv("SUPABASE_URL")
   if not url:
@@ -37,22 +73,7 @@ def _extract_bearer_token(authorization: str | None) -> str:
   return parts[1].strip()
 
 
-def get_current_user(authorization: str | None = Header(default=None)) -> AuthenticatedUser:
-  token = _extract_bearer_token(authorization)
-
-  base = _get_supabase_auth_base_url()
-  anon_key = _get_supabase_anon_key()
-
-  # Verify token via Supabase Auth API
-  with httpx.Client(timeout=15) as client:
-    resp = client.get(
-      f"{base}/auth/v1/user",
-      headers={
-        "Authorization": f"Bearer {token}",
-        "apikey": anon_key,
-      },
-    )
-
+def _user_from_response(resp: httpx.Response, token: str) -> AuthenticatedUser:
   if resp.status_code != 200:
     raise HTTPException(status_code=401, detail="Invalid or expired token")
 
@@ -62,3 +83,234 @@ def get_current_user(authorization: str | None = Header(default=None)) -> Authen
     raise HTTPException(status_code=401, detail="Invalid token payload")
 
   return AuthenticatedUser(id=user_id, email=data.get("email"), access_token=token)
+
+
+class _TokenCache:
+  # LRU of verified tokens; each entry expires with its token.
+  def __init__(self) -> None:
+    self._entries: OrderedDict[str, tuple[AuthenticatedUser, float]] = OrderedDict()
+    self._lock = threading.Lock()
+
+  def get(self, token: str) -> AuthenticatedUser | None:
+    now = time.time()
+    with self._lock:
+      entry = self._entries.get(token)
+      if entry is None:
+        return None
+      user, expires_at = entry
+      if expires_at <= now:
+        del self._entries[token]
+        return None
+      self._entries.move_to_end(token)
+      return user
+
+  def put(self, token: str, user: AuthenticatedUser, expires_at: float) -> None:
+    max_size = _env_int("AUTH_TOKEN_CACHE_SIZE", 1024)
+    if max_size <= 0 or expires_at <= time.time():
+      return
+    with self._lock:
+      self._entries[token] = (user, expires_at)
+      self._entries.move_to_end(token)
+      while len(self._entries) > max_size:
+        self._entries.popitem(last=False)
+
+  def discard(self, token: str) -> None:
+    with self._lock:
+      self._entries.pop(token, None)
+
+  def clear(self) -> None:
+    with self._lock:
+      self._entries.clear()
+
+
+_token_cache = _TokenCache()
+
+
+def forget_token(token: str) -> None:
+  _token_cache.discard(token)
+
+
+def _remember(token: str, user: AuthenticatedUser, exp: Any) -> AuthenticatedUser:
+  # Entries never outlive the token; tokens without exp are not cached.
+  if isinstance(exp, (int, float)):
+    ttl = max(0, _env_int("AUTH_TOKEN_CACHE_TTL_SECONDS", 300))
+    _token_cache.put(token, user, min(float(exp), time.time() + ttl))
+  return user
+
+
+def _verification_mode() -> str:
+  mode = (os.getenv("AUTH_TOKEN_VERIFICATION") or "local").strip().lower()
+  return mode if mode in {"local", "remote"} else "local"
+
+
+def _remote_fallback_enabled() -> bool:
+  return (os.getenv("AUTH_REMOTE_FALLBACK") or "1").strip().lower() in {"1", "true", "yes"}
+
+
+def _issuer() -> str:
+  return (os.getenv("SUPABASE_JWT_ISSUER") or "").strip() or f"{_get_supabase_auth_base_url()}/auth/v1"
+
+
+def _audience() -> str:
+  return (os.getenv("SUPABASE_JWT_AUDIENCE") or "").strip() or "authenticated"
+
+
+_jwks_lock = threading.Lock()
+_jwks_client: jwt.PyJWKClient | None = None
+_jwks_url: str | None = None
+_jwks_unavailable_until = 0.0
+
+
+def _jwks_signing_key(token: str) -> Any | None:
+  global _jwks_client, _jwks_url, _jwks_unavailable_until
+  url = (os.getenv("SUPABASE_JWKS_URL") or "").strip() or f"{_get_supabase_auth_base_url()}/auth/v1/.well-known/jwks.json"
+  with _jwks_lock:
+    if time.monotonic() < _jwks_unavailable_until:
+      return None
+    if _jwks_client is None or _jwks_url != url:
+      _jwks_client = jwt.PyJWKClient(url, cache_keys=True, lifespan=_env_int("AUTH_JWKS_CACHE_SECONDS", 600), timeout=5)
+      _jwks_url = url
+    client = _jwks_client
+  try:
+    return client.get_signing_key_from_jwt(token).key
+  except Exception as e:
+    # Unknown kid, unreachable endpoint or a key type this install cannot
+    # load; back off so every request does not refetch the key set.
+    logger.warning("auth_jwks_unavailable", extra={"error": str(e)})
+    with _jwks_lock:
+      _jwks_unavailable_until = time.monotonic() + _JWKS_RETRY_SECONDS
+    return None
+
+
+def _token_alg(token: str) -> str | None:
+  try:
+    return jwt.get_unverified_header(token).get("alg")
+  except jwt.InvalidTokenError:
+    raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+
+def _local_claims(token: str) -> dict[str, Any] | None:
+  # Returns verified claims, raises 401 for a token that is definitely
+  # invalid, or returns None when no key is available to decide.
+  alg = _token_alg(token)
+  if alg == "HS256":
+    key: Any = (os.getenv("SUPABASE_JWT_SECRET") or "").strip()
+    if not key:
+      return None
+  elif alg in _ASYMMETRIC_ALGS:
+    key = _jwks_signing_key(token)
+    if key is None:
+      return None
+  else:
+    return None
+
+  try:
+    return jwt.decode(
+      token,
+      key,
+      algorithms=[alg],
+      audience=_audience(),
+      issuer=_issuer(),
+      leeway=_CLOCK_SKEW_SECONDS,
+      options={"require": ["exp", "sub"]},
+    )
+  except jwt.InvalidTokenError:
+    raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+
+def _user_from_claims(claims: dict[str, Any], token: str) -> AuthenticatedUser:
+  user_id = claims.get("sub")
+  if not user_id:
+    raise HTTPException(status_code=401, detail="Invalid token payload")
+  return AuthenticatedUser(id=str(user_id), email=claims.get("email"), access_token=token)
+
+
+def _unverified_exp(token: str) -> Any:
+  # Only used to bound the cache lifetime of a token the Auth API accepted.
+  try:
+    return jwt.decode(token, options={"verify_signature": False}).get("exp")
+  except Exception:
+    return None
+
+
+def _remote_request(token: str) -> tuple[str, dict[str, str]]:
+  base = _get_supabase_auth_base_url()
+  anon_key = _get_supabase_anon_key()
+  return f"{base}/auth/v1/user", {"Authorization": f"Bearer {token}", "apikey": anon_key}
+
+
+# Pooled clients for the Auth API fallback. The async one is created on first
+# use inside the running event loop; both are closed from the app lifespan.
+_sync_http_lock = threading.Lock()
+_sync_http: httpx.Client | None = None
+_async_http: httpx.AsyncClient | None = None
+
+
+def _get_sync_http() -> httpx.Client:
+  global _sync_http
+  with _sync_http_lock:
+    if _sync_http is None:
+      _sync_http = httpx.Client(timeout=15)
+    return _sync_http
+
+
+def _get_async_http() -> httpx.AsyncClient:
+  global _async_http
+  if _async_http is None:
+    _async_http = httpx.AsyncClient(timeout=15)
+  return _async_http
+
+
+async def aclose_auth_client() -> None:
+  global _async_http, _sync_http
+  if _async_http is not None:
+    await _async_http.aclose()
+    _async_http = None
+  with _sync_http_lock:
+    if _sync_http is not None:
+      _sync_http.close()
+      _sync_http = None
+
+
+def get_current_user(authorization: str | None = Header(default=None)) -> AuthenticatedUser:
+  token = _extract_bearer_token(authorization)
+  remote = _verification_mode() == "remote"
+  if not remote:
+    user = _token_cache.get(token)
+    if user is not None:
+      return user
+
+    claims = _local_claims(token)
+    if claims is not None:
+      return _remember(token, _user_from_claims(claims, token), claims.get("exp"))
+    if not _remote_fallback_enabled():
+      raise HTTPException(status_code=401, detail="Token cannot be verified")
+
+  url, headers = _remote_request(token)
+  resp = _get_sync_http().get(url, headers=headers)
+  user = _user_from_response(resp, token)
+  return user if remote else _remember(token, user, _unverified_exp(token))
+
+
+async def get_current_user_async(authorization: str | None = Header(default=None)) -> AuthenticatedUser:
+  token = _extract_bearer_token(authorization)
+  remote = _verification_mode() == "remote"
+  if not remote:
+    user = _token_cache.get(token)
+    if user is not None:
+      return user
+
+    if _token_alg(token) == "HS256":
+      claims = _local_claims(token)
+    else:
+      # A JWKS refresh is blocking I/O; keep it off the event loop.
+      claims = await asyncio.to_thread(_local_claims, token)
+    if claims is not None:
+      return _remember(token, _user_from_claims(claims, token), claims.get("exp"))
+    if not _remote_fallback_enabled():
+      raise HTTPException(status_code=401, detail="Token cannot be verified")
+
+  url, headers = _remote_request(token)
+  resp = await _get_async_http().get(url, headers=headers)
+  user = _user_from_response(resp, token)
+  return user if remote else _remember(token, user, _unverified_exp(token))
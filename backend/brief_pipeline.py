@@ -1,8 +1,11 @@
 from __future__ import annotations
 
+import hashlib
 import json
 import logging
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from typing import Any
@@ -11,8 +14,17 @@ from zoneinfo import ZoneInfo
 
 import httpx
 import openai
-from openai import OpenAI
 
+from brief_store import (
+  legacy_editions,
+  precompress_enabled,
+  select_edition_index,
+  select_editions,
+  select_legacy_container,
+  store_editions,
+  store_encoded_editions,
+)
+from llm_clients import complete, get_anthropic_http_client, get_openai_client, provider_api_key
 from supabase_client import get_supabase_admin_client
 
 logger = logging.getLogger("connected.brief")
@@ -75,11 +87,11 @@ def _llm_fallback_provider() -> str:
 
 
 def _anthropic_api_key() -> str | None:
-  return os.getenv("ANTHROPIC_API_KEY")
+  return provider_api_key("anthropic")
 
 
 def _openai_api_key() -> str | None:
-  return os.getenv("OPENAI_API_KEY")
+  return provider_api_key("openai")
 
 
 def _anthropic_model() -> str:
@@ -110,17 +122,16 @@ def _call_anthropic_messages(*, system: str, user: dict[str, Any], temperature:
     ],
   }
 
-  try:
-    with httpx.Client(timeout=httpx.Timeout(30.0, connect=10.0)) as client:
-      resp = client.post(
-        "https://api.anthropic.com/v1/messages",
-        headers={
-          "x-api-key": api_key,
-          "anthropic-version": "2023-06-01",
-          "content-type": "application/json",
-        },
-        json=payload,
-      )
+  def _post() -> str:
+    resp = get_anthropic_http_client().post(
+      "https://api.anthropic.com/v1/messages",
+      headers={
+        "x-api-key": api_key,
+        "anthropic-version": "2023-06-01",
+        "content-type": "application/json",
+      },
+      json=payload,
+    )
 
     if resp.status_code >= 400:
       if _is_retryable_anthropic_status(resp.status_code):
@@ -140,7 +151,10 @@ def _call_anthropic_messages(*, system: str, user: dict[str, Any], temperature:
     content = "".join(text_parts).strip()
     if not content:
       raise RuntimeError("anthropic_empty_text")
-    return content, model
+    return content
+
+  try:
+    return complete("anthropic", payload, _post), model
   except httpx.TimeoutException as e:
     raise RuntimeError(f"anthropic_timeout: {e}")
   except httpx.HTTPError as e:
@@ -153,26 +167,41 @@ def _call_openai_chat(*, system: str, user: dict[str, Any], temperature: float,
     raise RuntimeError("Missing OPENAI_API_KEY")
 
   model = _openai_model()
-  client = OpenAI(api_key=api_key)
+  client = get_openai_client(api_key)
 
   kwargs: dict[str, Any] = {}
   if max_tokens is not None:
     kwargs["max_tokens"] = max_tokens
 
-  resp = client.chat.completions.create(
-    model=model,
-    temperature=temperature,
-    messages=[
-      {"role": "system", "content": system},
-      {"role": "user", "content": json.dumps(user)},
-    ],
-    **kwargs,
-  )
-  content = (resp.choices[0].message.content or "").strip()
-  return content, model
-
+  messages = [
+    {"role": "system", "content": system},
+    {"role": "user", "content": json.dumps(user)},
+  ]
 
-def _call_llm_json(*, system: str, user: dict[str, Any], temperature: float, max_tokens: int, purpose: str) -> tuple[dict[str, Any] | None, dict[str, Any]]:
+  def _create() -> str:
+    resp = client.chat.completions.create(
+      model=model,
+      temperature=temperature,
+      messages=messages,
+      **kwargs,
+    )
+    return (resp.choices[0].message.content or "").strip()
+
+  content = complete("openai", {"model": model, "temperature": temperature, "messages": messages, **kwargs}, _create)
+  return content.strip(), model
+
+
+def _call_llm_json(
+  *,
+  system: str,
+  user: dict[str, Any],
+  temperature: float,
+  max_tokens: int,
+  purpose: str,
+  deadline: float | None = None,
+) -> tuple[dict[str, Any] | None, dict[str, Any]]:
+  # deadline (time.monotonic()) stops provider fallback once the caller's
+  # result would be discarded anyway.
   providers: list[str] = []
   primary = _llm_primary_provider()
   fallback = _llm_fallback_provider()
@@ -185,6 +214,9 @@ def _call_llm_json(*, system: str, user: dict[str, Any], temperature: float, max
   last_err: str | None = None
 
   for provider in providers:
+    if deadline is not None and time.monotonic() >= deadline:
+      last_err = "deadline"
+      break
     try:
       if provider == "anthropic":
         content, model = _call_anthropic_messages(
@@ -249,6 +281,44 @@ def _select_top_cards(*, hours: int = 24, limit: int = 20, category: str | None
   return resp.data or []
 
 
+def _select_cards_by_topic(
+  *, hours: int, topics: list[str], max_rows: int, per_topic_limit: int
+) -> dict[str, list[dict[str, Any]]]:
+  # One query for every topic's candidates, partitioned in memory; only the
+  # columns brief assembly reads are projected.
+  supabase = get_supabase_admin_client()
+  since = (datetime.now(timezone.utc) - timedelta(hours=hours)).isoformat()
+  resp = (
+    supabase.table("news_feed_cards")
+    .select("cluster_id, category, card, created_at, updated_at")
+    .eq("published", True)
+    .gte("updated_at", since)
+    .in_("category", topics)
+    .order("updated_at", desc=True)
+    .limit(max_rows)
+    .execute()
+  )
+  rows = resp.data or []
+
+  by_topic: dict[str, list[dict[str, Any]]] = {t: [] for t in topics}
+  for row in rows:
+    if isinstance(row, dict) and row.get("category") in by_topic:
+      by_topic[row["category"]].append(row)
+
+  if len(rows) >= max_rows:
+    # Busy categories can fill the cap and push a quieter topic's cards out
+    # of the window; topics left short get their own query, like
+    # DAILY_BRIEF_CARD_SELECTION=per_topic would have made.
+    short = [t for t in topics if len(_dedupe_by_cluster(by_topic[t], per_topic_limit)) < per_topic_limit]
+    logger.warning(
+      "daily_brief_selection_row_cap",
+      extra={"max_rows": max_rows, "hours": hours, "requeried_topics": short},
+    )
+    for topic in short:
+      by_topic[topic] = _select_top_cards(hours=hours, limit=per_topic_limit * 3, category=topic)
+  return by_topic
+
+
 def _build_fallback_brief(cards: list[dict[str, Any]]) -> dict[str, Any]:
   items: list[dict[str, Any]] = []
   for row in cards:
@@ -430,7 +500,7 @@ def _maybe_llm_overview(brief: dict[str, Any]) -> dict[str, Any]:
   return brief
 
 
-def _maybe_llm_topic_brief(*, topic: str, items: list[dict[str, Any]]) -> dict[str, Any]:
+def _maybe_llm_topic_brief(*, topic: str, items: list[dict[str, Any]], deadline: float | None = None) -> dict[str, Any]:
   max_tokens = _env_int("DAILY_BRIEF_MAX_TOKENS", 450)
   if not _anthropic_api_key() and not _openai_api_key():
     return {"topic": topic, "overview": None, "tags": [], "items": items, "mode": "no_llm"}
@@ -458,6 +528,7 @@ def _maybe_llm_topic_brief(*, topic: str, items: list[dict[str, Any]]) -> dict[s
     temperature=0.3,
     max_tokens=max_tokens,
     purpose="topic_brief",
+    deadline=deadline,
   )
   if not isinstance(parsed, dict):
     return {
@@ -484,6 +555,94 @@ def _maybe_llm_topic_brief(*, topic: str, items: list[dict[str, Any]]) -> dict[s
   }
 
 
+@dataclass
+class _TopicWork:
+  topic: str
+  rows: list[dict[str, Any]] | None = None
+  section: dict[str, Any] | None = None
+  # (edition, section) of the newest earlier edition's section for this topic.
+  previous: tuple[str, dict[str, Any]] | None = None
+
+
+def _topic_fingerprint(topic: str, rows: list[dict[str, Any]]) -> str:
+  # A topic's LLM section depends only on which cards it covers and their
+  # versions, so cluster ids plus card updated_at identify its input.
+  keys = sorted(f"{r.get('cluster_id') or ''}@{r.get('updated_at') or ''}" for r in rows)
+  raw = json.dumps([topic, keys], ensure_ascii=False)
+  return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _earlier_editions(edition: str) -> list[str]:
+  # Editions published before `edition`; an edition outside the order has none.
+  out: list[str] = []
+  for e in _edition_order():
+    if e == edition:
+      return out
+    out.append(e)
+  return []
+
+
+def _previous_topic_sections(editions: dict[str, Any], edition: str) -> dict[str, tuple[str, dict[str, Any]]]:
+  out: dict[str, tuple[str, dict[str, Any]]] = {}
+  for e in _edition_order():
+    if e == edition:
+      break
+    prev = editions.get(e)
+    sections = prev.get("topics") if isinstance(prev, dict) else None
+    if not isinstance(sections, list):
+      continue
+    for sec in sections:
+      if isinstance(sec, dict) and sec.get("mode") == "llm" and sec.get("fingerprint") and sec.get("topic"):
+        out[sec["topic"]] = (e, sec)
+  return out
+
+
+def _topic_items(rows: list[dict[str, Any]], per_topic_limit: int) -> list[dict[str, Any]]:
+  return (_build_fallback_brief(rows).get("items") or [])[:per_topic_limit]
+
+
+def _build_topic_section(
+  work: _TopicWork, *, hours: int, per_topic_limit: int, deadline: float | None = None
+) -> None:
+  # deadline is a time.monotonic() value: a topic still queued or selecting
+  # cards when it passes skips its LLM call, since the run has already
+  # published (or is about to publish) the no-LLM section in its place.
+  if work.rows is None:
+    rows = _select_top_cards(hours=hours, limit=per_topic_limit * 3, category=work.topic)
+    work.rows = _dedupe_by_cluster(rows, per_topic_limit)
+
+  fingerprint = _topic_fingerprint(work.topic, work.rows)
+  if work.previous is not None and work.previous[1].get("fingerprint") == fingerprint:
+    # Same clusters at the same versions as an earlier edition: reuse its
+    # section instead of asking the LLM again.
+    section = {k: v for k, v in work.previous[1].items() if k != "reused_from"}
+    section["reused_from"] = work.previous[0]
+  elif deadline is not None and time.monotonic() >= deadline:
+    # No fingerprint: a later edition must not reuse a section without an
+    # overview.
+    work.section = _fallback_topic_section(work, per_topic_limit, "deadline")
+    return
+  else:
+    llm_items = _topic_payload(work.rows)[:per_topic_limit]
+    section = _maybe_llm_topic_brief(topic=work.topic, items=llm_items, deadline=deadline)
+  section["fingerprint"] = fingerprint
+  section["items"] = _topic_items(work.rows, per_topic_limit)
+  work.section = section
+
+
+def _fallback_topic_section(work: _TopicWork, per_topic_limit: int, reason: str) -> dict[str, Any]:
+  # Same shape as the no-LLM section, built from whatever cards were selected
+  # before the topic missed the deadline or failed.
+  return {
+    "topic": work.topic,
+    "overview": None,
+    "tags": [],
+    "items": _topic_items(work.rows or [], per_topic_limit),
+    "mode": "no_llm",
+    "reason": reason,
+  }
+
+
 def run_daily_brief(audience: str = "global", edition: str = "morning") -> BriefResult:
   supabase = get_supabase_admin_client()
   brief_date = _utc_today_date()
@@ -491,47 +650,49 @@ def run_daily_brief(audience: str = "global", edition: str = "morning") -> Brief
 
   logger.info("daily_brief_start", extra={"audience": audience, "brief_date": brief_date, "edition": edition})
 
-  existing = (
-    supabase.table("news_daily_briefs")
-    .select("brief")
-    .eq("brief_date", brief_date)
-    .eq("audience", audience)
-    .limit(1)
-    .execute()
-  )
   force = os.getenv("DAILY_BRIEF_FORCE_REGEN") == "1"
-  brief_container: dict[str, Any] | None = None
-  if existing.data:
-    row0 = existing.data[0] if isinstance(existing.data, list) and existing.data else None
-    brief_existing = (row0 or {}).get("brief") if isinstance(row0, dict) else None
-    if isinstance(brief_existing, dict):
-      brief_container = brief_existing
-
-  # Backward compatible container:
-  # - legacy: {overview, items, topics}
-  # - new: {editions: {morning|midday|evening: {overview, ...}}, latest_edition}
-  if brief_container is None:
-    brief_container = {"brief_date": brief_date, "created_at": _now_iso(), "editions": {}, "latest_edition": None}
-  if not isinstance(brief_container.get("editions"), dict):
-    brief_container = {
-      "brief_date": brief_date,
-      "created_at": brief_container.get("created_at") or _now_iso(),
-      "editions": {"morning": brief_container},
-      "latest_edition": "morning",
-    }
-
-  editions: dict[str, Any] = brief_container.get("editions") or {}
-  if not force and isinstance(editions.get(edition), dict):
-    existing_edition = editions.get(edition) or {}
+  index = select_edition_index(supabase, brief_date=brief_date, audience=audience)
+  # Editions of a day written before briefs were stored per edition; they are
+  # copied into their own rows alongside this edition.
+  migrated: dict[str, dict[str, Any]] = {}
+  if not index:
+    migrated, _ = legacy_editions(select_legacy_container(supabase, brief_date=brief_date, audience=audience))
+
+  if not force and (edition in index or edition in migrated):
+    if edition in migrated:
+      existing_items = migrated[edition].get("items")
+    else:
+      row = select_editions(
+        supabase,
+        brief_date=brief_date,
+        audience=audience,
+        editions=[edition],
+        columns="items:brief->items",
+      ).get(edition)
+      existing_items = (row or {}).get("items")
     logger.info("daily_brief_skip_existing", extra={"audience": audience, "brief_date": brief_date, "edition": edition})
     return BriefResult(
-      items_selected=len((existing_edition.get("items") or []) if isinstance(existing_edition, dict) else []),
+      items_selected=len(existing_items if isinstance(existing_items, list) else []),
       stored=True,
       audience=audience,
       brief_date=brief_date,
       edition=edition,
     )
 
+  # Only the overview and topic sections of earlier editions are needed (for
+  # previous_overviews and section reuse), so project just those.
+  earlier = _earlier_editions(edition)
+  if migrated:
+    editions: dict[str, Any] = {e: migrated[e] for e in earlier if e in migrated}
+  else:
+    editions = select_editions(
+      supabase,
+      brief_date=brief_date,
+      audience=audience,
+      editions=[e for e in earlier if e in index],
+      columns="overview:brief->>overview, topics:brief->topics",
+    )
+
   topics_default = [
     "culture",
     "economics",
@@ -553,22 +714,53 @@ def run_daily_brief(audience: str = "global", edition: str = "morning") -> Brief
     per_topic_limit = _env_int("DAILY_BRIEF_ITEMS_PER_TOPIC_EVENING", per_topic_limit)
   max_topics = _env_int("DAILY_BRIEF_MAX_TOPICS", len(topics))
 
+  topic_concurrency = max(1, _env_int("DAILY_BRIEF_TOPIC_CONCURRENCY", 4))
+  topics_deadline_seconds = max(1, _env_int("DAILY_BRIEF_TOPICS_DEADLINE_SECONDS", 75))
+
   all_items: list[dict[str, Any]] = []
   topic_sections: list[dict[str, Any]] = []
 
-  for topic in topics[:max_topics]:
-    rows = _select_top_cards(hours=hours, limit=per_topic_limit * 3, category=topic)
-    rows = _dedupe_by_cluster(rows, per_topic_limit)
-    topic_items = _build_fallback_brief(rows).get("items") or []
-    topic_items = topic_items[:per_topic_limit]
-
-    llm_items = _topic_payload(rows)[:per_topic_limit]
-
-    section = _maybe_llm_topic_brief(topic=topic, items=llm_items)
-    section["items"] = topic_items
+  # Topic sections are independent, so they are built in a bounded pool. Topics
+  # still running at the deadline publish without an LLM overview so the
+  # edition goes out on time; output keeps the configured topic order.
+  previous_sections = _previous_topic_sections(editions, edition)
+  work = [_TopicWork(topic=t, previous=previous_sections.get(t)) for t in topics[:max_topics]]
+  card_selection = (os.getenv("DAILY_BRIEF_CARD_SELECTION") or "batch").strip().lower()
+  if card_selection != "per_topic" and work:
+    rows_by_topic = _select_cards_by_topic(
+      hours=hours,
+      topics=[w.topic for w in work],
+      max_rows=max(1, _env_int("DAILY_BRIEF_SELECTION_MAX_ROWS", 1000)),
+      per_topic_limit=per_topic_limit,
+    )
+    for w in work:
+      w.rows = _dedupe_by_cluster(rows_by_topic.get(w.topic) or [], per_topic_limit)
+  pool = ThreadPoolExecutor(max_workers=min(topic_concurrency, max(1, len(work))), thread_name_prefix="brief-topic")
+  deadline = time.monotonic() + topics_deadline_seconds
+  try:
+    futures = [
+      pool.submit(_build_topic_section, w, hours=hours, per_topic_limit=per_topic_limit, deadline=deadline)
+      for w in work
+    ]
+    wait(futures, timeout=topics_deadline_seconds)
+  finally:
+    # Stragglers finish in the background and their results are discarded;
+    # past the deadline they make no further LLM calls.
+    pool.shutdown(wait=False, cancel_futures=True)
+
+  topics_timed_out = 0
+  for w, fut in zip(work, futures):
+    if not fut.done():
+      topics_timed_out += 1
+      section = _fallback_topic_section(w, per_topic_limit, "deadline")
+    elif fut.exception() is not None:
+      logger.error("daily_brief_topic_failed", extra={"topic": w.topic, "error": str(fut.exception())})
+      section = _fallback_topic_section(w, per_topic_limit, "error")
+    else:
+      section = w.section or _fallback_topic_section(w, per_topic_limit, "error")
     topic_sections.append(section)
 
-    for it in topic_items[:3]:
+    for it in (section.get("items") or [])[:3]:
       all_items.append(it)
 
   all_items = all_items[:25]
@@ -589,6 +781,7 @@ def run_daily_brief(audience: str = "global", edition: str = "morning") -> Brief
     "topics": topic_sections,
     "items": all_items,
     "previous_overviews": previous_overviews,
+    "reused_sections": [sec.get("topic") for sec in topic_sections if sec.get("reused_from")],
   }
   brief = _maybe_llm_overview(brief)
 
@@ -599,26 +792,31 @@ def run_daily_brief(audience: str = "global", edition: str = "morning") -> Brief
       "brief_date": brief_date,
       "edition": edition,
       "topics": len(topic_sections),
+      "topics_timed_out": topics_timed_out,
+      "topics_reused": len(brief.get("reused_sections") or []),
       "items_selected": len(all_items),
     },
   )
 
-  editions[edition] = brief
-  brief_container["editions"] = editions
-  brief_container["latest_edition"] = edition
-  brief_container["updated_at"] = _now_iso()
-
-  upsert_payload = {
-    "brief_date": brief_date,
-    "audience": audience,
-    "brief": brief_container,
-    "created_at": _now_iso(),
-  }
-
-  supabase.table("news_daily_briefs").upsert(
-    upsert_payload,
-    on_conflict="brief_date,audience",
-  ).execute()
+  store_editions(
+    supabase,
+    brief_date=brief_date,
+    audience=audience,
+    editions={**{e: b for e, b in migrated.items() if e != edition}, edition: brief},
+  )
+  if precompress_enabled():
+    # Best effort: /news/brief compresses on the fly when bodies are missing.
+    try:
+      encoded = store_encoded_editions(supabase, brief_date=brief_date, audience=audience)
+      logger.info(
+        "daily_brief_precompressed",
+        extra={"audience": audience, "brief_date": brief_date, "editions": encoded},
+      )
+    except Exception as e:
+      logger.warning(
+        "daily_brief_precompress_failed",
+        extra={"audience": audience, "brief_date": brief_date, "error": str(e)},
+      )
 
   return BriefResult(
     items_selected=len(all_items),
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from typing import Any
+
+from compression import compress, supported_encodings
+
+# Daily briefs are stored one row per edition in news_daily_brief_editions, so
+# generating, serving or revalidating an edition reads and writes only that
+# row. Days written before the split keep every edition inside the
+# news_daily_briefs.brief container; readers fall back to it, and the brief
+# job copies its editions into their own rows the first time it writes that day.
+#
+# After each run the brief job also stores every edition's /news/brief body
+# precompressed (base64 in body_gzip / body_br), tagged with body_key, the key
+# of the edition index it was rendered against. A later edition changes
+# available_editions/latest_edition, so /news/brief only serves stored bytes
+# whose body_key matches the current index.
+
+EDITIONS_TABLE = "news_daily_brief_editions"
+LEGACY_TABLE = "news_daily_briefs"
+EDITION_ORDER = ("morning", "midday", "evening")
+ENCODED_COLUMNS = {"br": "body_br", "gzip": "body_gzip"}
+
+
+def legacy_editions(container: Any) -> tuple[dict[str, dict[str, Any]], str | None]:
+  # Container shapes: {editions: {...}, latest_edition} or a flat legacy brief,
+  # which is the morning edition.
+  if not isinstance(container, dict):
+    return {}, None
+  editions = container.get("editions")
+  if isinstance(editions, dict):
+    latest = container.get("latest_edition")
+    return {k: v for k, v in editions.items() if isinstance(v, dict)}, latest if isinstance(latest, str) else None
+  return {"morning": container}, "morning"
+
+
+def edition_index(rows: list[Any]) -> dict[str, Any]:
+  return {r["edition"]: r.get("updated_at") for r in rows if isinstance(r, dict) and r.get("edition")}
+
+
+def available_editions(index: dict[str, Any]) -> list[str]:
+  return [e for e in EDITION_ORDER if e in index]
+
+
+def latest_edition(index: dict[str, Any]) -> str | None:
+  if not index:
+    return None
+  return max(index, key=lambda e: (str(index[e] or ""), EDITION_ORDER.index(e) if e in EDITION_ORDER else -1))
+
+
+def index_key(index: dict[str, Any]) -> str:
+  raw = json.dumps(sorted(index.items()), separators=(",", ":"), default=str)
+  return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def edition_payload(
+  *,
+  audience: str,
+  brief_date: str,
+  edition: str,
+  index: dict[str, Any],
+  brief: Any,
+) -> dict[str, Any]:
+  return {
+    "audience": audience,
+    "brief_date": brief_date,
+    "edition": edition,
+    "available_editions": available_editions(index),
+    "latest_edition": latest_edition(index),
+    "brief": brief if isinstance(brief, dict) else None,
+  }
+
+
+def precompress_enabled() -> bool:
+  return (os.getenv("DAILY_BRIEF_PRECOMPRESS") or "1").strip().lower() in {"1", "true", "yes"}
+
+
+def select_edition_index(supabase: Any, *, brief_date: str, audience: str) -> dict[str, Any]:
+  res = (
+    supabase.table(EDITIONS_TABLE)
+    .select("edition, updated_at")
+    .eq("brief_date", brief_date)
+    .eq("audience", audience)
+    .execute()
+  )
+  return edition_index(res.data or [])
+
+
+def select_editions(
+  supabase: Any,
+  *,
+  brief_date: str,
+  audience: str,
+  editions: list[str],
+  columns: str = "brief",
+) -> dict[str, dict[str, Any]]:
+  # `columns` may project into the brief, e.g. "topics:brief->topics".
+  if not editions:
+    return {}
+  res = (
+    supabase.table(EDITIONS_TABLE)
+    .select(f"edition, {columns}")
+    .eq("brief_date", brief_date)
+    .eq("audience", audience)
+    .in_("edition", editions)
+    .execute()
+  )
+  return {r["edition"]: r for r in res.data or [] if isinstance(r, dict) and r.get("edition")}
+
+
+def select_legacy_container(supabase: Any, *, brief_date: str, audience: str) -> dict[str, Any] | None:
+  res = (
+    supabase.table(LEGACY_TABLE)
+    .select("brief")
+    .eq("brief_date", brief_date)
+    .eq("audience", audience)
+    .limit(1)
+    .execute()
+  )
+  row0 = res.data[0] if isinstance(res.data, list) and res.data else None
+  container = row0.get("brief") if isinstance(row0, dict) else None
+  return container if isinstance(container, dict) else None
+
+
+def select_latest_brief(supabase: Any, *, brief_date: str, audience: str) -> dict[str, Any] | None:
+  index = select_edition_index(supabase, brief_date=brief_date, audience=audience)
+  if index:
+    edition = latest_edition(index)
+    row = select_editions(supabase, brief_date=brief_date, audience=audience, editions=[edition]).get(edition)
+    brief = (row or {}).get("brief")
+    return brief if isinstance(brief, dict) else None
+
+  editions, latest = legacy_editions(select_legacy_container(supabase, brief_date=brief_date, audience=audience))
+  if latest not in editions:
+    latest = next((e for e in reversed(EDITION_ORDER) if e in editions), None)
+  return editions.get(latest) if latest else None
+
+
+def store_editions(supabase: Any, *, brief_date: str, audience: str, editions: dict[str, dict[str, Any]]) -> None:
+  now = datetime.now(timezone.utc).isoformat()
+  rows = [
+    {"brief_date": brief_date, "audience": audience, "edition": e, "brief": brief, "updated_at": now}
+    for e, brief in editions.items()
+  ]
+  if rows:
+    supabase.table(EDITIONS_TABLE).upsert(rows, on_conflict="brief_date,audience,edition").execute()
+
+
+def store_encoded_editions(supabase: Any, *, brief_date: str, audience: str) -> list[str]:
+  # Re-read the index so body_key uses the timestamps exactly as the API
+  # will read them back.
+  index = select_edition_index(supabase, brief_date=brief_date, audience=audience)
+  key = index_key(index)
+  encodings = supported_encodings()
+  rows = select_editions(supabase, brief_date=brief_date, audience=audience, editions=list(index))
+  for edition, row in rows.items():
+    payload = edition_payload(
+      audience=audience,
+      brief_date=brief_date,
+      edition=edition,
+      index=index,
+      brief=row.get("brief"),
+    )
+    # Same bytes JSONResponse renders.
+    body = json.dumps(payload, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+    update: dict[str, Any] = {"body_key": key}
+    for encoding, column in ENCODED_COLUMNS.items():
+      # Clear encodings this host cannot produce so a stale body is never
+      # paired with the new key.
+      encoded = compress(body, encoding, precompressed=True) if encoding in encodings else None
+      update[column] = base64.b64encode(encoded).decode("ascii") if encoded is not None else None
+    (
+      supabase.table(EDITIONS_TABLE)
+      .update(update)
+      .eq("brief_date", brief_date)
+      .eq("audience", audience)
+      .eq("edition", edition)
+      .execute()
+    )
+  return [e for e in EDITION_ORDER if e in rows]
@@ -1,14 +1,18 @@
 from __future__ import annotations
 
 import json
+import logging
 import os
+import re
+import threading
 from datetime import datetime, timezone
-from typing import Any
-
-from openai import OpenAI
+from typing import Any, Iterator
 
+from llm_clients import complete, complete_stream, get_openai_client, provider_api_key
 from supabase_client import get_supabase_admin_client, get_supabase_user_client
 
+logger = logging.getLogger("connected")
+
 
 def _now_iso() -> str:
   return datetime.now(timezone.utc).isoformat()
@@ -105,34 +109,31 @@ def start_session(
   return session_id
 
 
-def _generate_coach_reply(
+def _no_llm_reply(mode: str) -> tuple[str, dict[str, Any] | None, str | None, str]:
+  # Fallback: deterministic coach prompt
+  if mode == "roleplay":
+    return (
+      "Okay — let’s roleplay. What would you say next?",
+      {"ok": True, "mode": "fallback", "roleplay": True},
+      None,
+      "roleplay-v0-fallback",
+    )
+  return (
+    "Got it. Try this next: ask one curious follow-up question (e.g., 'What got you into that?').",
+    {"ok": True, "mode": "fallback"},
+    None,
+    "coach-v0-fallback",
+  )
+
+
+def _coach_messages(
   *,
   mode: str,
   lesson_id: str | None,
   user_text: str,
   history: list[dict[str, Any]],
   session_state: dict[str, Any] | None,
-) -> tuple[str, dict[str, Any] | None, str | None, str]:
-  api_key = os.getenv("OPENAI_API_KEY")
-  if not api_key:
-    # Fallback: deterministic coach prompt
-    if mode == "roleplay":
-      return (
-        "Okay — let’s roleplay. What would you say next?",
-        {"ok": True, "mode": "fallback", "roleplay": True},
-        None,
-        "roleplay-v0-fallback",
-      )
-    return (
-      "Got it. Try this next: ask one curious follow-up question (e.g., 'What got you into that?').",
-      {"ok": True, "mode": "fallback"},
-      None,
-      "coach-v0-fallback",
-    )
-
-  model = os.getenv("COACH_LLM_MODEL", "gpt-4o-mini")
-  client = OpenAI(api_key=api_key)
-
+) -> list[dict[str, str]]:
   drill_prompt = None
   if isinstance(session_state, dict):
     drill_prompt = session_state.get("drill_prompt")
@@ -177,46 +178,184 @@ def _generate_coach_reply(
       },
     }
 
+  return [
+    {"role": "system", "content": system},
+    {"role": "user", "content": json.dumps(context)},
+  ]
+
+
+def _parse_coach_reply(mode: str, content: str, model: str) -> tuple[str, dict[str, Any] | None, str | None, str]:
+  parsed = json.loads(content)
+  reply = parsed.get("reply") if isinstance(parsed, dict) else None
+  if not reply:
+    raise ValueError("Missing reply")
+
+  if mode == "roleplay":
+    qa = {"ok": True, "mode": "llm", "roleplay": True, "confidence": parsed.get("confidence")}
+    return reply, qa, model, "roleplay-v1-llm"
+
+  qa = {"ok": True, "mode": "llm", "tip": parsed.get("tip"), "next_prompt": parsed.get("next_prompt"), "confidence": parsed.get("confidence")}
+  return reply, qa, model, "coach-v1-llm"
+
+
+def _llm_error_reply(mode: str, error: Exception, model: str) -> tuple[str, dict[str, Any] | None, str | None, str]:
+  if mode == "roleplay":
+    return (
+      "Okay. What would you say next?",
+      {"ok": False, "mode": "llm", "roleplay": True, "error": str(error)},
+      model,
+      "roleplay-v1-llm-fallback",
+    )
+  return (
+    "I hear you. Small move: ask a follow-up that starts with 'What' or 'How'. What would you ask next?",
+    {"ok": False, "mode": "llm", "error": str(error)},
+    model,
+    "coach-v1-llm-fallback",
+  )
+
+
+def _generate_coach_reply(
+  *,
+  mode: str,
+  lesson_id: str | None,
+  user_text: str,
+  history: list[dict[str, Any]],
+  session_state: dict[str, Any] | None,
+) -> tuple[str, dict[str, Any] | None, str | None, str]:
+  api_key = provider_api_key("openai")
+  if not api_key:
+    return _no_llm_reply(mode)
+
+  model = os.getenv("COACH_LLM_MODEL", "gpt-4o-mini")
+  client = get_openai_client(api_key)
+  messages = _coach_messages(
+    mode=mode, lesson_id=lesson_id, user_text=user_text, history=history, session_state=session_state
+  )
+
   try:
-    resp = client.chat.completions.create(
+    def _create() -> str:
+      resp = client.chat.completions.create(
+        model=model,
+        temperature=0.4,
+        messages=messages,
+      )
+      return (resp.choices[0].message.content or "").strip()
+
+    content = complete("openai", {"model": model, "temperature": 0.4, "messages": messages}, _create).strip()
+    return _parse_coach_reply(mode, content, model)
+  except Exception as e:
+    return _llm_error_reply(mode, e, model)
+
+
+_JSON_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class _JsonStringFieldStream:
+  # Incrementally decodes one top-level string field (e.g. "reply") out of a
+  # JSON object that arrives in arbitrary chunks, so its text can be shown
+  # before the rest of the object has been generated.
+  def __init__(self, field: str):
+    self._pattern = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+    self._buf = ""
+    self._pos: int | None = None
+    self.done = False
+
+  def feed(self, chunk: str) -> str:
+    self._buf += chunk
+    if self.done:
+      return ""
+    if self._pos is None:
+      m = self._pattern.search(self._buf)
+      if not m:
+        return ""
+      self._pos = m.end()
+
+    out: list[str] = []
+    buf, pos = self._buf, self._pos
+    while pos < len(buf):
+      ch = buf[pos]
+      if ch == '"':
+        self.done = True
+        pos += 1
+        break
+      if ch != "\\":
+        out.append(ch)
+        pos += 1
+        continue
+      if pos + 1 >= len(buf):
+        break
+      esc = buf[pos + 1]
+      if esc != "u":
+        out.append(_JSON_ESCAPES.get(esc, esc))
+        pos += 2
+        continue
+      # \uXXXX, possibly a surrogate pair spanning two escapes.
+      if pos + 6 > len(buf):
+        break
+      code = int(buf[pos + 2 : pos + 6], 16)
+      if 0xD800 <= code < 0xDC00:
+        if pos + 12 > len(buf):
+          break
+        if buf[pos + 6 : pos + 8] == "\\u":
+          low = int(buf[pos + 8 : pos + 12], 16)
+          out.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+          pos += 12
+          continue
+      out.append(chr(code))
+      pos += 6
+    self._pos = pos
+    return "".join(out)
+
+
+def _stream_coach_reply(
+  *,
+  mode: str,
+  lesson_id: str | None,
+  user_text: str,
+  history: list[dict[str, Any]],
+  session_state: dict[str, Any] | None,
+  result: dict[str, Any],
+) -> Iterator[str]:
+  # Yields reply text as it is generated; the final (reply, qa, model,
+  # prompt_version) tuple is left in result["reply"] once the stream ends.
+  api_key = provider_api_key("openai")
+  if not api_key:
+    result["reply"] = _no_llm_reply(mode)
+    yield result["reply"][0]
+    return
+
+  model = os.getenv("COACH_LLM_MODEL", "gpt-4o-mini")
+  client = get_openai_client(api_key)
+  messages = _coach_messages(
+    mode=mode, lesson_id=lesson_id, user_text=user_text, history=history, session_state=session_state
+  )
+
+  def _create() -> Iterator[str]:
+    stream = client.chat.completions.create(
       model=model,
       temperature=0.4,
-      messages=[
-        {"role": "system", "content": system},
-        {"role": "user", "content": json.dumps(context)},
-      ],
+      messages=messages,
+      stream=True,
     )
-    content = (resp.choices[0].message.content or "").strip()
-    parsed = json.loads(content)
-    reply = parsed.get("reply") if isinstance(parsed, dict) else None
-    if not reply:
-      raise ValueError("Missing reply")
-
-    if mode == "roleplay":
-      qa = {"ok": True, "mode": "llm", "roleplay": True, "confidence": parsed.get("confidence")}
-      return reply, qa, model, "roleplay-v1-llm"
-
-    qa = {"ok": True, "mode": "llm", "tip": parsed.get("tip"), "next_prompt": parsed.get("next_prompt"), "confidence": parsed.get("confidence")}
-    return reply, qa, model, "coach-v1-llm"
+    for chunk in stream:
+      if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+        yield chunk.choices[0].delta.content
+
+  parts: list[str] = []
+  field = _JsonStringFieldStream("reply")
+  try:
+    for delta in complete_stream("openai", {"model": model, "temperature": 0.4, "messages": messages}, _create):
+      parts.append(delta)
+      text = field.feed(delta)
+      if text:
+        yield text
+    result["reply"] = _parse_coach_reply(mode, "".join(parts).strip(), model)
   except Exception as e:
-    if mode == "roleplay":
-      return (
-        "Okay. What would you say next?",
-        {"ok": False, "mode": "llm", "roleplay": True, "error": str(e)},
-        model,
-        "roleplay-v1-llm-fallback",
-      )
-    return (
-      "I hear you. Small move: ask a follow-up that starts with 'What' or 'How'. What would you ask next?",
-      {"ok": False, "mode": "llm", "error": str(e)},
-      model,
-      "coach-v1-llm-fallback",
-    )
+    result["reply"] = _llm_error_reply(mode, e, model)
 
 
-def send_message(user_id: str, user_access_token: str, session_id: str, content: str) -> tuple[dict[str, Any], dict[str, Any]]:
+def _begin_message(user_id: str, user_access_token: str, session_id: str, content: str) -> tuple[dict[str, Any], dict[str, Any], list[dict[str, Any]]]:
   user_supabase = get_supabase_user_client(user_access_token)
-  admin = get_supabase_admin_client()
 
   session = _select_session(user_access_token, session_id)
   if not session or session.get("user_id") != user_id:
@@ -243,14 +382,14 @@ def send_message(user_id: str, user_access_token: str, session_id: str, content:
   user_msg = res.data[0]
 
   history = _select_recent_messages(user_access_token, session_id, limit=12)
-  reply_text, qa, model_used, prompt_version = _generate_coach_reply(
-    mode=session.get("mode") or "coach",
-    lesson_id=session.get("lesson_id"),
-    user_text=content,
-    history=history,
-    session_state=session.get("state") if isinstance(session, dict) else None,
-  )
+  return session, user_msg, history
+
 
+def _store_coach_message(
+  session_id: str, reply: tuple[str, dict[str, Any] | None, str | None, str]
+) -> dict[str, Any]:
+  admin = get_supabase_admin_client()
+  reply_text, qa, model_used, prompt_version = reply
   res = (
     admin.table("coach_messages")
     .insert(
@@ -274,5 +413,65 @@ def send_message(user_id: str, user_access_token: str, session_id: str, content:
   coach_msg = res.data[0]
 
   admin.table("coach_sessions").update({"updated_at": _now_iso()}).eq("id", session_id).execute()
+  return coach_msg
+
 
+def send_message(user_id: str, user_access_token: str, session_id: str, content: str) -> tuple[dict[str, Any], dict[str, Any]]:
+  session, user_msg, history = _begin_message(user_id, user_access_token, session_id, content)
+  reply = _generate_coach_reply(
+    mode=session.get("mode") or "coach",
+    lesson_id=session.get("lesson_id"),
+    user_text=content,
+    history=history,
+    session_state=session.get("state") if isinstance(session, dict) else None,
+  )
+  coach_msg = _store_coach_message(session_id, reply)
   return user_msg, coach_msg
+
+
+def _finish_coach_reply(session_id: str, replies: Iterator[str], result: dict[str, Any]) -> None:
+  try:
+    for _ in replies:
+      pass
+    _store_coach_message(session_id, result["reply"])
+  except Exception:
+    logger.exception("coach_reply_finish_failed", extra={"session_id": session_id})
+
+
+def stream_message(
+  user_id: str, user_access_token: str, session_id: str, content: str
+) -> tuple[dict[str, Any], Iterator[tuple[str, dict[str, Any]]]]:
+  # The session check and user message write happen eagerly so errors surface
+  # before any response is sent; the returned iterator yields ("token", ...)
+  # events while the reply is generated, persists the coach message, then
+  # yields ("done", {"coach_message": ...}). The done message is authoritative
+  # (it differs from the streamed text when the LLM output had to be replaced
+  # by a fallback reply). If the consumer stops early (client disconnect),
+  # the rest of the reply is generated and stored on a background thread so
+  # the conversation never ends on an unanswered user message.
+  session, user_msg, history = _begin_message(user_id, user_access_token, session_id, content)
+
+  def _events() -> Iterator[tuple[str, dict[str, Any]]]:
+    result: dict[str, Any] = {}
+    replies = _stream_coach_reply(
+      mode=session.get("mode") or "coach",
+      lesson_id=session.get("lesson_id"),
+      user_text=content,
+      history=history,
+      session_state=session.get("state") if isinstance(session, dict) else None,
+      result=result,
+    )
+    storing = False
+    try:
+      for text in replies:
+        yield "token", {"text": text}
+      storing = True
+      coach_msg = _store_coach_message(session_id, result["reply"])
+      yield "done", {"coach_message": coach_msg}
+    finally:
+      if not storing:
+        threading.Thread(
+          target=_finish_coach_reply, args=(session_id, replies, result), daemon=True
+        ).start()
+
+  return user_msg, _events()
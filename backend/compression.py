@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import gzip
+import os
+from typing import Iterable
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+  import brotli
+except ModuleNotFoundError:
+  brotli = None
+
+# HTTP response compression. CompressionMiddleware compresses whole JSON/text
+# responses of at least API_COMPRESSION_MIN_BYTES with brotli when the client
+# accepts it and the brotli package is installed, otherwise gzip. Streamed
+# responses (coach SSE) and responses that already carry a Content-Encoding,
+# like the precompressed daily brief, pass through untouched.
+
+_COMPRESSIBLE_TYPES = ("application/json", "text/", "application/xml", "application/javascript")
+
+
+def _env_int(name: str, default: int) -> int:
+  raw = os.getenv(name)
+  if raw is None or raw == "":
+    return default
+  try:
+    return int(raw)
+  except Exception:
+    return default
+
+
+def supported_encodings() -> tuple[str, ...]:
+  # In server preference order.
+  return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def acceptable_encodings(accept_encoding: str | None, available: Iterable[str]) -> list[str]:
+  # `available` codings the client accepts, best q-value first; ties keep
+  # the order of `available`.
+  weights: dict[str, float] = {}
+  for part in (accept_encoding or "").split(","):
+    name, _, params = part.partition(";")
+    name = name.strip().lower()
+    if not name:
+      continue
+    weight = 1.0
+    params = params.replace(" ", "")
+    if params.startswith("q="):
+      try:
+        weight = float(params[2:])
+      except ValueError:
+        weight = 0.0
+    weights[name] = weight
+
+  ranked = [(weights.get(e, weights.get("*", 0.0)), i, e) for i, e in enumerate(available)]
+  return [e for w, _, e in sorted(ranked, key=lambda r: (-r[0], r[1])) if w > 0]
+
+
+def compress(body: bytes, encoding: str, *, precompressed: bool = False) -> bytes:
+  # Precompressed bodies are built once off the request path, so they use
+  # the slowest, smallest settings.
+  if encoding == "br":
+    if brotli is None:
+      raise RuntimeError("brotli is not installed")
+    return brotli.compress(body, quality=11 if precompressed else _env_int("API_BROTLI_QUALITY", 5))
+  if encoding == "gzip":
+    return gzip.compress(body, compresslevel=9 if precompressed else _env_int("API_GZIP_LEVEL", 6), mtime=0)
+  raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def weak_etag(etag: str) -> str:
+  # An encoded body is a different byte representation of the same resource.
+  return etag if etag.startswith("W/") else f"W/{etag}"
+
+
+def add_vary(headers: MutableHeaders, value: str = "Accept-Encoding") -> None:
+  vary = [v.strip().lower() for v in (headers.get("vary") or "").split(",") if v.strip()]
+  if value.lower() not in vary and "*" not in vary:
+    headers.add_vary_header(value)
+
+
+def _compressible(content_type: str | None) -> bool:
+  content_type = (content_type or "").lower()
+  return content_type.startswith(_COMPRESSIBLE_TYPES) and not content_type.startswith("text/event-stream")
+
+
+class CompressionMiddleware:
+  def __init__(self, app: ASGIApp, *, minimum_size: int | None = None) -> None:
+    self.app = app
+    # 0 or less disables compression.
+    self.minimum_size = _env_int("API_COMPRESSION_MIN_BYTES", 1024) if minimum_size is None else minimum_size
+
+  async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+    if scope["type"] != "http" or self.minimum_size <= 0:
+      await self.app(scope, receive, send)
+      return
+
+    accepted = acceptable_encodings(Headers(scope=scope).get("accept-encoding"), supported_encodings())
+    encoding = accepted[0] if accepted else None
+    pending: Message | None = None
+
+    async def _send(message: Message) -> None:
+      nonlocal pending
+      if message["type"] == "http.response.start":
+        pending = message
+        return
+      if pending is None:
+        await send(message)
+        return
+
+      start, pending = pending, None
+      headers = MutableHeaders(raw=start["headers"])
+      body = message.get("body", b"")
+      if (
+        message.get("more_body")
+        or "content-encoding" in headers
+        or len(body) < self.minimum_size
+        or not _compressible(headers.get("content-type"))
+      ):
+        await send(start)
+        await send(message)
+        return
+
+      add_vary(headers)
+      if encoding is not None:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+        headers["Content-Length"] = str(len(body))
+        if "etag" in headers:
+          headers["ETag"] = weak_etag(headers["etag"])
+        message = {**message, "body": body}
+      await send(start)
+      await send(message)
+
+    await self.app(scope, receive, _send)
@@ -6,9 +6,7 @@ import os
 from datetime import datetime, timezone
 from typing import Any
 
-import httpx
-from openai import OpenAI
-
+from llm_clients import complete, get_anthropic_http_client, get_openai_client, provider_api_key
 from supabase_client import get_supabase_admin_client, get_supabase_user_client
 
 
@@ -449,7 +447,7 @@ def _truncate(s: str, max_chars: int) -> str:
 
 
 def _call_anthropic_feedback(*, system: str, user: str, temperature: float, max_tokens: int) -> tuple[str, str]:
-  api_key = (os.getenv("ANTHROPIC_API_KEY") or "").strip()
+  api_key = provider_api_key("anthropic")
   if not api_key:
     raise RuntimeError("Missing ANTHROPIC_API_KEY")
 
@@ -462,8 +460,8 @@ def _call_anthropic_feedback(*, system: str, user: str, temperature: float, max_
     "messages": [{"role": "user", "content": user}],
   }
 
-  with httpx.Client(timeout=httpx.Timeout(30.0, connect=10.0)) as client:
-    resp = client.post(
+  def _post() -> str:
+    resp = get_anthropic_http_client().post(
       "https://api.anthropic.com/v1/messages",
       headers={
         "x-api-key": api_key,
@@ -473,40 +471,47 @@ def _call_anthropic_feedback(*, system: str, user: str, temperature: float, max_
       json=payload,
     )
 
-  if resp.status_code >= 400:
-    raise RuntimeError(f"anthropic_http_{resp.status_code}: {resp.text[:500]}")
+    if resp.status_code >= 400:
+      raise RuntimeError(f"anthropic_http_{resp.status_code}: {resp.text[:500]}")
+
+    data = resp.json()
+    blocks = data.get("content")
+    if not isinstance(blocks, list) or not blocks:
+      raise RuntimeError("anthropic_empty_content")
 
-  data = resp.json()
-  blocks = data.get("content")
-  if not isinstance(blocks, list) or not blocks:
-    raise RuntimeError("anthropic_empty_content")
+    parts: list[str] = []
+    for b in blocks:
+      if isinstance(b, dict) and b.get("type") == "text" and isinstance(b.get("text"), str):
+        parts.append(b.get("text"))
 
-  parts: list[str] = []
-  for b in blocks:
-    if isinstance(b, dict) and b.get("type") == "text" and isinstance(b.get("text"), str):
-      parts.append(b.get("text"))
+    out = "\n".join([p.strip() for p in parts if p and p.strip()]).strip()
+    if not out:
+      raise RuntimeError("anthropic_empty_text")
+    return out
 
-  out = "\n".join([p.strip() for p in parts if p and p.strip()]).strip()
-  if not out:
-    raise RuntimeError("anthropic_empty_text")
-  return out, model
+  return complete("anthropic", payload, _post), model
 
 
 def _call_openai_feedback(*, system: str, user: str, temperature: float) -> tuple[str, str]:
-  api_key = (os.getenv("OPENAI_API_KEY") or "").strip()
+  api_key = provider_api_key("openai")
   if not api_key:
     raise RuntimeError("Missing OPENAI_API_KEY")
   model = os.getenv("DRILL_FEEDBACK_OPENAI_MODEL", "gpt-4o-mini")
-  client = OpenAI(api_key=api_key)
-  resp = client.chat.completions.create(
-    model=model,
-    temperature=temperature,
-    messages=[
-      {"role": "system", "content": system},
-      {"role": "user", "content": user},
-    ],
-  )
-  text = (resp.choices[0].message.content or "").strip()
+  client = get_openai_client(api_key)
+  messages = [
+    {"role": "system", "content": system},
+    {"role": "user", "content": user},
+  ]
+
+  def _create() -> str:
+    resp = client.chat.completions.create(
+      model=model,
+      temperature=temperature,
+      messages=messages,
+    )
+    return (resp.choices[0].message.content or "").strip()
+
+  text = complete("openai", {"model": model, "temperature": temperature, "messages": messages}, _create).strip()
   if not text:
     raise RuntimeError("openai_empty_text")
   return text, model
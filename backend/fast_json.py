@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import os
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+  import orjson
+except ModuleNotFoundError:
+  orjson = None
+
+# Opt-in fast serialization for the large read endpoints (/news/feed,
+# /news/brief, /lessons, /knowledge_lessons). Their payloads are rows we read
+# from our own tables, already shaped like the response models, so with
+# API_FAST_JSON=1 they are rendered straight to bytes by orjson instead of
+# going through jsonable_encoder and response_model re-validation.
+
+
+def fast_json_enabled() -> bool:
+  return orjson is not None and (os.getenv("API_FAST_JSON") or "0").strip().lower() in {"1", "true", "yes"}
+
+
+class FastJSONResponse(JSONResponse):
+  def render(self, content: Any) -> bytes:
+    # Same compact UTF-8 output as JSONResponse; orjson also encodes
+    # datetimes and non-str dict keys natively.
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def json_response(content: Any, **kwargs: Any) -> JSONResponse:
+  if fast_json_enabled():
+    return FastJSONResponse(content, **kwargs)
+  return JSONResponse(content, **kwargs)
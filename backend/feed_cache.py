@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+# In-process read-through cache for hot feed reads. Entries are tagged with the
+# publish generation they were read under; run_news_pipeline bumps the
+# generation after publishing cards, which invalidates every entry at once.
+# NEWS_FEED_CACHE_TTL_SECONDS still bounds staleness for cards published by
+# another process. Concurrent misses for one key share a single load.
+
+_generation_lock = threading.Lock()
+_generation = 0
+
+
+def publish_generation() -> int:
+  return _generation
+
+
+def bump_publish_generation() -> int:
+  global _generation
+  with _generation_lock:
+    _generation += 1
+    return _generation
+
+
+def _env_float(name: str, default: float) -> float:
+  raw = os.getenv(name)
+  if raw is None or raw == "":
+    return default
+  try:
+    return float(raw)
+  except Exception:
+    return default
+
+
+class ReadThroughCache:
+  def __init__(self, *, ttl_env: str, default_ttl_seconds: float, max_entries: int = 256):
+    self._ttl_env = ttl_env
+    self._default_ttl_seconds = default_ttl_seconds
+    self._max_entries = max_entries
+    self._entries: OrderedDict[Hashable, tuple[int, float, Any]] = OrderedDict()
+    self._inflight: dict[tuple[Hashable, int], asyncio.Task] = {}
+    self.hits = 0
+    self.misses = 0
+
+  def _ttl(self) -> float:
+    return _env_float(self._ttl_env, self._default_ttl_seconds)
+
+  def _lookup(self, key: Hashable, generation: int) -> tuple[bool, Any]:
+    entry = self._entries.get(key)
+    if entry is None:
+      return False, None
+    entry_generation, expires_at, value = entry
+    if entry_generation != generation or expires_at <= time.monotonic():
+      del self._entries[key]
+      return False, None
+    self._entries.move_to_end(key)
+    return True, value
+
+  async def get(self, key: Hashable, load: Callable[[], Awaitable[Any]]) -> Any:
+    ttl = self._ttl()
+    if ttl <= 0:
+      return await load()
+
+    generation = publish_generation()
+    found, value = self._lookup(key, generation)
+    if found:
+      self.hits += 1
+      return value
+
+    task = self._inflight.get((key, generation))
+    if task is None:
+      self.misses += 1
+      task = asyncio.ensure_future(self._load(key, generation, ttl, load))
+      self._inflight[(key, generation)] = task
+    # shield() so a cancelled request does not cancel the shared load.
+    return await asyncio.shield(task)
+
+  async def _load(self, key: Hashable, generation: int, ttl: float, load: Callable[[], Awaitable[Any]]) -> Any:
+    try:
+      value = await load()
+    finally:
+      self._inflight.pop((key, generation), None)
+    # Tag with the generation seen before the read: a publish that lands
+    # mid-read makes this entry stale on the next lookup.
+    self._entries[key] = (generation, time.monotonic() + ttl, value)
+    self._entries.move_to_end(key)
+    while len(self._entries) > self._max_entries:
+      self._entries.popitem(last=False)
+    return value
+
+  def clear(self) -> None:
+    self._entries.clear()
@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+import base64
+import json
+import logging
+import os
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any
+
+# Ranked reads of news_feed_cards for /news/feed, paged with keyset cursors on
+# (updated_at, id) so a deep scroll costs one page-sized query.
+#
+# Plain pages continue strictly after the last row served. Diversified pages
+# round-robin across categories, each category newest first; their cursor
+# keeps one keyset position per category (in first-seen order), so the next
+# page resumes every category where it stopped without re-reading rows that
+# were already served.
+#
+# run_news_pipeline also publishes ranked snapshots (plain and diversified) to
+# news_feed_snapshots after each run; a first page is sliced from the matching
+# snapshot with one read, and the live query remains the fallback. The daily
+# cleanup rebuilds the snapshots after deleting cards, and a snapshot older than
+# NEWS_FEED_SNAPSHOT_MAX_AGE_SECONDS is never served.
+
+FEED_COLUMNS = "id, category, card, created_at, updated_at"
+MAX_FETCH = 200
+SNAPSHOT_KEYS = ("plain", "diversified")
+
+logger = logging.getLogger("connected.news")
+
+
+def _env_int(name: str, default: int) -> int:
+  raw = os.getenv(name)
+  if raw is None or raw == "":
+    return default
+  try:
+    return int(raw)
+  except Exception:
+    return default
+
+
+def _encode_cursor(payload: dict[str, Any]) -> str:
+  raw = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+  return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, *, diversified: bool) -> dict[str, Any]:
+  try:
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    state = json.loads(raw)
+  except Exception:
+    raise ValueError("Invalid cursor")
+  if not isinstance(state, dict) or state.get("v") != 1:
+    raise ValueError("Invalid cursor")
+
+  if state.get("m") != ("d" if diversified else "p"):
+    raise ValueError("Cursor does not match the feed parameters")
+  if diversified:
+    positions = state.get("c")
+    if not isinstance(positions, list) or not all(isinstance(p, list) and len(p) == 3 for p in positions):
+      raise ValueError("Invalid cursor")
+  elif not state.get("u") or not state.get("i"):
+    raise ValueError("Invalid cursor")
+  return state
+
+
+def _quote(value: Any) -> str:
+  # Timestamps and category names contain PostgREST's reserved characters.
+  return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _after(updated_at: Any, row_id: Any) -> str:
+  u = _quote(updated_at)
+  return f"updated_at.lt.{u},and(updated_at.eq.{u},id.lt.{_quote(row_id)})"
+
+
+def keyset_filter(state: dict[str, Any] | None) -> str | None:
+  # Body of an or=(...) filter selecting the rows after `state`.
+  if not state:
+    return None
+  if state.get("m") == "p":
+    return _after(state["u"], state["i"])
+
+  positioned = [(c, u, i) for c, u, i in state.get("c") or [] if u is not None]
+  if not positioned:
+    return None
+  conditions = [f"and(category.eq.{_quote(c)},or({_after(u, i)}))" for c, u, i in positioned]
+  conditions.append(f"category.not.in.({','.join(_quote(c) for c, _, _ in positioned)})")
+  return ",".join(conditions)
+
+
+def diversify_rows(
+  rows: list[dict[str, Any]],
+  *,
+  limit: int,
+  max_per_category: int | None = None,
+  cat_order: list[str] | None = None,
+) -> tuple[list[dict[str, Any]], list[str], bool]:
+  # Returns the page, the category order (cat_order first, then first-seen)
+  # and whether any fetched rows were left unserved.
+  buckets: dict[str, deque[dict[str, Any]]] = {c: deque() for c in cat_order or []}
+  for row in rows:
+    buckets.setdefault(row.get("category") or "", deque()).append(row)
+
+  taken = dict.fromkeys(buckets, 0)
+  out: list[dict[str, Any]] = []
+  while len(out) < limit:
+    progressed = False
+    for cat, bucket in buckets.items():
+      if not bucket or (max_per_category and taken[cat] >= max_per_category):
+        continue
+      out.append(bucket.popleft())
+      taken[cat] += 1
+      progressed = True
+      if len(out) >= limit:
+        break
+    if not progressed:
+      break
+
+  return out, list(buckets), any(buckets.values())
+
+
+def _cursor_after(
+  page: list[dict[str, Any]],
+  *,
+  diversified: bool,
+  cat_order: list[str],
+  after: dict[str, Any] | None = None,
+) -> str:
+  if not diversified:
+    return _encode_cursor({"v": 1, "m": "p", "u": page[-1].get("updated_at"), "i": page[-1].get("id")})
+  positions: dict[str, tuple[Any, Any]] = {c: (u, i) for c, u, i in (after or {}).get("c") or []}
+  for row in page:
+    positions[row.get("category") or ""] = (row.get("updated_at"), row.get("id"))
+  return _encode_cursor({"v": 1, "m": "d", "c": [[c, *positions.get(c, (None, None))] for c in cat_order]})
+
+
+def build_feed_snapshots(rows: list[dict[str, Any]], *, max_per_category: int | None) -> list[dict[str, Any]]:
+  # `rows` are the newest published cards, up to MAX_FETCH + 1; the extra row
+  # only records that the feed continues past the snapshot.
+  window = rows[:MAX_FETCH]
+  more = len(rows) > MAX_FETCH
+  diversified, _, leftover = diversify_rows(window, limit=MAX_FETCH, max_per_category=max_per_category)
+  return [
+    {"key": "plain", "rows": window, "max_per_category": None, "has_more": more},
+    {"key": "diversified", "rows": diversified, "max_per_category": max_per_category, "has_more": more or leftover},
+  ]
+
+
+def publish_feed_snapshots(supabase: Any, *, max_per_category: int | None) -> int:
+  res = (
+    supabase.table("news_feed_cards")
+    .select(FEED_COLUMNS)
+    .eq("published", True)
+    .order("updated_at", desc=True)
+    .order("id", desc=True)
+    .limit(MAX_FETCH + 1)
+    .execute()
+  )
+  rows = [r for r in res.data or [] if isinstance(r, dict)]
+  built_at = datetime.now(timezone.utc).isoformat()
+  snapshots = [{**s, "built_at": built_at} for s in build_feed_snapshots(rows, max_per_category=max_per_category)]
+  supabase.table("news_feed_snapshots").upsert(snapshots, on_conflict="key").execute()
+  return len(rows)
+
+
+def discard_feed_snapshots(supabase: Any) -> None:
+  # A snapshot that missed a publish must not be served; reads fall back to
+  # the live query until the next run rebuilds it.
+  supabase.table("news_feed_snapshots").delete().in_("key", list(SNAPSHOT_KEYS)).execute()
+
+
+def refresh_feed_snapshots(supabase: Any, *, max_per_category: int | None) -> bool:
+  # Rebuilds the snapshots from the current cards; if that fails they are
+  # discarded so a stale snapshot is never served. Returns whether they were
+  # rebuilt; raises only when they could not be discarded either.
+  try:
+    publish_feed_snapshots(supabase, max_per_category=max_per_category)
+    return True
+  except Exception:
+    logger.exception("news_feed_snapshots_failed")
+  discard_feed_snapshots(supabase)
+  return False
+
+
+def _snapshot_expired(snapshot: dict[str, Any], now: datetime | None = None) -> bool:
+  max_age = _env_int("NEWS_FEED_SNAPSHOT_MAX_AGE_SECONDS", 6 * 3600)
+  if max_age <= 0:
+    return False
+  try:
+    built_at = datetime.fromisoformat(str(snapshot.get("built_at")))
+  except ValueError:
+    return True
+  if built_at.tzinfo is None:
+    built_at = built_at.replace(tzinfo=timezone.utc)
+  return ((now or datetime.now(timezone.utc)) - built_at).total_seconds() > max_age
+
+
+def page_from_snapshot(
+  snapshot: dict[str, Any],
+  *,
+  limit: int,
+  diversified: bool,
+  now: datetime | None = None,
+) -> dict[str, Any] | None:
+  if _snapshot_expired(snapshot, now):
+    return None
+  rows = [r for r in snapshot.get("rows") or [] if isinstance(r, dict)]
+  more = bool(snapshot.get("has_more"))
+  if limit > len(rows) and more:
+    return None
+
+  page = rows[:limit]
+  next_cursor = None
+  if page and (len(rows) > limit or more):
+    cat_order = list(dict.fromkeys(r.get("category") or "" for r in rows))
+    next_cursor = _cursor_after(page, diversified=diversified, cat_order=cat_order)
+  return {"data": page, "next_cursor": next_cursor}
+
+
+def snapshots_enabled() -> bool:
+  return (os.getenv("NEWS_FEED_SNAPSHOTS") or "1").strip().lower() in {"1", "true", "yes"}
+
+
+def snapshot_max_per_category() -> int | None:
+  return _env_int("NEWS_FEED_SNAPSHOT_MAX_PER_CATEGORY", 0) or None
+
+
+async def _load_snapshot(supabase: Any, key: str) -> dict[str, Any] | None:
+  res = await (
+    supabase.table("news_feed_snapshots")
+    .select("rows, max_per_category, has_more, built_at")
+    .eq("key", key)
+    .limit(1)
+    .execute()
+  )
+  row0 = res.data[0] if isinstance(res.data, list) and res.data else None
+  return row0 if isinstance(row0, dict) else None
+
+
+async def load_news_feed(
+  supabase: Any,
+  *,
+  limit: int,
+  diversify: bool,
+  max_per_category: int | None,
+  after: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+  diversified = bool(diversify or max_per_category)
+  if after is None and snapshots_enabled():
+    snapshot = await _load_snapshot(supabase, "diversified" if diversified else "plain")
+    if snapshot is not None and (not diversified or snapshot.get("max_per_category") == max_per_category):
+      page = page_from_snapshot(snapshot, limit=limit, diversified=diversified)
+      if page is not None:
+        return page
+
+  # One extra row tells a plain page whether another one exists; diversified
+  # pages over-fetch so the round-robin has several categories to draw from.
+  fetch_limit = min(MAX_FETCH, max(limit * 4, limit)) if diversified else limit + 1
+
+  query = supabase.table("news_feed_cards").select(FEED_COLUMNS).eq("published", True)
+  keyset = keyset_filter(after)
+  if keyset:
+    query = query.or_(keyset)
+  res = await query.order("updated_at", desc=True).order("id", desc=True).limit(fetch_limit).execute()
+  if getattr(res, "error", None):
+    raise RuntimeError(str(res.error))
+  rows = [r for r in res.data or [] if isinstance(r, dict)]
+
+  if not diversified:
+    page = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+      next_cursor = _cursor_after(page, diversified=False, cat_order=[])
+    return {"data": page, "next_cursor": next_cursor}
+
+  page, cat_order, leftover = diversify_rows(
+    rows,
+    limit=limit,
+    max_per_category=max_per_category,
+    cat_order=[c for c, _, _ in (after or {}).get("c") or []],
+  )
+  next_cursor = None
+  if leftover or len(rows) >= fetch_limit:
+    next_cursor = _cursor_after(page, diversified=True, cat_order=cat_order, after=after)
+  return {"data": page, "next_cursor": next_cursor}
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from dataclasses import asdict
 from typing import Any, TypedDict
 
 from langgraph.graph import END, StateGraph
@@ -13,15 +14,7 @@ class NewsJobState(TypedDict, total=False):
 
 def _run(_: NewsJobState) -> NewsJobState:
   res: PipelineResult = run_news_pipeline()
-  return {
-    "result": {
-      "sources": res.sources,
-      "articles_fetched": res.articles_fetched,
-      "articles_upserted": res.articles_upserted,
-      "clusters_touched": res.clusters_touched,
-      "cards_published": res.cards_published,
-    }
-  }
+  return {"result": asdict(res)}
 
 
 def build_news_job_graph():
@@ -2,10 +2,10 @@ from __future__ import annotations
 
 from typing import Any
 
-from supabase_client import get_supabase_user_client
+from supabase_client import get_supabase_user_client, get_supabase_user_client_async
 
 
-def list_skill_lessons(
+async def list_skill_lessons_async(
   *,
   user_access_token: str,
   phase: str | None,
@@ -19,7 +19,7 @@ def list_skill_lessons(
   limit = max(1, min(int(limit or 20), 100))
   offset = max(0, int(offset or 0))
 
-  supabase = get_supabase_user_client(user_access_token)
+  supabase = await get_supabase_user_client_async(user_access_token)
   query = supabase.table("lessons").select(
     "lesson_id,title,phase,domain,tier,difficulty,read_time_minutes,quality_score,actionability_score,tags"
   )
@@ -37,7 +37,7 @@ def list_skill_lessons(
 
   query = query.order("actionability_score", desc=True).order("quality_score", desc=True)
 
-  res = query.range(offset, offset + limit - 1).execute()
+  res = await query.range(offset, offset + limit - 1).execute()
   return res.data or []
 
 
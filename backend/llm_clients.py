@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+
+# Long-lived provider clients shared by every service. Building a client per
+# call throws away TLS sessions and keep-alive connections, so each provider
+# gets one pooled httpx client for the life of the process.
+#
+# complete() sits in front of every provider call. LLM_PROVIDER_MODE=record
+# appends each request/response pair to LLM_RECORDING_PATH (JSONL) and
+# LLM_PROVIDER_MODE=replay serves them back without network access, after
+# LLM_REPLAY_LATENCY_MS of synthetic latency ("recorded" replays the latency
+# measured while recording), so pipeline runs are reproducible offline.
+
+logger = logging.getLogger("connected")
+
+_API_KEY_ENV = {"openai": "OPENAI_API_KEY", "anthropic": "ANTHROPIC_API_KEY"}
+
+_lock = threading.Lock()
+_openai_http: httpx.Client | None = None
+_openai_clients: dict[str, OpenAI] = {}
+_anthropic_http: httpx.Client | None = None
+_async_openai_http: httpx.AsyncClient | None = None
+_async_openai_clients: dict[str, AsyncOpenAI] = {}
+
+
+def _env_int(name: str, default: int) -> int:
+  raw = os.getenv(name)
+  if raw is None or raw == "":
+    return default
+  try:
+    return int(raw)
+  except Exception:
+    return default
+
+
+def _http2_enabled() -> bool:
+  if (os.getenv("LLM_HTTP2") or "1").strip().lower() not in {"1", "true", "yes"}:
+    return False
+  try:
+    import h2  # noqa: F401
+  except Exception:
+    return False
+  return True
+
+
+def _pool_limits() -> httpx.Limits:
+  return httpx.Limits(
+    max_connections=max(1, _env_int("LLM_HTTP_MAX_CONNECTIONS", 20)),
+    max_keepalive_connections=max(1, _env_int("LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS", 10)),
+    keepalive_expiry=float(max(1, _env_int("LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS", 60))),
+  )
+
+
+def get_openai_client(api_key: str | None = None) -> OpenAI:
+  global _openai_http
+  key = api_key or os.getenv("OPENAI_API_KEY") or ""
+  with _lock:
+    client = _openai_clients.get(key)
+    if client is None:
+      if _openai_http is None:
+        # DefaultHttpxClient keeps the SDK's own timeout and redirect defaults.
+        _openai_http = DefaultHttpxClient(limits=_pool_limits(), http2=_http2_enabled())
+      client = OpenAI(api_key=key or None, http_client=_openai_http)
+      _openai_clients[key] = client
+    return client
+
+
+def get_anthropic_http_client() -> httpx.Client:
+  global _anthropic_http
+  with _lock:
+    if _anthropic_http is None:
+      _anthropic_http = httpx.Client(
+        timeout=httpx.Timeout(30.0, connect=10.0),
+        limits=_pool_limits(),
+        http2=_http2_enabled(),
+      )
+    return _anthropic_http
+
+
+def get_async_openai_client(api_key: str | None = None) -> AsyncOpenAI:
+  # For `async def` endpoints; the pool belongs to the app's event loop.
+  global _async_openai_http
+  key = api_key or os.getenv("OPENAI_API_KEY") or ""
+  with _lock:
+    client = _async_openai_clients.get(key)
+    if client is None:
+      if _async_openai_http is None:
+        _async_openai_http = DefaultAsyncHttpxClient(limits=_pool_limits(), http2=_http2_enabled())
+      client = AsyncOpenAI(api_key=key or None, http_client=_async_openai_http)
+      _async_openai_clients[key] = client
+    return client
+
+
+async def aclose_llm_clients() -> None:
+  global _async_openai_http
+  with _lock:
+    client = _async_openai_http
+    _async_openai_http = None
+    _async_openai_clients.clear()
+  if client is not None:
+    await client.aclose()
+  close_llm_clients()
+
+
+def close_llm_clients() -> None:
+  global _openai_http, _anthropic_http
+  with _lock:
+    for client in (_openai_http, _anthropic_http):
+      if client is not None:
+        client.close()
+    _openai_http = None
+    _anthropic_http = None
+    _openai_clients.clear()
+
+
+def provider_mode() -> str:
+  mode = (os.getenv("LLM_PROVIDER_MODE") or "live").strip().lower()
+  return mode if mode in {"live", "record", "replay"} else "live"
+
+
+def provider_api_key(provider: str) -> str | None:
+  # Replay needs no credentials; a placeholder keeps callers on the LLM path.
+  key = (os.getenv(_API_KEY_ENV[provider]) or "").strip() or None
+  if key is None and provider_mode() == "replay":
+    return "replay"
+  return key
+
+
+def _request_key(provider: str, request: dict[str, Any]) -> str:
+  raw = json.dumps({"provider": provider, "request": request}, sort_keys=True, ensure_ascii=False, default=str)
+  return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class _Recording:
+  def __init__(self, path: Path):
+    self.path = path
+    self._entries: dict[str, dict[str, Any]] | None = None
+    self._lock = threading.Lock()
+
+  def _load(self) -> dict[str, dict[str, Any]]:
+    if self._entries is None:
+      entries: dict[str, dict[str, Any]] = {}
+      if self.path.exists():
+        with self.path.open(encoding="utf-8") as f:
+          for line in f:
+            line = line.strip()
+            if not line:
+              continue
+            try:
+              entry = json.loads(line)
+            except Exception:
+              continue
+            if isinstance(entry, dict) and entry.get("key"):
+              entries[entry["key"]] = entry
+      self._entries = entries
+    return self._entries
+
+  def get(self, key: str) -> dict[str, Any] | None:
+    with self._lock:
+      return self._load().get(key)
+
+  def add(self, entry: dict[str, Any]) -> None:
+    with self._lock:
+      self._load()[entry["key"]] = entry
+      self.path.parent.mkdir(parents=True, exist_ok=True)
+      with self.path.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+
+
+_recordings: dict[str, _Recording] = {}
+
+
+def _recording() -> _Recording:
+  path = os.getenv("LLM_RECORDING_PATH") or "llm_recordings.jsonl"
+  with _lock:
+    rec = _recordings.get(path)
+    if rec is None:
+      rec = _Recording(Path(path))
+      _recordings[path] = rec
+    return rec
+
+
+def _replay_latency_seconds(entry: dict[str, Any]) -> float:
+  raw = (os.getenv("LLM_REPLAY_LATENCY_MS") or "0").strip().lower()
+  if raw == "recorded":
+    return max(0.0, float(entry.get("latency_ms") or 0)) / 1000
+  try:
+    return max(0.0, float(raw)) / 1000
+  except Exception:
+    return 0.0
+
+
+def complete(provider: str, request: dict[str, Any], call: Callable[[], str]) -> str:
+  # `request` must hold everything that determines the response (model,
+  # messages, sampling params); `call` performs the live request and returns
+  # the response text.
+  mode = provider_mode()
+  if mode == "live":
+    return call()
+
+  key = _request_key(provider, request)
+  if mode == "replay":
+    entry = _recording().get(key)
+    if entry is None:
+      raise RuntimeError(f"llm_replay_miss: {provider} {key[:12]}")
+    delay = _replay_latency_seconds(entry)
+    if delay:
+      time.sleep(delay)
+    return entry.get("response") or ""
+
+  start = time.perf_counter()
+  text = call()
+  latency_ms = round((time.perf_counter() - start) * 1000, 1)
+  try:
+    _recording().add(
+      {"key": key, "provider": provider, "request": request, "response": text, "latency_ms": latency_ms}
+    )
+  except Exception:
+    logger.exception("llm_recording_write_failed")
+  return text
+
+
+def complete_stream(provider: str, request: dict[str, Any], call: Callable[[], Iterator[str]]) -> Iterator[str]:
+  # Streaming counterpart of complete(); recordings are shared, so a streamed
+  # request replays a response recorded by either path.
+  mode = provider_mode()
+  if mode == "live":
+    yield from call()
+    return
+
+  key = _request_key(provider, request)
+  if mode == "replay":
+    entry = _recording().get(key)
+    if entry is None:
+      raise RuntimeError(f"llm_replay_miss: {provider} {key[:12]}")
+    delay = _replay_latency_seconds(entry)
+    if delay:
+      time.sleep(delay)
+    text = entry.get("response") or ""
+    for i in range(0, len(text), 16):
+      yield text[i : i + 16]
+    return
+
+  start = time.perf_counter()
+  parts: list[str] = []
+  for delta in call():
+    parts.append(delta)
+    yield delta
+  latency_ms = round((time.perf_counter() - start) * 1000, 1)
+  try:
+    _recording().add(
+      {"key": key, "provider": provider, "request": request, "response": "".join(parts), "latency_ms": latency_ms}
+    )
+  except Exception:
+    logger.exception("llm_recording_write_failed")
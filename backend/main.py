@@ -1,8 +1,13 @@
+import base64
+import hashlib
+import json
 import logging
 import os
 import time
 import uuid
+from contextlib import asynccontextmanager
 from contextvars import ContextVar
+from dataclasses import asdict
 from datetime import datetime, time as dt_time, timezone
 from pathlib import Path
 from typing import Any
@@ -12,9 +17,8 @@ from zoneinfo import ZoneInfo
 from dotenv import dotenv_values, load_dotenv
 from fastapi import FastAPI, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, Response
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 import httpx
-from openai import OpenAI
 
 try:
   from langgraph_news import build_news_job_graph
@@ -25,7 +29,26 @@ try:
   from langgraph_brief import build_brief_job_graph
 except ModuleNotFoundError:
   build_brief_job_graph = None
-from supabase_client import get_supabase_admin_client
+from brief_store import (
+  ENCODED_COLUMNS,
+  edition_index,
+  edition_payload,
+  index_key,
+  latest_edition,
+  precompress_enabled,
+)
+from compression import CompressionMiddleware, acceptable_encodings, weak_etag
+from fast_json import fast_json_enabled, json_response
+from feed_cache import ReadThroughCache, bump_publish_generation
+from feed_service import (
+  decode_cursor,
+  load_news_feed,
+  refresh_feed_snapshots,
+  snapshot_max_per_category,
+  snapshots_enabled,
+)
+from llm_clients import aclose_llm_clients, get_async_openai_client
+from supabase_client import aclose_supabase_clients, get_supabase_admin_client, get_supabase_admin_client_async
 from api_models import (
   AuthEmailPasswordRequest,
   AuthMeResponse,
@@ -50,13 +73,13 @@ from api_models import (
   SkillLessonDetail,
   SkillLessonSummary,
 )
-from auth import get_current_user
+from auth import aclose_auth_client, forget_token, get_current_user, get_current_user_async
 from coach_models import SendMessageRequest, SendMessageResponse, StartSessionRequest, StartSessionResponse
-from coach_service import send_message, start_session
+from coach_service import send_message, start_session, stream_message
 from brief_pipeline import run_daily_brief
 from mascot_service import advise as mascot_advise
 from drill_service import complete_drill_session, get_drill_session_with_feedback, list_drill_sessions, record_vapi_event, start_drill
-from lesson_service import get_knowledge_lesson, get_skill_lesson, list_knowledge_lessons, list_skill_lessons
+from lesson_service import get_knowledge_lesson, get_skill_lesson, list_knowledge_lessons, list_skill_lessons_async
 from progress_service import list_lesson_progress, progress_summary, upsert_lesson_progress
 from learning_path_service import recommend_learning_path
 
@@ -100,7 +123,16 @@ for _handler in logging.getLogger().handlers:
 
 logger = logging.getLogger("connected")
 
-app = FastAPI(title="Connected AI Service")
+@asynccontextmanager
+async def _lifespan(_: FastAPI):
+  yield
+  # Pooled provider, auth and Supabase connections live for the whole process.
+  await aclose_llm_clients()
+  await aclose_auth_client()
+  await aclose_supabase_clients()
+
+
+app = FastAPI(title="Connected AI Service", lifespan=_lifespan)
 
 web_origin_env_raw = os.getenv("WEB_ORIGIN")
 web_origin_env = (web_origin_env_raw or "http://localhost:3000").strip()
@@ -132,6 +164,7 @@ app.add_middleware(
   allow_methods=["*"] ,
   allow_headers=["*"] ,
 )
+app.add_middleware(CompressionMiddleware)
 
 news_job = build_news_job_graph() if build_news_job_graph else None
 brief_job = build_brief_job_graph() if build_brief_job_graph else None
@@ -241,8 +274,8 @@ def config():
 
 
 @app.post("/tts")
-def tts_endpoint(payload: TtsRequest, authorization: str | None = Header(default=None)):
-  _ = get_current_user(authorization)
+async def tts_endpoint(payload: TtsRequest, authorization: str | None = Header(default=None)):
+  _ = await get_current_user_async(authorization)
 
   if not os.getenv("OPENAI_API_KEY"):
     raise HTTPException(status_code=500, detail="OPENAI_API_KEY not configured")
@@ -257,8 +290,8 @@ def tts_endpoint(payload: TtsRequest, authorization: str | None = Header(default
   voice = (payload.voice or os.getenv("OPENAI_TTS_VOICE") or "alloy").strip()
   fmt = (payload.format or os.getenv("OPENAI_TTS_FORMAT") or "mp3").strip().lower()
 
-  client = OpenAI()
-  audio = client.audio.speech.create(
+  client = get_async_openai_client()
+  audio = await client.audio.speech.create(
     model=model,
     voice=voice,
     input=text,
@@ -303,13 +336,7 @@ def run_news_job(x_admin_key: str | None = Header(default=None)):
     res = run_news_pipeline()
     out = {
       "mode": "direct",
-      "result": {
-        "sources": res.sources,
-        "articles_fetched": res.articles_fetched,
-        "articles_upserted": res.articles_upserted,
-        "clusters_touched": res.clusters_touched,
-        "cards_published": res.cards_published,
-      },
+      "result": asdict(res),
     }
     logger.info("news_job_done", extra={"result": out.get("result")})
     return out
@@ -384,11 +411,14 @@ def cleanup_daily(x_admin_key: str | None = Header(default=None)):
   cutoff_ts = cutoff_dt.isoformat()
 
   deleted_briefs = 0
+  deleted_editions = 0
   deleted_cards = 0
 
   try:
     briefs_resp = supabase.table("news_daily_briefs").delete().lt("brief_date", today).execute()
     deleted_briefs = len(briefs_resp.data or [])
+    editions_resp = supabase.table("news_daily_brief_editions").delete().lt("brief_date", today).execute()
+    deleted_editions = len(editions_resp.data or [])
   except Exception as e:
     raise HTTPException(status_code=500, detail=f"Failed to cleanup briefs: {e}")
 
@@ -398,11 +428,34 @@ def cleanup_daily(x_admin_key: str | None = Header(default=None)):
   except Exception as e:
     raise HTTPException(status_code=500, detail=f"Failed to cleanup feed cards: {e}")
 
+  try:
+    from news_pipeline import prune_card_cache
+
+    deleted_card_cache = prune_card_cache(supabase)
+  except Exception as e:
+    raise HTTPException(status_code=500, detail=f"Failed to cleanup card cache: {e}")
+
+  # Published snapshots and cached feed pages still list the deleted cards.
+  snapshots_rebuilt = False
+  if deleted_cards:
+    bump_publish_generation()
+    if snapshots_enabled():
+      try:
+        snapshots_rebuilt = refresh_feed_snapshots(supabase, max_per_category=snapshot_max_per_category())
+      except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to refresh feed snapshots: {e}")
+
   return {
     "ok": True,
     "today": today,
     "cutoff_ts": cutoff_ts,
-    "deleted": {"news_daily_briefs": deleted_briefs, "news_feed_cards": deleted_cards},
+    "deleted": {
+      "news_daily_briefs": deleted_briefs,
+      "news_daily_brief_editions": deleted_editions,
+      "news_feed_cards": deleted_cards,
+      "news_card_cache": deleted_card_cache,
+    },
+    "feed_snapshots_rebuilt": snapshots_rebuilt,
   }
 
 
@@ -534,6 +587,7 @@ def auth_logout(authorization: str | None = Header(default=None)):
     )
   if resp.status_code not in {200, 204}:
     raise _auth_error(resp)
+  forget_token(user.access_token)
   return {"ok": True}
 
 
@@ -543,87 +597,93 @@ def auth_me(authorization: str | None = Header(default=None)):
   return AuthMeResponse(id=user.id, email=user.email)
 
 
+_feed_cache = ReadThroughCache(ttl_env="NEWS_FEED_CACHE_TTL_SECONDS", default_ttl_seconds=60)
+
+
+_FEED_CACHE_CONTROL = "public, max-age=30, stale-while-revalidate=300"
+_BRIEF_CACHE_CONTROL = "public, max-age=60, stale-while-revalidate=600"
+
+
+def _etag(*parts: Any) -> str:
+  raw = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+  return '"' + hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+  # If-None-Match uses weak comparison, so W/ prefixes are ignored.
+  if not if_none_match:
+    return False
+  if if_none_match.strip() == "*":
+    return True
+  for tag in if_none_match.split(","):
+    tag = tag.strip()
+    if tag.startswith("W/"):
+      tag = tag[2:]
+    if tag == etag:
+      return True
+  return False
+
+
+def _conditional_json(payload: Any, *, etag: str, cache_control: str, if_none_match: str | None) -> Response:
+  headers = {"ETag": etag, "Cache-Control": cache_control}
+  if _etag_matches(if_none_match, etag):
+    return Response(status_code=304, headers=headers)
+  return json_response(payload, headers=headers)
+
+
+def _feed_etag(params: tuple[Any, ...], page: dict[str, Any]) -> str:
+  # Card upserts always bump updated_at, so ids plus timestamps identify the
+  # page without hashing the cards themselves.
+  rows = page.get("data") or []
+  return _etag("feed", params, page.get("next_cursor"), [(r.get("id"), r.get("updated_at")) for r in rows])
+
+
+async def _load_news_feed(
+  limit: int,
+  diversify: bool,
+  max_per_category: int | None,
+  after: dict[str, Any] | None,
+  params: tuple[Any, ...],
+) -> tuple[dict[str, Any], str]:
+  supabase = await get_supabase_admin_client_async()
+  page = await load_news_feed(
+    supabase,
+    limit=limit,
+    diversify=diversify,
+    max_per_category=max_per_category,
+    after=after,
+  )
+  return page, _feed_etag(params, page)
+
+
 @app.get("/news/feed")
-def get_news_feed(
+async def get_news_feed(
   limit: int = Query(default=50, ge=1, le=200),
   diversify: bool = Query(default=False),
   max_per_category: int | None = Query(default=None, ge=1, le=50),
+  cursor: str | None = Query(default=None, max_length=4096),
+  if_none_match: str | None = Header(default=None),
 ):
-  supabase = get_supabase_admin_client()
-  fetch_limit = limit
-  if diversify or max_per_category:
-    fetch_limit = min(200, max(limit * 4, limit))
-  res = (
-    supabase.table("news_feed_cards")
-    .select("id, category, card, created_at, updated_at")
-    .eq("published", True)
-    .order("updated_at", desc=True)
-    .limit(fetch_limit)
-    .execute()
+  after = None
+  if cursor:
+    try:
+      after = decode_cursor(cursor, diversified=bool(diversify or max_per_category))
+    except ValueError as e:
+      raise HTTPException(status_code=400, detail=str(e))
+
+  params = (limit, diversify, max_per_category, cursor)
+  page, etag = await _feed_cache.get(
+    params,
+    lambda: _load_news_feed(limit, diversify, max_per_category, after, params),
   )
-  if getattr(res, "error", None):
-    raise HTTPException(status_code=500, detail=str(res.error))
+  return _conditional_json(page, etag=etag, cache_control=_FEED_CACHE_CONTROL, if_none_match=if_none_match)
 
-  rows = res.data or []
-  if not diversify and not max_per_category:
-    return {"data": rows[:limit]}
-
-  by_cat: dict[str, list[dict[str, Any]]] = {}
-  cat_order: list[str] = []
-  for row in rows:
-    if not isinstance(row, dict):
-      continue
-    cat = row.get("category") or ""
-    if cat not in by_cat:
-      by_cat[cat] = []
-      cat_order.append(cat)
-    by_cat[cat].append(row)
-
-  if max_per_category:
-    for cat in list(by_cat.keys()):
-      by_cat[cat] = (by_cat.get(cat) or [])[:max_per_category]
-
-  out: list[dict[str, Any]] = []
-  while len(out) < limit:
-    progressed = False
-    for cat in cat_order:
-      bucket = by_cat.get(cat) or []
-      if not bucket:
-        continue
-      out.append(bucket.pop(0))
-      progressed = True
-      if len(out) >= limit:
-        break
-    if not progressed:
-      break
-
-  return {"data": out}
 
+def _brief_etag(audience: str, brief_date: str, edition: str | None, stamp: Any) -> str:
+  return _etag("brief", audience, brief_date, edition or "", stamp)
 
-@app.get("/news/brief")
-def get_news_brief(
-  audience: str = Query(default="global"),
-  brief_date: str | None = Query(default=None),
-  edition: str | None = Query(default=None),
-):
-  supabase = get_supabase_admin_client()
-  if not brief_date:
-    brief_date = datetime.now(_app_tz()).date().isoformat()
-  res = (
-    supabase.table("news_daily_briefs")
-    .select("brief")
-    .eq("brief_date", brief_date)
-    .eq("audience", audience)
-    .limit(1)
-    .execute()
-  )
-  if getattr(res, "error", None):
-    raise HTTPException(status_code=500, detail=str(res.error))
-  row0 = res.data[0] if isinstance(res.data, list) and res.data else None
-  container = (row0 or {}).get("brief") if isinstance(row0, dict) else None
-  if not isinstance(container, dict):
-    return {"audience": audience, "brief_date": brief_date, "edition": None, "brief": None}
 
+def _brief_payload(audience: str, brief_date: str, edition: str | None, container: dict[str, Any]) -> dict[str, Any]:
   # Backward compatible: either container has editions, or it is already an edition-like brief.
   editions = container.get("editions") if isinstance(container.get("editions"), dict) else None
   latest = container.get("latest_edition") if isinstance(container.get("latest_edition"), str) else None
@@ -652,6 +712,141 @@ def get_news_brief(
   }
 
 
+async def _precompressed_brief(
+  supabase: Any,
+  *,
+  audience: str,
+  brief_date: str,
+  edition: str,
+  index: dict[str, Any],
+  accept_encoding: str | None,
+) -> tuple[str, bytes] | None:
+  # Reads only the stored encodings the client accepts; a body built against
+  # an older edition index is ignored.
+  accepted = acceptable_encodings(accept_encoding, ENCODED_COLUMNS)
+  if not accepted:
+    return None
+  res = await (
+    supabase.table("news_daily_brief_editions")
+    .select(", ".join(["body_key", *(ENCODED_COLUMNS[e] for e in accepted)]))
+    .eq("brief_date", brief_date)
+    .eq("audience", audience)
+    .eq("edition", edition)
+    .limit(1)
+    .execute()
+  )
+  row0 = res.data[0] if isinstance(res.data, list) and res.data else None
+  if not isinstance(row0, dict) or row0.get("body_key") != index_key(index):
+    return None
+  for encoding in accepted:
+    encoded = row0.get(ENCODED_COLUMNS[encoding])
+    if encoded:
+      return encoding, base64.b64decode(encoded)
+  return None
+
+
+@app.get("/news/brief")
+async def get_news_brief(
+  audience: str = Query(default="global"),
+  brief_date: str | None = Query(default=None),
+  edition: str | None = Query(default=None),
+  if_none_match: str | None = Header(default=None),
+  accept_encoding: str | None = Header(default=None),
+):
+  supabase = await get_supabase_admin_client_async()
+  if not brief_date:
+    brief_date = datetime.now(_app_tz()).date().isoformat()
+
+  index_res = await (
+    supabase.table("news_daily_brief_editions")
+    .select("edition, updated_at")
+    .eq("brief_date", brief_date)
+    .eq("audience", audience)
+    .execute()
+  )
+  index = edition_index(index_res.data or [])
+  if index:
+    # The edition index doubles as the validator, so a 304 costs one small
+    # read and a 200 reads only the selected edition.
+    latest = latest_edition(index)
+    selected = (edition or latest or "morning").strip().lower()
+    etag = _brief_etag(audience, brief_date, edition, sorted(index.items()))
+    headers = {"ETag": etag, "Cache-Control": _BRIEF_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+    if _etag_matches(if_none_match, etag):
+      return Response(status_code=304, headers=headers)
+    if selected in index and precompress_enabled():
+      stored = await _precompressed_brief(
+        supabase,
+        audience=audience,
+        brief_date=brief_date,
+        edition=selected,
+        index=index,
+        accept_encoding=accept_encoding,
+      )
+      if stored:
+        encoding, body = stored
+        return Response(
+          body,
+          media_type="application/json",
+          headers={**headers, "ETag": weak_etag(etag), "Content-Encoding": encoding},
+        )
+    brief = None
+    if selected in index:
+      res = await (
+        supabase.table("news_daily_brief_editions")
+        .select("brief")
+        .eq("brief_date", brief_date)
+        .eq("audience", audience)
+        .eq("edition", selected)
+        .limit(1)
+        .execute()
+      )
+      row0 = res.data[0] if isinstance(res.data, list) and res.data else None
+      brief = row0.get("brief") if isinstance(row0, dict) else None
+    payload = edition_payload(audience=audience, brief_date=brief_date, edition=selected, index=index, brief=brief)
+    return json_response(payload, headers=headers)
+
+  # Legacy day container holding every edition.
+  if if_none_match:
+    # Revalidation reads only the container's timestamp, not every edition.
+    res = await (
+      supabase.table("news_daily_briefs")
+      .select("created_at, stamp:brief->>updated_at")
+      .eq("brief_date", brief_date)
+      .eq("audience", audience)
+      .limit(1)
+      .execute()
+    )
+    row0 = res.data[0] if isinstance(res.data, list) and res.data else None
+    if isinstance(row0, dict):
+      etag = _brief_etag(audience, brief_date, edition, row0.get("stamp") or row0.get("created_at"))
+      if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": _BRIEF_CACHE_CONTROL})
+
+  res = await (
+    supabase.table("news_daily_briefs")
+    .select("brief, created_at")
+    .eq("brief_date", brief_date)
+    .eq("audience", audience)
+    .limit(1)
+    .execute()
+  )
+  if getattr(res, "error", None):
+    raise HTTPException(status_code=500, detail=str(res.error))
+  row0 = res.data[0] if isinstance(res.data, list) and res.data else None
+  container = (row0 or {}).get("brief") if isinstance(row0, dict) else None
+  if not isinstance(container, dict):
+    return {"audience": audience, "brief_date": brief_date, "edition": None, "brief": None}
+
+  etag = _brief_etag(audience, brief_date, edition, container.get("updated_at") or row0.get("created_at"))
+  return _conditional_json(
+    _brief_payload(audience, brief_date, edition, container),
+    etag=etag,
+    cache_control=_BRIEF_CACHE_CONTROL,
+    if_none_match=if_none_match,
+  )
+
+
 @app.post("/coach/sessions/start", response_model=StartSessionResponse)
 def coach_start_session(payload: StartSessionRequest, authorization: str | None = Header(default=None)):
   user = get_current_user(authorization)
@@ -668,7 +863,7 @@ def coach_start_session(payload: StartSessionRequest, authorization: str | None
 
 
 @app.get("/lessons", response_model=list[SkillLessonSummary])
-def list_lessons_endpoint(
+async def list_lessons_endpoint(
   authorization: str | None = Header(default=None),
   phase: str | None = Query(default=None),
   domain: str | None = Query(default=None),
@@ -678,8 +873,8 @@ def list_lessons_endpoint(
   limit: int = Query(default=20),
   offset: int = Query(default=0),
 ):
-  user = get_current_user(authorization)
-  return list_skill_lessons(
+  user = await get_current_user_async(authorization)
+  rows = await list_skill_lessons_async(
     user_access_token=user.access_token,
     phase=phase,
     domain=domain,
@@ -689,6 +884,10 @@ def list_lessons_endpoint(
     limit=limit,
     offset=offset,
   )
+  if fast_json_enabled():
+    # Rows are selected with exactly the SkillLessonSummary columns.
+    return json_response(rows)
+  return rows
 
 
 @app.get("/lessons/{lesson_id}", response_model=SkillLessonDetail)
@@ -710,7 +909,7 @@ def list_knowledge_lessons_endpoint(
   offset: int = Query(default=0),
 ):
   user = get_current_user(authorization)
-  return list_knowledge_lessons(
+  rows = list_knowledge_lessons(
     user_access_token=user.access_token,
     category=category,
     difficulty=difficulty,
@@ -718,6 +917,10 @@ def list_knowledge_lessons_endpoint(
     limit=limit,
     offset=offset,
   )
+  if fast_json_enabled():
+    # Rows are selected with exactly the KnowledgeLessonSummary columns.
+    return json_response(rows)
+  return rows
 
 
 @app.get("/knowledge_lessons/{lesson_id}", response_model=KnowledgeLessonDetail)
@@ -800,6 +1003,44 @@ def coach_send_message(session_id: str, payload: SendMessageRequest, authorizati
   return SendMessageResponse(session_id=session_id, user_message=user_msg, coach_message=coach_msg)
 
 
+def _sse_event(event: str, data: Any) -> str:
+  return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@app.post("/coach/sessions/{session_id}/message/stream")
+def coach_stream_message(session_id: str, payload: SendMessageRequest, authorization: str | None = Header(default=None)):
+  # Server-Sent Events: user_message, then token events with reply text as it
+  # is generated, then done with the persisted coach message.
+  user = get_current_user(authorization)
+  try:
+    user_msg, events = stream_message(
+      user_id=user.id,
+      user_access_token=user.access_token,
+      session_id=session_id,
+      content=payload.content,
+    )
+  except PermissionError:
+    raise HTTPException(status_code=404, detail="Session not found")
+
+  def _body():
+    yield _sse_event("user_message", {"session_id": session_id, "user_message": user_msg})
+    try:
+      for event, data in events:
+        yield _sse_event(event, data)
+    except Exception as e:
+      logger.exception("coach_stream_failed", extra={"session_id": session_id})
+      yield _sse_event("error", {"detail": str(e) or "Coach reply failed"})
+    finally:
+      # On client disconnect, hands the unfinished reply off to be stored.
+      events.close()
+
+  return StreamingResponse(
+    _body(),
+    media_type="text/event-stream",
+    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+  )
+
+
 @app.post("/mascot/advise")
 def mascot_advise_endpoint(payload: MascotAdviseRequest, authorization: str | None = Header(default=None)):
   user = get_current_user(authorization)
@@ -5,6 +5,7 @@ from datetime import datetime, timezone
 from zoneinfo import ZoneInfo
 from typing import Any
 
+from brief_store import select_latest_brief
 from supabase_client import get_supabase_admin_client
 
 
@@ -147,21 +148,9 @@ def _select_knowledge_lessons(*, categories: list[str], limit: int, topic_text:
 
 
 def _select_today_global_brief() -> dict[str, Any] | None:
+  # Latest edition only; topics live on the edition, not the day container.
   supabase = get_supabase_admin_client()
-  today = _utc_today_date()
-  res = (
-    supabase.table("news_daily_briefs")
-    .select("brief")
-    .eq("brief_date", today)
-    .eq("audience", "global")
-    .limit(1)
-    .execute()
-  )
-  if not res.data:
-    return None
-  row0 = res.data[0]
-  brief = row0.get("brief") if isinstance(row0, dict) else None
-  return brief if isinstance(brief, dict) else None
+  return select_latest_brief(supabase, brief_date=_utc_today_date(), audience="global")
 
 
 def _pick_brief_topics_for_setting(brief: dict[str, Any] | None, setting: str, max_topics: int) -> list[dict[str, Any]]:
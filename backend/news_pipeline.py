@@ -5,10 +5,14 @@ import json
 import logging
 import os
 import re
-from dataclasses import dataclass
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta, timezone
 from email.utils import parsedate_to_datetime
 from typing import Any
+from urllib.parse import quote, urlsplit
 from xml.etree import ElementTree as ET
 
 try:
@@ -16,16 +20,32 @@ try:
 except ModuleNotFoundError:
   feedparser = None
 import httpx
-from openai import OpenAI
 try:
   from slugify import slugify
 except ModuleNotFoundError:
   slugify = None
 
+from feed_cache import bump_publish_generation
+from feed_service import refresh_feed_snapshots, snapshot_max_per_category, snapshots_enabled
+from llm_clients import complete, get_openai_client, provider_api_key
+from pipeline_metrics import PipelineMetrics
+from story_clustering import StoryIndex
 from supabase_client import get_supabase_admin_client
 
 logger = logging.getLogger("connected.news")
 
+# Keeps PostgREST in_() filters well below URL length limits.
+_IN_FILTER_CHUNK = 100
+# Values like article URLs can be long; in_() filters on them are also capped
+# by their total URL-encoded length.
+_IN_FILTER_MAX_CHARS = 4000
+_CARD_PROMPT_VERSION = "v1-llm"
+
+# Near-duplicate story index. It lives for the whole process so stories seen in
+# earlier runs (within the window) still absorb new coverage of the same story.
+_story_index: StoryIndex | None = None
+_story_index_lock = threading.Lock()
+
 
 @dataclass
 class PipelineResult:
@@ -34,6 +54,85 @@ class PipelineResult:
   articles_upserted: int
   clusters_touched: int
   cards_published: int
+  sources_not_modified: int = 0
+  near_duplicates_merged: int = 0
+  article_write_mode: str = "bulk"
+  article_round_trips: int = 0
+  article_round_trips_saved: int = 0
+  card_cache_hits: int = 0
+  card_cache_misses: int = 0
+  # Per-stage wall time, call counts and p50/p95 latency (see pipeline_metrics).
+  stages: dict[str, dict[str, Any]] = field(default_factory=dict)
+
+
+@dataclass
+class _FeedFetch:
+  source: dict[str, Any]
+  status_code: int | None = None
+  text: str | None = None
+  error: str | None = None
+  etag: str | None = None
+  last_modified: str | None = None
+  # Set when the feed was parsed while streaming (NEWS_FEED_PARSE_MODE=stream).
+  feed_title: str | None = None
+  entries: list[dict[str, Any]] | None = None
+
+  @property
+  def not_modified(self) -> bool:
+    return self.status_code == 304
+
+
+@dataclass
+class _PendingArticle:
+  category: str
+  source_id: Any
+  url: str
+  title: str
+  summary: str | None
+  payload: dict[str, Any]
+  article_id: Any = None
+  story_key: str = ""
+
+
+@dataclass
+class _FetchOptions:
+  user_agent: str
+  log_sources: bool
+  conditional: bool
+  stream_parse: bool
+  max_body_bytes: int
+  stream_scan_entries: int
+  metrics: PipelineMetrics = field(default_factory=PipelineMetrics)
+
+
+@dataclass
+class _CardJob:
+  cache_key: tuple[str, str]
+  cluster_id: Any
+  category: str
+  title: str
+  url: str
+  summary: str | None
+  content_key: str | None = None
+
+
+class _RateLimiter:
+  # Spaces calls evenly at `per_minute` across all worker threads; a
+  # non-positive rate disables limiting.
+  def __init__(self, per_minute: float):
+    self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+    self._next_at = 0.0
+    self._lock = threading.Lock()
+
+  def acquire(self) -> None:
+    if self.interval <= 0:
+      return
+    with self._lock:
+      now = time.monotonic()
+      slot = max(now, self._next_at)
+      self._next_at = slot + self.interval
+    if slot > now:
+      time.sleep(slot - now)
 
 
 def _now_iso() -> str:
@@ -50,6 +149,16 @@ def _env_int(name: str, default: int) -> int:
     return default
 
 
+def _env_float(name: str, default: float) -> float:
+  raw = os.getenv(name)
+  if raw is None or raw == "":
+    return default
+  try:
+    return float(raw)
+  except Exception:
+    return default
+
+
 def _parse_iso(dt: str | None) -> datetime | None:
   if not dt:
     return None
@@ -84,6 +193,439 @@ def _normalize_story_key(title: str) -> str:
   return f"{base[:80]}-{digest}"
 
 
+def _url_host(url: str) -> str:
+  try:
+    return (urlsplit(url).hostname or "").lower()
+  except Exception:
+    return ""
+
+
+def _fetch_order(category_order: list[str], sources_by_category: dict[str, list[dict[str, Any]]]) -> list[dict[str, Any]]:
+  # Round-robin across categories so the first sources of every category are
+  # fetched before the tail of any single category (those are often never used
+  # because the per-category budget is already met).
+  queues = [sources_by_category.get(c) or [] for c in category_order]
+  depth = max((len(q) for q in queues), default=0)
+  out: list[dict[str, Any]] = []
+  for i in range(depth):
+    for q in queues:
+      if i < len(q):
+        out.append(q[i])
+  return out
+
+
+def _conditional_headers(src: dict[str, Any]) -> dict[str, str]:
+  headers: dict[str, str] = {}
+  etag = src.get("etag")
+  if isinstance(etag, str) and etag.strip():
+    headers["If-None-Match"] = etag.strip()
+  last_modified = src.get("last_modified")
+  if isinstance(last_modified, str) and last_modified.strip():
+    headers["If-Modified-Since"] = last_modified.strip()
+  return headers
+
+
+class _BoundedByteStream:
+  # File-like view over a streamed body for ElementTree.iterparse. Reading
+  # stops at max_bytes, and `truncated` is set only when the body continued
+  # past it. The bytes read are kept (bounded by max_bytes) so a body that
+  # turns out not to be well-formed XML can still go to feedparser.
+  def __init__(self, chunks: Any, max_bytes: int):
+    self._chunks = iter(chunks)
+    self._max_bytes = max_bytes
+    self.bytes_read = 0
+    self.truncated = False
+    self.head = bytearray()
+
+  def read(self, size: int = -1) -> bytes:
+    for chunk in self._chunks:
+      if not chunk:
+        continue
+      remaining = self._max_bytes - self.bytes_read
+      if len(chunk) > remaining:
+        self.truncated = True
+        self._chunks = iter(())
+        chunk = chunk[:remaining]
+        if not chunk:
+          return b""
+      self.bytes_read += len(chunk)
+      self.head.extend(chunk)
+      return chunk
+    return b""
+
+  def drain(self) -> bytes:
+    while self.read():
+      pass
+    return bytes(self.head)
+
+
+def _element_entry(el: ET.Element) -> dict[str, Any]:
+  return {
+    "title": _child_text(el, "title") or "",
+    "link": _find_link(el),
+    "summary": _child_text(el, "description") or _child_text(el, "summary") or _child_text(el, "content"),
+    "published": _child_text(el, "pubDate") or _child_text(el, "published") or _child_text(el, "updated"),
+  }
+
+
+def _stream_parse_feed(stream: _BoundedByteStream, *, max_entries: int) -> tuple[str | None, list[dict[str, Any]]]:
+  feed_title: str | None = None
+  entries: list[dict[str, Any]] = []
+  stack: list[ET.Element] = []
+  try:
+    for event, el in ET.iterparse(stream, events=("start", "end")):
+      if event == "start":
+        stack.append(el)
+        continue
+      stack.pop()
+      parent = stack[-1] if stack else None
+      tag = _strip_ns(el.tag)
+      if tag == "title" and parent is not None and _strip_ns(parent.tag) in {"channel", "feed"}:
+        feed_title = (el.text or "").strip() or None
+      elif tag in {"item", "entry"}:
+        entries.append(_element_entry(el))
+        # Consumed: drop the subtree so memory stays flat on huge feeds.
+        el.clear()
+        if parent is not None:
+          parent.remove(el)
+        if len(entries) >= max_entries:
+          break
+  except ET.ParseError as err:
+    # A body cut off at max_bytes still yields the entries parsed so far.
+    # Anything else that is not well-formed XML goes to the tolerant parser.
+    if entries and stream.truncated:
+      return feed_title, entries
+    if entries:
+      logger.warning(
+        "news_feed_stream_parse_error",
+        extra={"entries_parsed": len(entries), "bytes_read": stream.bytes_read, "error": str(err)},
+      )
+    body = stream.drain()
+    if feedparser is not None:
+      feed = feedparser.parse(body)
+      return getattr(feed.feed, "title", None), [dict(e) for e in feed.entries[:max_entries]]
+    return _fallback_parse_feed(body.decode("utf-8", errors="replace"))
+  return feed_title, entries
+
+
+def _fetch_feed(
+  client: httpx.Client,
+  src: dict[str, Any],
+  *,
+  options: _FetchOptions,
+  host_slots: dict[str, threading.BoundedSemaphore],
+) -> _FeedFetch:
+  url = src["url"]
+  category = src.get("category") or ""
+  headers = {"User-Agent": options.user_agent}
+  if options.conditional:
+    headers.update(_conditional_headers(src))
+  with host_slots[_url_host(url)], options.metrics.timed("fetch"):
+    try:
+      with client.stream("GET", url, headers=headers) as resp:
+        if resp.status_code >= 400:
+          if options.log_sources:
+            logger.info(
+              "news_source_fetch_bad_status",
+              extra={"category": category, "source_name": src.get("name"), "url": url, "status": resp.status_code},
+            )
+          return _FeedFetch(source=src, status_code=resp.status_code)
+        if resp.status_code == 304:
+          return _FeedFetch(source=src, status_code=304)
+
+        out = _FeedFetch(
+          source=src,
+          status_code=resp.status_code,
+          etag=resp.headers.get("etag"),
+          last_modified=resp.headers.get("last-modified"),
+        )
+        if not options.stream_parse:
+          resp.read()
+          out.text = resp.text
+          return out
+
+        stream = _BoundedByteStream(resp.iter_bytes(), options.max_body_bytes)
+        try:
+          # Streamed parsing reads the body as it goes, so this also counts
+          # towards the enclosing fetch.
+          with options.metrics.timed("parse"):
+            out.feed_title, out.entries = _stream_parse_feed(stream, max_entries=options.stream_scan_entries)
+        except Exception as e:
+          logger.exception(
+            "news_source_parse_error",
+            extra={"category": category, "source_name": src.get("name"), "url": url},
+          )
+          out.error = str(e)
+          return out
+        if stream.truncated:
+          logger.warning(
+            "news_source_body_truncated",
+            extra={"category": category, "source_name": src.get("name"), "url": url, "max_bytes": options.max_body_bytes},
+          )
+        return out
+    except Exception as e:
+      logger.exception(
+        "news_source_fetch_error",
+        extra={"category": category, "source_name": src.get("name"), "url": url},
+      )
+      return _FeedFetch(source=src, error=str(e))
+
+
+def _submit_feed_fetches(
+  pool: ThreadPoolExecutor,
+  client: httpx.Client,
+  sources: list[dict[str, Any]],
+  *,
+  options: _FetchOptions,
+  per_host_concurrency: int,
+) -> dict[str, Future]:
+  host_slots: dict[str, threading.BoundedSemaphore] = {}
+  for src in sources:
+    host = _url_host(src["url"])
+    if host not in host_slots:
+      host_slots[host] = threading.BoundedSemaphore(max(1, per_host_concurrency))
+
+  futures: dict[str, Future] = {}
+  for src in sources:
+    futures[str(src["id"])] = pool.submit(_fetch_feed, client, src, options=options, host_slots=host_slots)
+  return futures
+
+
+def _store_feed_validators(supabase: Any, fetched: _FeedFetch) -> None:
+  src = fetched.source
+  if fetched.etag == src.get("etag") and fetched.last_modified == src.get("last_modified"):
+    return
+  try:
+    supabase.table("news_sources").update(
+      {"etag": fetched.etag, "last_modified": fetched.last_modified}
+    ).eq("id", src["id"]).execute()
+  except Exception:
+    logger.exception("news_source_validators_store_error", extra={"url": src.get("url")})
+
+
+def _upsert_articles_per_entry(supabase: Any, articles: list[_PendingArticle]) -> int:
+  round_trips = 0
+  for article in articles:
+    upsert_resp = supabase.table("news_articles_raw").upsert(
+      article.payload,
+      on_conflict="source_id,url",
+      returning="representation",
+    ).execute()
+    round_trips += 1
+
+    article_row = None
+    if isinstance(upsert_resp.data, list) and upsert_resp.data and isinstance(upsert_resp.data[0], dict):
+      article_row = upsert_resp.data[0]
+
+    if not article_row or "id" not in article_row:
+      reread = (
+        supabase.table("news_articles_raw")
+        .select("id,url,title")
+        .eq("source_id", article.source_id)
+        .eq("url", article.url)
+        .limit(1)
+        .execute()
+      )
+      round_trips += 1
+      if isinstance(reread.data, list) and reread.data and isinstance(reread.data[0], dict):
+        article_row = reread.data[0]
+
+    if article_row and "id" in article_row:
+      article.article_id = article_row["id"]
+  return round_trips
+
+
+def _upsert_articles_bulk(supabase: Any, articles: list[_PendingArticle], *, batch_size: int) -> int:
+  # One multi-row upsert per batch; ids are mapped back by (source_id, url).
+  by_key = {(str(a.source_id), a.url): a for a in articles}
+  round_trips = 0
+
+  def _assign_ids(rows: Any) -> None:
+    if not isinstance(rows, list):
+      return
+    for row in rows:
+      if not isinstance(row, dict) or not row.get("id"):
+        continue
+      article = by_key.get((str(row.get("source_id")), row.get("url")))
+      if article is not None:
+        article.article_id = row["id"]
+
+  for i in range(0, len(articles), batch_size):
+    batch = articles[i : i + batch_size]
+    resp = supabase.table("news_articles_raw").upsert(
+      [a.payload for a in batch],
+      on_conflict="source_id,url",
+      returning="representation",
+    ).execute()
+    round_trips += 1
+    _assign_ids(resp.data)
+
+  missing = sorted({a.url for a in articles if a.article_id is None})
+  for batch in _encoded_chunks(missing, size=batch_size):
+    reread = (
+      supabase.table("news_articles_raw")
+      .select("id,source_id,url")
+      .in_("url", batch)
+      .execute()
+    )
+    round_trips += 1
+    _assign_ids(reread.data)
+  return round_trips
+
+
+def _chunks(items: list[Any], size: int = _IN_FILTER_CHUNK) -> list[list[Any]]:
+  return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+def _encoded_chunks(
+  values: list[str], *, size: int = _IN_FILTER_CHUNK, max_chars: int = _IN_FILTER_MAX_CHARS
+) -> list[list[str]]:
+  # Like _chunks, but also closes a chunk before its URL-encoded values (plus
+  # separators) exceed max_chars. A single longer value gets its own chunk.
+  out: list[list[str]] = []
+  chunk: list[str] = []
+  chars = 0
+  for value in values:
+    n = len(quote(value, safe="")) + 1
+    if chunk and (len(chunk) >= size or chars + n > max_chars):
+      out.append(chunk)
+      chunk, chars = [], 0
+    chunk.append(value)
+    chars += n
+  if chunk:
+    out.append(chunk)
+  return out
+
+
+def _resolve_clusters(
+  supabase: Any,
+  candidates: dict[tuple[str, str], str],
+  *,
+  stale_hours: int,
+) -> dict[tuple[str, str], dict[str, Any]]:
+  # candidates: (category, normalized_key) -> title for a newly created cluster.
+  keys_by_category: dict[str, list[str]] = {}
+  for category, key in candidates:
+    keys_by_category.setdefault(category, []).append(key)
+
+  cluster_ids: dict[tuple[str, str], Any] = {}
+  to_create: list[tuple[str, str]] = []
+  for category, keys in keys_by_category.items():
+    found: dict[str, dict[str, Any]] = {}
+    for chunk in _chunks(keys):
+      existing = (
+        supabase.table("news_story_clusters")
+        .select("id,normalized_key,last_seen_at")
+        .eq("category", category)
+        .in_("normalized_key", chunk)
+        .execute()
+      )
+      for row in existing.data or []:
+        if isinstance(row, dict) and row.get("normalized_key") not in found:
+          found[row.get("normalized_key")] = row
+
+    for key in keys:
+      row = found.get(key)
+      if row is None:
+        to_create.append((category, key))
+      elif _is_stale_cluster(row.get("last_seen_at"), hours=stale_hours):
+        archived_key = key + "-archived-" + datetime.now(timezone.utc).strftime("%Y%m%d%H%M")
+        supabase.table("news_story_clusters").update(
+          {"status": "archived", "normalized_key": archived_key}
+        ).eq("id", row["id"]).execute()
+        to_create.append((category, key))
+      else:
+        cluster_ids[(category, key)] = row["id"]
+
+  if to_create:
+    created = (
+      supabase.table("news_story_clusters")
+      .insert(
+        [
+          {
+            "category": category,
+            "title": candidates[(category, key)],
+            "normalized_key": key,
+            "first_seen_at": _now_iso(),
+            "last_seen_at": _now_iso(),
+            "status": "active",
+          }
+          for category, key in to_create
+        ]
+      )
+      .execute()
+    )
+    for row in created.data or []:
+      if isinstance(row, dict) and row.get("id"):
+        cluster_ids[(row.get("category"), row.get("normalized_key"))] = row["id"]
+
+    missing: dict[str, list[str]] = {}
+    for category, key in to_create:
+      if (category, key) not in cluster_ids:
+        missing.setdefault(category, []).append(key)
+    for category, keys in missing.items():
+      for chunk in _chunks(keys):
+        reread = (
+          supabase.table("news_story_clusters")
+          .select("id,normalized_key")
+          .eq("category", category)
+          .eq("status", "active")
+          .in_("normalized_key", chunk)
+          .execute()
+        )
+        for row in reread.data or []:
+          if isinstance(row, dict) and row.get("id"):
+            cluster_ids.setdefault((category, row.get("normalized_key")), row["id"])
+
+  card_updated_at: dict[str, Any] = {}
+  for chunk in _chunks(list({str(cid) for cid in cluster_ids.values()})):
+    cards = (
+      supabase.table("news_feed_cards")
+      .select("cluster_id,updated_at")
+      .in_("cluster_id", chunk)
+      .execute()
+    )
+    for row in cards.data or []:
+      if isinstance(row, dict) and row.get("cluster_id") is not None:
+        card_updated_at[str(row["cluster_id"])] = row.get("updated_at")
+
+  return {
+    cache_key: {"cluster_id": cid, "card_updated_at": card_updated_at.get(str(cid))}
+    for cache_key, cid in cluster_ids.items()
+  }
+
+
+def _cancel_fetches(futures: dict[str, Future], sources: list[dict[str, Any]]) -> None:
+  for src in sources:
+    fut = futures.get(str(src["id"]))
+    if fut is not None:
+      fut.cancel()
+
+
+def _cluster_input(title: str, summary: str | None) -> str:
+  summary_sentence = _first_sentence(summary)
+  if summary_sentence:
+    return f"{title} {summary_sentence}"
+  return title
+
+
+def _story_key(title: str, summary: str | None) -> str:
+  return _normalize_story_key(_cluster_input(title, summary))
+
+
+def _get_story_index(window_hours: int) -> StoryIndex:
+  global _story_index
+  with _story_index_lock:
+    if _story_index is None:
+      _story_index = StoryIndex(
+        threshold=_env_float("NEWS_CLUSTER_SIMILARITY_THRESHOLD", 0.3),
+        num_perm=_env_int("NEWS_CLUSTER_MINHASH_PERMUTATIONS", 128),
+        bands=_env_int("NEWS_CLUSTER_MINHASH_BANDS", 64),
+        window=timedelta(hours=window_hours),
+      )
+    return _story_index
+
+
 def _entry_published_at(entry: Any) -> str | None:
   # feedparser provides multiple date variants.
   if isinstance(entry, dict):
@@ -321,13 +863,14 @@ def _maybe_build_llm_card(
   title: str,
   url: str,
   summary: str | None,
+  rate_limiter: _RateLimiter | None = None,
 ) -> tuple[dict[str, Any], dict[str, Any] | None, float | None, str | None, str]:
-  api_key = os.getenv("OPENAI_API_KEY")
+  api_key = provider_api_key("openai")
   if not api_key:
     return _build_fallback_card(category, title, url, summary), None, None, None, "v0-fallback"
 
   model = os.getenv("NEWS_CARD_LLM_MODEL", "gpt-4o-mini")
-  client = OpenAI(api_key=api_key)
+  client = get_openai_client(api_key)
 
   system = (
     "You are a news brief assistant for young professionals and networkers. "
@@ -372,26 +915,34 @@ def _maybe_build_llm_card(
     return None
 
   try:
-    try:
-      resp = client.chat.completions.create(
-        model=model,
-        temperature=0.2,
-        response_format={"type": "json_object"},
-        messages=[
-          {"role": "system", "content": system},
-          {"role": "user", "content": json.dumps(user)},
-        ],
-      )
-    except TypeError:
-      resp = client.chat.completions.create(
-        model=model,
-        temperature=0.2,
-        messages=[
-          {"role": "system", "content": system},
-          {"role": "user", "content": json.dumps(user)},
-        ],
-      )
-    content = (resp.choices[0].message.content or "").strip()
+    if rate_limiter is not None:
+      rate_limiter.acquire()
+    messages = [
+      {"role": "system", "content": system},
+      {"role": "user", "content": json.dumps(user)},
+    ]
+
+    def _create() -> str:
+      try:
+        resp = client.chat.completions.create(
+          model=model,
+          temperature=0.2,
+          response_format={"type": "json_object"},
+          messages=messages,
+        )
+      except TypeError:
+        resp = client.chat.completions.create(
+          model=model,
+          temperature=0.2,
+          messages=messages,
+        )
+      return (resp.choices[0].message.content or "").strip()
+
+    content = complete(
+      "openai",
+      {"model": model, "temperature": 0.2, "response_format": "json_object", "messages": messages},
+      _create,
+    ).strip()
     card = _extract_json_object(content)
     if card is None:
       raise ValueError("Failed to parse JSON")
@@ -418,14 +969,80 @@ def _maybe_build_llm_card(
     card["sources"] = normalized_sources
 
     qa = {"ok": True, "mode": "llm"}
-    return card, qa, None, model, "v1-llm"
+    return card, qa, None, model, _CARD_PROMPT_VERSION
   except Exception as e:
     qa = {"ok": False, "mode": "llm", "error": str(e)}
-    return _build_fallback_card(category, title, url, summary), qa, None, model, "v1-llm-fallback"
+    return _build_fallback_card(category, title, url, summary), qa, None, model, f"{_CARD_PROMPT_VERSION}-fallback"
+
+
+def _build_card(job: _CardJob, rate_limiter: _RateLimiter | None, metrics: PipelineMetrics) -> dict[str, Any]:
+  with metrics.timed("card_generation"):
+    card, qa, hallucination_confidence, model_used, prompt_version = _maybe_build_llm_card(
+      category=job.category,
+      title=job.title,
+      url=job.url,
+      summary=job.summary,
+      rate_limiter=rate_limiter,
+    )
+  ok, issues = _validate_card(card, url=job.url, category=job.category, title=job.title)
+  if not ok:
+    qa = {"ok": False, "mode": "qa", "issues": issues, "upstream": qa}
+    card = _build_fallback_card(job.category, job.title, job.url, job.summary)
+  else:
+    qa = qa or {"ok": True, "mode": "fallback"}
+
+  return {
+    "cluster_id": job.cluster_id,
+    "category": job.category,
+    "card": card,
+    "qa": qa,
+    "hallucination_confidence": hallucination_confidence,
+    "model": model_used,
+    "prompt_version": prompt_version,
+    "published": True,
+  }
+
+
+def _card_content_key(job: _CardJob, *, model: str, prompt_version: str) -> str:
+  raw = json.dumps([job.category, job.title, job.summary, job.url, model, prompt_version], ensure_ascii=False)
+  return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _load_cached_cards(supabase: Any, keys: list[str]) -> dict[str, dict[str, Any]]:
+  cached: dict[str, dict[str, Any]] = {}
+  for chunk in _chunks(sorted(set(keys))):
+    resp = (
+      supabase.table("news_card_cache")
+      .select("cache_key,card,qa,model,prompt_version")
+      .in_("cache_key", chunk)
+      .execute()
+    )
+    for row in resp.data or []:
+      if isinstance(row, dict) and isinstance(row.get("card"), dict):
+        cached[row.get("cache_key")] = row
+  return cached
+
+
+def _store_cached_cards(supabase: Any, rows: list[dict[str, Any]]) -> None:
+  for chunk in _chunks(rows):
+    supabase.table("news_card_cache").upsert(chunk, on_conflict="cache_key").execute()
+
+
+def prune_card_cache(supabase: Any, *, now: datetime | None = None) -> int:
+  # Cache keys hash the card inputs, so old entries only ever hit again for
+  # articles that are still being re-fetched. NEWS_CARD_CACHE_RETENTION_DAYS
+  # bounds the table (0 or less keeps everything).
+  days = _env_int("NEWS_CARD_CACHE_RETENTION_DAYS", 7)
+  if days <= 0:
+    return 0
+  cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=days)
+  resp = supabase.table("news_card_cache").delete().lt("created_at", cutoff.isoformat()).execute()
+  return len(resp.data or [])
 
 
 def run_news_pipeline() -> PipelineResult:
-  supabase = get_supabase_admin_client()
+  metrics = PipelineMetrics()
+  supabase = metrics.instrument(get_supabase_admin_client())
 
   logger.info("news_pipeline_start")
 
@@ -439,17 +1056,50 @@ def run_news_pipeline() -> PipelineResult:
     except Exception:
       max_total_entries = None
   cluster_stale_hours = _env_int("NEWS_CLUSTER_STALE_HOURS", 48)
+  # NEWS_CLUSTER_MATCH=exact turns near-duplicate matching off.
+  cluster_match = (os.getenv("NEWS_CLUSTER_MATCH") or "minhash").strip().lower()
   card_cooldown_minutes = _env_int("NEWS_CLUSTER_CARD_COOLDOWN_MINUTES", 90)
   http_timeout_seconds = _env_int("NEWS_HTTP_TIMEOUT_SECONDS", 20)
+  fetch_concurrency = max(1, _env_int("NEWS_FETCH_CONCURRENCY", 8))
+  fetch_per_host_concurrency = max(1, _env_int("NEWS_FETCH_PER_HOST_CONCURRENCY", 2))
   user_agent = os.getenv("NEWS_HTTP_USER_AGENT", "ConnectedNewsBot/0.1")
   log_sources = (os.getenv("NEWS_LOG_SOURCES") or "").strip().lower() in {"1", "true", "yes"}
-
-  sources_resp = (
-    supabase.table("news_sources")
-    .select("id,name,source_type,url,category,enabled")
-    .eq("enabled", True)
-    .execute()
+  conditional_get = (os.getenv("NEWS_CONDITIONAL_GET") or "1").strip().lower() in {"1", "true", "yes"}
+  article_write_mode = (os.getenv("NEWS_ARTICLE_WRITE_MODE") or "bulk").strip().lower()
+  if article_write_mode not in {"bulk", "per_entry"}:
+    article_write_mode = "bulk"
+  article_batch_size = max(1, _env_int("NEWS_ARTICLE_UPSERT_BATCH_SIZE", 100))
+  card_concurrency = max(1, _env_int("NEWS_CARD_CONCURRENCY", 4))
+  card_llm_rpm = _env_float("NEWS_CARD_LLM_RPM", 0)
+  # Only LLM cards are worth caching; fallback cards are cheap to rebuild.
+  card_cache_enabled = bool(provider_api_key("openai")) and (
+    (os.getenv("NEWS_CARD_CACHE") or "1").strip().lower() in {"1", "true", "yes"}
   )
+  card_llm_model = os.getenv("NEWS_CARD_LLM_MODEL", "gpt-4o-mini")
+  feed_snapshots = snapshots_enabled()
+  feed_snapshot_cap = snapshot_max_per_category()
+
+  with metrics.stage("sources"):
+    sources_resp = None
+    if conditional_get:
+      try:
+        sources_resp = (
+          supabase.table("news_sources")
+          .select("id,name,source_type,url,category,enabled,etag,last_modified")
+          .eq("enabled", True)
+          .execute()
+        )
+      except Exception:
+        # Validator columns not migrated yet; poll unconditionally.
+        logger.exception("news_sources_validators_unavailable")
+        conditional_get = False
+    if sources_resp is None:
+      sources_resp = (
+        supabase.table("news_sources")
+        .select("id,name,source_type,url,category,enabled")
+        .eq("enabled", True)
+        .execute()
+      )
   sources = sources_resp.data or []
 
   if not sources:
@@ -459,12 +1109,20 @@ def run_news_pipeline() -> PipelineResult:
       articles_upserted=0,
       clusters_touched=0,
       cards_published=0,
+      stages=metrics.summary(),
     )
 
   articles_fetched = 0
   articles_upserted = 0
   clusters_touched = 0
   cards_published = 0
+  sources_not_modified = 0
+  near_duplicates_merged = 0
+  card_cache_hits = 0
+  card_cache_misses = 0
+  pending_articles: list[_PendingArticle] = []
+  validated_fetches: list[_FeedFetch] = []
+  card_jobs: list[_CardJob] = []
 
   cluster_cache: dict[tuple[str, str], dict[str, Any]] = {}
   touched_clusters: set[str] = set()
@@ -491,52 +1149,77 @@ def run_news_pipeline() -> PipelineResult:
   if max_total_entries is None:
     max_total_entries = max_entries_per_category * max(1, len(category_order))
 
-  with httpx.Client(timeout=http_timeout_seconds, follow_redirects=True) as client:
+  fetch_options = _FetchOptions(
+    user_agent=user_agent,
+    log_sources=log_sources,
+    conditional=conditional_get,
+    stream_parse=(os.getenv("NEWS_FEED_PARSE_MODE") or "full").strip().lower() == "stream",
+    max_body_bytes=max(1, _env_int("NEWS_FEED_MAX_BYTES", 5_000_000)),
+    # Feeds are usually newest-first; scanning a few times the per-source
+    # budget is enough to pick the most recent entries without reading it all.
+    stream_scan_entries=max(1, _env_int("NEWS_STREAM_SCAN_ENTRIES", max(max_entries_per_source * 4, 20))),
+    metrics=metrics,
+  )
+
+  # Feeds are fetched concurrently (bounded globally and per host) but consumed
+  # strictly in category/source order, so budgets apply deterministically.
+  limits = httpx.Limits(max_connections=fetch_concurrency, max_keepalive_connections=fetch_concurrency)
+  with httpx.Client(timeout=http_timeout_seconds, follow_redirects=True, limits=limits) as client, ThreadPoolExecutor(
+    max_workers=fetch_concurrency, thread_name_prefix="news-fetch"
+  ) as fetch_pool:
+    fetches = _submit_feed_fetches(
+      fetch_pool,
+      client,
+      _fetch_order(category_order, sources_by_category),
+      options=fetch_options,
+      per_host_concurrency=fetch_per_host_concurrency,
+    )
+
     for category in category_order:
-      if total_entries_seen >= max_total_entries:
-        break
       cat_sources = sources_by_category.get(category) or []
+      if total_entries_seen >= max_total_entries:
+        _cancel_fetches(fetches, cat_sources)
+        continue
       cat_entries_seen = 0
 
-      for src in cat_sources:
-        if total_entries_seen >= max_total_entries:
-          break
-        if cat_entries_seen >= max_entries_per_category:
+      for src_index, src in enumerate(cat_sources):
+        if total_entries_seen >= max_total_entries or cat_entries_seen >= max_entries_per_category:
+          _cancel_fetches(fetches, cat_sources[src_index:])
           break
 
         url = src["url"]
         source_id = src["id"]
 
-        try:
-          resp = client.get(url, headers={"User-Agent": user_agent})
-          if resp.status_code >= 400:
-            if log_sources:
-              logger.info(
-                "news_source_fetch_bad_status",
-                extra={"category": category, "source_name": src.get("name"), "url": url, "status": resp.status_code},
-              )
-            continue
-          feed_text = resp.text
-        except Exception:
-          logger.exception(
-            "news_source_fetch_error",
-            extra={"category": category, "source_name": src.get("name"), "url": url},
-          )
+        fetched: _FeedFetch = fetches[str(source_id)].result()
+        if fetched.not_modified:
+          # Unchanged since the last run: nothing to parse, upsert or publish.
+          sources_not_modified += 1
+          if log_sources:
+            logger.info(
+              "news_source_not_modified",
+              extra={"category": category, "source_name": src.get("name"), "url": url},
+            )
           continue
-
-        try:
-          if feedparser is not None:
-            feed = feedparser.parse(feed_text)
-            feed_title = getattr(feed.feed, "title", None)
-            entries = feed.entries
-          else:
-            feed_title, entries = _fallback_parse_feed(feed_text)
-        except Exception:
-          logger.exception(
-            "news_source_parse_error",
-            extra={"category": category, "source_name": src.get("name"), "url": url},
-          )
+        if fetched.entries is not None:
+          feed_title, entries = fetched.feed_title, fetched.entries
+        elif fetched.text is None:
           continue
+        else:
+          feed_text = fetched.text
+          try:
+            with metrics.timed("parse"):
+              if feedparser is not None:
+                feed = feedparser.parse(feed_text)
+                feed_title = getattr(feed.feed, "title", None)
+                entries = feed.entries
+              else:
+                feed_title, entries = _fallback_parse_feed(feed_text)
+          except Exception:
+            logger.exception(
+              "news_source_parse_error",
+              extra={"category": category, "source_name": src.get("name"), "url": url},
+            )
+            continue
 
         entries_list = list(entries or [])
         min_utc = datetime.min.replace(tzinfo=timezone.utc)
@@ -562,10 +1245,10 @@ def run_news_pipeline() -> PipelineResult:
           )
 
         seen_urls: set[str] = set()
+        source_consumed = True
         for entry in entries_list[:max_entries_per_source]:
-          if total_entries_seen >= max_total_entries:
-            break
-          if cat_entries_seen >= max_entries_per_category:
+          if total_entries_seen >= max_total_entries or cat_entries_seen >= max_entries_per_category:
+            source_consumed = False
             break
 
           entry_url = _entry_field(entry, "link")
@@ -577,8 +1260,13 @@ def run_news_pipeline() -> PipelineResult:
             continue
           seen_urls.add(entry_url)
 
+          # Budgets count accepted entries, not successful writes: articles
+          # are written in bulk after every feed is consumed, so an entry
+          # whose write fails still uses its slot (there is no second pass
+          # to fetch a replacement).
           articles_fetched += 1
           total_entries_seen += 1
+          cat_entries_seen += 1
 
           published_at = _entry_published_at(entry)
           summary = _entry_field(entry, "summary")
@@ -590,209 +1278,204 @@ def run_news_pipeline() -> PipelineResult:
             "entry": (entry if isinstance(entry, dict) else dict(entry)),
           }
 
-          upsert_payload = {
-            "source_id": source_id,
-            "url": entry_url,
-            "title": entry_title,
-            "published_at": published_at,
-            "summary": summary,
-            "fetched_at": _now_iso(),
-            "raw": raw_payload,
-          }
-
-          # Upsert raw article by (source_id, url)
-          upsert_resp = supabase.table("news_articles_raw").upsert(
-            upsert_payload,
-            on_conflict="source_id,url",
-            returning="representation",
-          ).execute()
-
-          article_row = None
-          if isinstance(upsert_resp.data, list) and upsert_resp.data and isinstance(upsert_resp.data[0], dict):
-            article_row = upsert_resp.data[0]
-
-          if not article_row or "id" not in article_row:
-            reread = (
-              supabase.table("news_articles_raw")
-              .select("id,url,title")
-              .eq("source_id", source_id)
-              .eq("url", entry_url)
-              .limit(1)
-              .execute()
+          pending_articles.append(
+            _PendingArticle(
+              category=category,
+              source_id=source_id,
+              url=entry_url,
+              title=entry_title,
+              summary=summary,
+              payload={
+                "source_id": source_id,
+                "url": entry_url,
+                "title": entry_title,
+                "published_at": published_at,
+                "summary": summary,
+                "fetched_at": _now_iso(),
+                "raw": raw_payload,
+              },
             )
-            if isinstance(reread.data, list) and reread.data and isinstance(reread.data[0], dict):
-              article_row = reread.data[0]
-
-          if not article_row or "id" not in article_row:
-            continue
-
-          article_id = article_row["id"]
-          articles_upserted += 1
-          cat_entries_seen += 1
+          )
 
-          # Cluster
-          cluster_input = entry_title
-          summary_sentence = _first_sentence(summary)
-          if summary_sentence:
-            cluster_input = f"{entry_title} {summary_sentence}"
-          normalized_key = _normalize_story_key(cluster_input)
-          cache_key = (category, normalized_key)
-          cached = cluster_cache.get(cache_key)
-
-          if cached:
-            cluster_id = cached["cluster_id"]
-          else:
-            existing_cluster = (
-              supabase.table("news_story_clusters")
-              .select("id,last_seen_at")
-              .eq("category", category)
-              .eq("normalized_key", normalized_key)
-              .limit(1)
-              .execute()
-            )
+        # Only remember validators once every candidate entry of the feed was
+        # considered; otherwise a 304 next run would hide the remainder.
+        if conditional_get and source_consumed:
+          validated_fetches.append(fetched)
 
-            if existing_cluster.data:
-              row0 = existing_cluster.data[0]
-              if _is_stale_cluster(row0.get("last_seen_at"), hours=cluster_stale_hours):
-                archived_key = normalized_key + "-archived-" + datetime.now(timezone.utc).strftime("%Y%m%d%H%M")
-                supabase.table("news_story_clusters").update(
-                  {"status": "archived", "normalized_key": archived_key}
-                ).eq("id", row0["id"]).execute()
-
-                created = (
-                  supabase.table("news_story_clusters")
-                  .insert(
-                    {
-                      "category": category,
-                      "title": entry_title,
-                      "normalized_key": normalized_key,
-                      "first_seen_at": _now_iso(),
-                      "last_seen_at": _now_iso(),
-                      "status": "active",
-                    }
-                  )
-                  .execute()
-                )
-                cluster_id = None
-                if isinstance(created.data, list) and created.data and isinstance(created.data[0], dict):
-                  cluster_id = created.data[0].get("id")
-                if not cluster_id:
-                  reread = (
-                    supabase.table("news_story_clusters")
-                    .select("id")
-                    .eq("category", category)
-                    .eq("normalized_key", normalized_key)
-                    .limit(1)
-                    .execute()
-                  )
-                  if isinstance(reread.data, list) and reread.data and isinstance(reread.data[0], dict):
-                    cluster_id = reread.data[0].get("id")
-                if not cluster_id:
-                  continue
-              else:
-                cluster_id = row0["id"]
-            else:
-              created = (
-                supabase.table("news_story_clusters")
-                .insert(
-                  {
-                    "category": category,
-                    "title": entry_title,
-                    "normalized_key": normalized_key,
-                    "first_seen_at": _now_iso(),
-                    "last_seen_at": _now_iso(),
-                    "status": "active",
-                  }
-                )
-                .execute()
-              )
-              cluster_id = None
-              if isinstance(created.data, list) and created.data and isinstance(created.data[0], dict):
-                cluster_id = created.data[0].get("id")
-              if not cluster_id:
-                reread = (
-                  supabase.table("news_story_clusters")
-                  .select("id")
-                  .eq("category", category)
-                  .eq("normalized_key", normalized_key)
-                  .limit(1)
-                  .execute()
-                )
-                if isinstance(reread.data, list) and reread.data and isinstance(reread.data[0], dict):
-                  cluster_id = reread.data[0].get("id")
-              if not cluster_id:
-                continue
-
-            existing_card = (
-              supabase.table("news_feed_cards")
-              .select("updated_at")
-              .eq("cluster_id", cluster_id)
-              .limit(1)
-              .execute()
-            )
-            card_updated_at = None
-            if existing_card.data:
-              card_updated_at = existing_card.data[0].get("updated_at")
+  # Upsert raw articles by (source_id, url)
+  with metrics.stage("article_upsert"):
+    if article_write_mode == "per_entry":
+      article_round_trips = _upsert_articles_per_entry(supabase, pending_articles)
+    else:
+      article_round_trips = _upsert_articles_bulk(supabase, pending_articles, batch_size=article_batch_size)
+
+  with metrics.stage("cluster_resolution"):
+    story_index: StoryIndex | None = None
+    if cluster_match == "minhash":
+      story_index = _get_story_index(_env_int("NEWS_CLUSTER_SIMILARITY_WINDOW_HOURS", cluster_stale_hours))
+      story_index.prune(now)
+
+    for article in pending_articles:
+      article.story_key = _story_key(article.title, article.summary)
+      if story_index is not None and article.article_id is not None:
+        # Near-duplicate coverage of an indexed story reuses that story's key, so
+        # it lands in the same cluster and shares one card.
+        matched_key, _ = story_index.assign(
+          article.category,
+          article.story_key,
+          _cluster_input(article.title, article.summary),
+          now=now,
+          title=article.title,
+        )
+        if matched_key != article.story_key:
+          near_duplicates_merged += 1
+          article.story_key = matched_key
+
+    # Resolve every (category, story key) of the run up front in a few batched
+    # queries instead of select/insert/re-read round trips per new key.
+    cluster_candidates: dict[tuple[str, str], str] = {}
+    for article in pending_articles:
+      if article.article_id is None:
+        continue
+      cluster_candidates.setdefault((article.category, article.story_key), article.title)
+    cluster_cache.update(_resolve_clusters(supabase, cluster_candidates, stale_hours=cluster_stale_hours))
 
-            cluster_cache[cache_key] = {
-              "cluster_id": cluster_id,
-              "card_updated_at": card_updated_at,
-            }
+    for article in pending_articles:
+      if article.article_id is None:
+        continue
 
-          if cluster_id not in touched_clusters:
-            touched_clusters.add(cluster_id)
-            supabase.table("news_story_clusters").update(
-              {"last_seen_at": _now_iso(), "title": entry_title}
-            ).eq("id", cluster_id).execute()
-            clusters_touched += 1
-
-          # Link cluster <-> article (idempotent)
-          supabase.table("news_cluster_articles").upsert(
-            {"cluster_id": cluster_id, "article_id": article_id},
-            on_conflict="cluster_id,article_id",
-          ).execute()
+      category = article.category
+      entry_title = article.title
+      entry_url = article.url
+      summary = article.summary
+      article_id = article.article_id
+      articles_upserted += 1
 
-          # Publish/update card
-          cached = cluster_cache.get(cache_key) or {}
-          updated_at_dt = _parse_iso(cached.get("card_updated_at"))
-          if updated_at_dt and (now - updated_at_dt) < cooldown:
-            continue
+      cache_key = (category, article.story_key)
+      cached = cluster_cache.get(cache_key)
+      if not cached:
+        continue
+      cluster_id = cached["cluster_id"]
+
+      if cluster_id not in touched_clusters:
+        touched_clusters.add(cluster_id)
+        supabase.table("news_story_clusters").update(
+          {"last_seen_at": _now_iso(), "title": entry_title}
+        ).eq("id", cluster_id).execute()
+        clusters_touched += 1
+
+      # Link cluster <-> article (idempotent)
+      supabase.table("news_cluster_articles").upsert(
+        {"cluster_id": cluster_id, "article_id": article_id},
+        on_conflict="cluster_id,article_id",
+      ).execute()
+
+      # Queue a card for the first article of each cluster outside its cooldown;
+      # later articles of the same cluster see the queued stamp and skip.
+      cached = cluster_cache.get(cache_key) or {}
+      updated_at_dt = _parse_iso(cached.get("card_updated_at"))
+      if updated_at_dt and (now - updated_at_dt) < cooldown:
+        continue
+      cluster_cache[cache_key] = {**cached, "cluster_id": cluster_id, "card_updated_at": _now_iso()}
+      card_jobs.append(
+        _CardJob(
+          cache_key=cache_key,
+          cluster_id=cluster_id,
+          category=category,
+          title=entry_title,
+          url=entry_url,
+          summary=summary,
+        )
+      )
 
-          card, qa, hallucination_confidence, model_used, prompt_version = _maybe_build_llm_card(
-            category=category,
-            title=entry_title,
-            url=entry_url,
-            summary=summary,
-          )
-          ok, issues = _validate_card(card, url=entry_url, category=category, title=entry_title)
-          if not ok:
-            qa = {"ok": False, "mode": "qa", "issues": issues, "upstream": qa}
-            card = _build_fallback_card(category, entry_title, entry_url, summary)
-          else:
-            qa = qa or {"ok": True, "mode": "fallback"}
-
-          card_upsert = {
-            "cluster_id": cluster_id,
-            "category": category,
-            "card": card,
-            "qa": qa,
-            "hallucination_confidence": hallucination_confidence,
-            "model": model_used,
-            "prompt_version": prompt_version,
-            "updated_at": _now_iso(),
+  # Jobs whose inputs produced an LLM card before reuse it instead of calling
+  # the model again.
+  cached_cards: dict[str, dict[str, Any]] = {}
+  if card_jobs and card_cache_enabled:
+    for job in card_jobs:
+      job.content_key = _card_content_key(job, model=card_llm_model, prompt_version=_CARD_PROMPT_VERSION)
+    try:
+      with metrics.stage("card_cache"):
+        cached_cards = _load_cached_cards(supabase, [job.content_key for job in card_jobs])
+    except Exception:
+      # Cache table not migrated yet; generate every card.
+      logger.exception("news_card_cache_unavailable")
+      card_cache_enabled = False
+
+  # LLM card generation runs in a bounded pool (rate limited across workers);
+  # results are published in job order as each one and its predecessors finish.
+  if card_jobs:
+    # Keyed by content hash: an upsert batch may not touch the same row twice.
+    new_cache_rows: dict[str, dict[str, Any]] = {}
+    rate_limiter = _RateLimiter(card_llm_rpm)
+    with ThreadPoolExecutor(
+      max_workers=min(card_concurrency, len(card_jobs)), thread_name_prefix="news-card"
+    ) as card_pool:
+      card_futures: list[Future] = []
+      for job in card_jobs:
+        hit = cached_cards.get(job.content_key) if job.content_key else None
+        if hit is None:
+          card_futures.append(card_pool.submit(_build_card, job, rate_limiter, metrics))
+          continue
+        done: Future = Future()
+        done.set_result(
+          {
+            "cluster_id": job.cluster_id,
+            "category": job.category,
+            "card": hit["card"],
+            "qa": hit.get("qa"),
+            "hallucination_confidence": None,
+            "model": hit.get("model"),
+            "prompt_version": hit.get("prompt_version"),
             "published": True,
           }
+        )
+        card_futures.append(done)
+        card_cache_hits += 1
 
+      for job, future in zip(card_jobs, card_futures):
+        card_upsert = future.result()
+        card_upsert["updated_at"] = _now_iso()
+        with metrics.stage("card_publish"):
           supabase.table("news_feed_cards").upsert(
             card_upsert,
             on_conflict="cluster_id",
           ).execute()
-          cluster_cache[cache_key] = {
-            **(cluster_cache.get(cache_key) or {}),
-            "cluster_id": cluster_id,
-            "card_updated_at": card_upsert["updated_at"],
-          }
-          cards_published += 1
+        cluster_cache[job.cache_key]["card_updated_at"] = card_upsert["updated_at"]
+        cards_published += 1
+
+        if card_cache_enabled and job.content_key not in cached_cards:
+          card_cache_misses += 1
+          qa = card_upsert.get("qa") or {}
+          if qa.get("ok") and qa.get("mode") == "llm":
+            new_cache_rows[job.content_key] = {
+              "cache_key": job.content_key,
+              "card": card_upsert["card"],
+              "qa": qa,
+              "model": card_upsert.get("model"),
+              "prompt_version": card_upsert.get("prompt_version"),
+            }
+
+    if cards_published:
+      if feed_snapshots:
+        try:
+          with metrics.stage("feed_snapshots"):
+            refresh_feed_snapshots(supabase, max_per_category=feed_snapshot_cap)
+        except Exception:
+          logger.exception("news_feed_snapshots_discard_failed")
+      # Invalidates cached /news/feed reads served by this process.
+      bump_publish_generation()
+
+    if new_cache_rows:
+      try:
+        with metrics.stage("card_cache"):
+          _store_cached_cards(supabase, list(new_cache_rows.values()))
+      except Exception:
+        logger.exception("news_card_cache_store_failed")
+
+  with metrics.stage("source_validators"):
+    for fetched in validated_fetches:
+      _store_feed_validators(supabase, fetched)
 
   return PipelineResult(
     sources=len(sources),
@@ -800,4 +1483,12 @@ def run_news_pipeline() -> PipelineResult:
     articles_upserted=articles_upserted,
     clusters_touched=clusters_touched,
     cards_published=cards_published,
+    sources_not_modified=sources_not_modified,
+    near_duplicates_merged=near_duplicates_merged,
+    article_write_mode=article_write_mode,
+    article_round_trips=article_round_trips,
+    article_round_trips_saved=max(0, len(pending_articles) - article_round_trips),
+    card_cache_hits=card_cache_hits,
+    card_cache_misses=card_cache_misses,
+    stages=metrics.summary(),
   )
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Iterator
+
+# Per-stage timing for batch pipelines. Each stage records the latency of the
+# individual calls made in it (HTTP fetches, Supabase round trips, LLM calls)
+# plus its wall-clock window, which stays meaningful when calls run in parallel.
+
+_current_stage: contextvars.ContextVar[str | None] = contextvars.ContextVar("pipeline_stage", default=None)
+
+
+@dataclass
+class _Stage:
+  latencies_ms: list[float] = field(default_factory=list)
+  started_at: float | None = None
+  ended_at: float | None = None
+
+  def extend(self, start: float, end: float) -> None:
+    self.started_at = start if self.started_at is None else min(self.started_at, start)
+    self.ended_at = end if self.ended_at is None else max(self.ended_at, end)
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float | None:
+  # Nearest-rank percentile.
+  if not sorted_values:
+    return None
+  rank = max(1, -(-len(sorted_values) * pct // 100))
+  return sorted_values[int(rank) - 1]
+
+
+class PipelineMetrics:
+  def __init__(self) -> None:
+    self._stages: dict[str, _Stage] = {}
+    self._lock = threading.Lock()
+
+  def _record(self, name: str, start: float, end: float, *, call: bool) -> None:
+    with self._lock:
+      stage = self._stages.setdefault(name, _Stage())
+      stage.extend(start, end)
+      if call:
+        stage.latencies_ms.append((end - start) * 1000)
+
+  @contextmanager
+  def stage(self, name: str) -> Iterator[None]:
+    # Extends the stage window over the block and attributes instrumented
+    # Supabase calls made from this thread to it.
+    token = _current_stage.set(name)
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      _current_stage.reset(token)
+      self._record(name, start, time.perf_counter(), call=False)
+
+  @contextmanager
+  def timed(self, name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      self._record(name, start, time.perf_counter(), call=True)
+
+  def instrument(self, supabase: Any) -> Any:
+    return _TimedSupabase(supabase, self)
+
+  def summary(self) -> dict[str, dict[str, Any]]:
+    with self._lock:
+      out: dict[str, dict[str, Any]] = {}
+      for name, stage in self._stages.items():
+        latencies = sorted(stage.latencies_ms)
+        wall = (stage.ended_at - stage.started_at) * 1000 if stage.started_at is not None else 0.0
+        p50 = _percentile(latencies, 50)
+        p95 = _percentile(latencies, 95)
+        out[name] = {
+          "wall_ms": round(wall, 1),
+          "calls": len(latencies),
+          "total_ms": round(sum(latencies), 1),
+          "p50_ms": round(p50, 1) if p50 is not None else None,
+          "p95_ms": round(p95, 1) if p95 is not None else None,
+        }
+      return out
+
+
+class _TimedQuery:
+  def __init__(self, query: Any, metrics: PipelineMetrics):
+    self._query = query
+    self._metrics = metrics
+
+  def __getattr__(self, name: str) -> Any:
+    attr = getattr(self._query, name)
+    if name == "execute":
+      return self._execute
+    if not callable(attr):
+      return attr
+
+    def _chain(*args: Any, **kwargs: Any) -> Any:
+      out = attr(*args, **kwargs)
+      return _TimedQuery(out, self._metrics) if hasattr(out, "execute") else out
+
+    return _chain
+
+  def _execute(self, *args: Any, **kwargs: Any) -> Any:
+    stage = _current_stage.get()
+    if stage is None:
+      return self._query.execute(*args, **kwargs)
+    with self._metrics.timed(stage):
+      return self._query.execute(*args, **kwargs)
+
+
+class _TimedSupabase:
+  # Wraps a Supabase client so every query's execute() counts as one round
+  # trip in the active stage.
+  def __init__(self, supabase: Any, metrics: PipelineMetrics):
+    self._supabase = supabase
+    self._metrics = metrics
+
+  def table(self, name: str) -> _TimedQuery:
+    return _TimedQuery(self._supabase.table(name), self._metrics)
+
+  def __getattr__(self, name: str) -> Any:
+    return getattr(self._supabase, name)
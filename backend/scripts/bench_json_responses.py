@@ -0,0 +1,140 @@
+import argparse
+import json
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from api_models import KnowledgeLessonSummary, SkillLessonSummary
+from fast_json import FastJSONResponse, orjson
+
+# Compares response serialization per endpoint: FastAPI's default path
+# (response_model validation where declared, jsonable_encoder, JSONResponse),
+# JSONResponse alone, and the orjson-backed FastJSONResponse used when
+# API_FAST_JSON=1. Run from backend/: python -m scripts.bench_json_responses
+
+
+def _card(i: int) -> dict:
+  url = f"https://example.com/story/{i}"
+  return {
+    "title": f"Story {i}: regulators weigh new rules for cross-border payments",
+    "category": ["world", "tech", "business", "science"][i % 4],
+    "what_happened": "Officials outlined a draft framework on Tuesday. " * 4,
+    "why_it_matters": ["Costs for consumers could fall.", "Banks face new reporting.", "Markets reacted calmly."],
+    "talk_track": "Ask what the change means for small businesses sending money abroad. " * 2,
+    "smart_question": "Who pays for the new compliance checks?",
+    "sources": [{"url": url}, {"url": f"https://example.org/coverage/{i}"}],
+  }
+
+
+def _feed_page(n: int) -> dict:
+  rows = [
+    {
+      "id": f"00000000-0000-0000-0000-{i:012d}",
+      "category": _card(i)["category"],
+      "card": _card(i),
+      "created_at": f"2026-10-17T06:{i % 60:02d}:00+00:00",
+      "updated_at": f"2026-10-17T07:{i % 60:02d}:00+00:00",
+    }
+    for i in range(n)
+  ]
+  return {"data": rows, "next_cursor": "eyJ2IjoxLCJtIjoicCJ9"}
+
+
+def _brief() -> dict:
+  items = [{**_card(i), "created_at": "2026-10-17T06:00:00+00:00"} for i in range(40)]
+  topics = [
+    {
+      "topic": f"Topic {t}",
+      "overview": "A short section overview. " * 5,
+      "tags": ["policy", "markets"],
+      "items": items[t * 4 : t * 4 + 4],
+    }
+    for t in range(10)
+  ]
+  brief = {
+    "brief_date": "2026-10-17",
+    "edition": "midday",
+    "generated_at": "2026-10-17T12:00:00+00:00",
+    "overview": "Three paragraphs of overview text. " * 30,
+    "topics": topics,
+    "items": items,
+  }
+  return {
+    "audience": "global",
+    "brief_date": "2026-10-17",
+    "edition": "midday",
+    "available_editions": ["morning", "midday"],
+    "latest_edition": "midday",
+    "brief": brief,
+  }
+
+
+def _lessons(n: int, knowledge: bool) -> list[dict]:
+  rows = []
+  for i in range(n):
+    row = {
+      "lesson_id": f"lesson-{i}",
+      "title": f"Lesson {i}: keeping a conversation going",
+      "difficulty": "intermediate",
+      "read_time_minutes": 6,
+      "quality_score": 0.87,
+      "actionability_score": 0.91,
+      "tags": ["listening", "follow-ups"],
+    }
+    row.update({"category": "current_events"} if knowledge else {"phase": "core", "domain": "social", "tier": 2})
+    rows.append(row)
+  return rows
+
+
+def _time(fn, repeat: int) -> float:
+  fn()
+  start = time.perf_counter()
+  for _ in range(repeat):
+    fn()
+  return (time.perf_counter() - start) * 1000 / repeat
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--feed-limit", type=int, default=200)
+  parser.add_argument("--lessons", type=int, default=100)
+  parser.add_argument("--repeat", type=int, default=200)
+  args = parser.parse_args()
+
+  endpoints = {
+    "/news/feed": (_feed_page(args.feed_limit), None),
+    "/news/brief": (_brief(), None),
+    "/lessons": (_lessons(args.lessons, knowledge=False), TypeAdapter(list[SkillLessonSummary])),
+    "/knowledge_lessons": (_lessons(args.lessons, knowledge=True), TypeAdapter(list[KnowledgeLessonSummary])),
+  }
+
+  results = {}
+  for path, (payload, adapter) in endpoints.items():
+
+    def _default(payload=payload, adapter=adapter):
+      content = payload
+      if adapter is not None:
+        # FastAPI validates the return value against response_model, then dumps it.
+        content = adapter.dump_python(adapter.validate_python(payload), mode="json")
+      return JSONResponse(jsonable_encoder(content)).body
+
+    default_ms = _time(_default, args.repeat)
+    stdlib_ms = _time(lambda payload=payload: JSONResponse(payload).body, args.repeat)
+    row = {
+      "bytes": len(JSONResponse(payload).body),
+      "default_ms": round(default_ms, 3),
+      "json_response_ms": round(stdlib_ms, 3),
+    }
+    if orjson is not None:
+      fast_ms = _time(lambda payload=payload: FastJSONResponse(payload).body, args.repeat)
+      row["fast_json_ms"] = round(fast_ms, 3)
+      row["speedup_vs_default"] = round(default_ms / fast_ms, 1) if fast_ms > 0 else None
+    results[path] = row
+
+  print(json.dumps({"orjson": orjson is not None, "repeat": args.repeat, "endpoints": results}, indent=2))
+
+
+if __name__ == "__main__":
+  main()
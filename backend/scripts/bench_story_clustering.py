@@ -0,0 +1,94 @@
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+if __package__ in (None, ""):
+  # Run as a file (python scripts/bench_story_clustering.py): make backend/
+  # importable the way `python -m` from backend/ does.
+  sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from news_pipeline import _cluster_input, _story_key
+from story_clustering import StoryIndex
+
+# Compares exact-key clustering with MinHash/LSH near-duplicate clustering on a
+# fixture corpus, indexing the same headline + lead text as the pipeline.
+# Run from backend/: python -m scripts.bench_story_clustering (or run the file
+# directly from anywhere).
+
+_DEFAULT_CORPUS = Path(__file__).resolve().parent / "fixtures" / "story_corpus.json"
+
+
+def _load(path: Path) -> list[dict]:
+  payload = json.loads(path.read_text(encoding="utf-8"))
+  return [a for a in payload.get("articles") or [] if isinstance(a, dict) and a.get("title")]
+
+
+def _score(articles: list[dict], keys: list[str]) -> dict:
+  clusters: dict[tuple[str, str], set[str]] = {}
+  for article, key in zip(articles, keys):
+    clusters.setdefault((article["category"], key), set()).add(article["story"])
+  true_stories = len({(a["category"], a["story"]) for a in articles})
+  return {
+    "clusters": len(clusters),
+    "false_merges": sum(1 for stories in clusters.values() if len(stories) > 1),
+    # Share of possible merges (articles minus true stories) that happened.
+    "merge_recall": round((len(articles) - len(clusters)) / (len(articles) - true_stories), 3)
+    if len(articles) > true_stories
+    else None,
+  }
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--corpus", default=str(_DEFAULT_CORPUS))
+  parser.add_argument("--threshold", type=float, default=0.3)
+  parser.add_argument("--num-perm", type=int, default=128)
+  parser.add_argument("--bands", type=int, default=64)
+  parser.add_argument("--repeat", type=int, default=20)
+  args = parser.parse_args()
+
+  articles = _load(Path(args.corpus))
+  exact_keys = [_story_key(a["title"], a.get("summary")) for a in articles]
+  texts = [_cluster_input(a["title"], a.get("summary")) for a in articles]
+
+  def _run() -> list[str]:
+    index = StoryIndex(threshold=args.threshold, num_perm=args.num_perm, bands=args.bands)
+    return [
+      index.assign(a["category"], k, t, title=a["title"])[0] for a, k, t in zip(articles, exact_keys, texts)
+    ]
+
+  minhash_keys = _run()
+  start = time.perf_counter()
+  for _ in range(args.repeat):
+    _run()
+  elapsed = time.perf_counter() - start
+  assignments = len(articles) * args.repeat
+
+  exact = _score(articles, exact_keys)
+  minhash = _score(articles, minhash_keys)
+  print(
+    json.dumps(
+      {
+        "articles": len(articles),
+        "true_stories": len({(a["category"], a["story"]) for a in articles}),
+        "exact": exact,
+        "minhash": {
+          **minhash,
+          "threshold": args.threshold,
+          "num_perm": args.num_perm,
+          "bands": args.bands,
+          "assignments_per_sec": round(assignments / elapsed, 1) if elapsed > 0 else None,
+          "ms_per_assignment": round(elapsed * 1000 / assignments, 3) if assignments else None,
+        },
+        # Each cluster gets its own LLM card, so fewer clusters means fewer calls.
+        "card_calls_saved": exact["clusters"] - minhash["clusters"],
+      },
+      indent=2,
+    )
+  )
+
+
+if __name__ == "__main__":
+  main()
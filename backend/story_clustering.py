@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import hashlib
+import re
+import struct
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+# Near-duplicate story matching with MinHash signatures and an LSH band index.
+# Articles from different outlets covering the same story rarely share an exact
+# normalized title, and reworded headlines and leads share few word pairs, so
+# similarity is scored on word sets. Word sets alone cannot tell "Fed holds
+# rates" from "Fed raises rates" or "Tesla recalls ..." from "Toyota recalls
+# ...", so two guards veto a match whatever its score: the headlines name
+# different things (entities), or move in different directions (up, down,
+# flat). A false merge hides a story behind another story's card, while a
+# missed merge only costs one extra card.
+
+_STOPWORDS = {
+  "a", "an", "and", "as", "at", "by", "for", "from", "in", "is", "it", "its",
+  "of", "on", "or", "the", "to", "with",
+}
+
+# Sentence-initial capitalization says nothing about these.
+_NOT_ENTITIES = _STOPWORDS | {
+  "after", "new", "this", "that", "these", "those", "why", "what", "how", "who",
+  "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+}
+
+_DIRECTIONS = {
+  "up": "raise raises raised hike hikes hiked rise rises rose top tops topped climb climbs climbed "
+  "gain gains gained jump jumps jumped soar soars soared surge surges surged",
+  "down": "cut cuts lower lowers lowered fall falls fell drop drops dropped slide slides slid "
+  "plunge plunges plunged sink sinks sank",
+  "flat": "hold holds held steady unchanged keep keeps kept pause pauses paused",
+}
+_DIRECTION_OF = {word: direction for direction, words in _DIRECTIONS.items() for word in words.split()}
+
+_TOKEN = re.compile(r"[A-Za-z0-9]+(?:[.,'’-][A-Za-z0-9]+)*")
+
+
+def shingles(text: str, k: int = 1) -> set[str]:
+  # Single words by default: rewording ("cut 6,000 jobs in latest round of
+  # layoffs" / "cuts 6,000 jobs in latest layoffs round") breaks most word
+  # pairs but keeps most words. Word order is left to the guards.
+  tokens = [t for t in re.findall(r"[a-z0-9]+", (text or "").lower()) if t not in _STOPWORDS]
+  if len(tokens) < k:
+    return {" ".join(tokens)} if tokens else set()
+  return {" ".join(tokens[i : i + k]) for i in range(len(tokens) - k + 1)}
+
+
+def _term(token: str) -> str:
+  return re.sub(r"[^a-z0-9]", "", re.sub(r"['’]s$", "", token.lower()))
+
+
+def entity_terms(text: str) -> frozenset[str]:
+  # Numbers and capitalized words: the names, scores and figures that tell
+  # otherwise identically worded stories apart ("Tesla recalls 200,000
+  # vehicles" vs "Toyota recalls 200,000 vehicles").
+  out: set[str] = set()
+  for token in _TOKEN.findall(text or ""):
+    term = _term(token)
+    if any(c.isdigit() for c in token) or (token[0].isupper() and term not in _NOT_ENTITIES):
+      out.add(term)
+  return frozenset(out)
+
+
+def direction_terms(text: str) -> frozenset[str]:
+  return frozenset(_DIRECTION_OF[w] for w in re.findall(r"[a-z]+", (text or "").lower()) if w in _DIRECTION_OF)
+
+
+@dataclass(frozen=True)
+class StoryFacts:
+  # Headline entities and directions, plus every term of the indexed text:
+  # an entity only counts as a difference when the other article's text never
+  # mentions it ("ECB holds ..." vs "European Central Bank holds ..." is the
+  # same story when either lead names both).
+  entities: frozenset[str]
+  directions: frozenset[str]
+  terms: frozenset[str]
+
+
+def story_facts(title: str, text: str | None = None) -> StoryFacts:
+  return StoryFacts(
+    entities=entity_terms(title),
+    directions=direction_terms(title),
+    terms=frozenset(_term(t) for t in _TOKEN.findall(f"{title} {text or ''}")),
+  )
+
+
+def facts_conflict(a: StoryFacts, b: StoryFacts) -> bool:
+  # Each headline names something the other article does not, or both
+  # headlines say which way something moved and they disagree.
+  if (a.entities - b.terms) and (b.entities - a.terms):
+    return True
+  return bool(a.directions) and bool(b.directions) and not (a.directions & b.directions)
+
+
+def _shingle_hashes(shingle: str, num_perm: int) -> tuple[int, ...]:
+  # Each 64-byte blake2b digest yields 16 independent 32-bit hash values; a
+  # different salt per block stands in for a different permutation family.
+  data = shingle.encode("utf-8")
+  values: list[int] = []
+  block = 0
+  while len(values) < num_perm:
+    digest = hashlib.blake2b(data, digest_size=64, salt=block.to_bytes(16, "little")).digest()
+    values.extend(struct.unpack("<16I", digest))
+    block += 1
+  return tuple(values[:num_perm])
+
+
+def minhash_signature(shingle_set: set[str], num_perm: int = 128) -> tuple[int, ...]:
+  if not shingle_set:
+    return tuple([0xFFFFFFFF] * num_perm)
+  return tuple(map(min, zip(*(_shingle_hashes(s, num_perm) for s in shingle_set))))
+
+
+def estimate_jaccard(a: tuple[int, ...], b: tuple[int, ...]) -> float:
+  if not a or len(a) != len(b):
+    return 0.0
+  return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+@dataclass
+class _IndexedStory:
+  category: str
+  key: str
+  signature: tuple[int, ...]
+  facts: StoryFacts
+  seen_at: datetime
+
+
+class StoryIndex:
+  def __init__(
+    self,
+    *,
+    threshold: float = 0.3,
+    num_perm: int = 128,
+    bands: int = 64,
+    window: timedelta = timedelta(hours=48),
+  ):
+    if bands <= 0 or num_perm % bands != 0:
+      raise ValueError("num_perm must be a multiple of bands")
+    self.threshold = threshold
+    self.num_perm = num_perm
+    self.bands = bands
+    self.rows = num_perm // bands
+    self.window = window
+    self._stories: list[_IndexedStory] = []
+    self._buckets: dict[tuple[str, int, tuple[int, ...]], list[_IndexedStory]] = {}
+    self._lock = threading.Lock()
+
+  def __len__(self) -> int:
+    return len(self._stories)
+
+  def _band_keys(self, category: str, signature: tuple[int, ...]) -> list[tuple[str, int, tuple[int, ...]]]:
+    return [(category, b, signature[b * self.rows : (b + 1) * self.rows]) for b in range(self.bands)]
+
+  def _add(self, story: _IndexedStory) -> None:
+    self._stories.append(story)
+    for band_key in self._band_keys(story.category, story.signature):
+      self._buckets.setdefault(band_key, []).append(story)
+
+  def prune(self, now: datetime | None = None) -> None:
+    cutoff = (now or datetime.now(timezone.utc)) - self.window
+    with self._lock:
+      alive = [s for s in self._stories if s.seen_at >= cutoff]
+      if len(alive) == len(self._stories):
+        return
+      self._stories = []
+      self._buckets = {}
+      for story in alive:
+        self._add(story)
+
+  def assign(
+    self, category: str, key: str, text: str, now: datetime | None = None, *, title: str | None = None
+  ) -> tuple[str, float | None]:
+    # Returns the key of the closest indexed story in the same category when it
+    # clears the threshold (and its similarity), otherwise indexes `key`.
+    # `text` is what gets compared (headline plus lead); the guards read the
+    # headline, which defaults to `text`.
+    now = now or datetime.now(timezone.utc)
+    cutoff = now - self.window
+    signature = minhash_signature(shingles(text), self.num_perm)
+    facts = story_facts(title if title is not None else text, text)
+
+    with self._lock:
+      best: _IndexedStory | None = None
+      best_score = 0.0
+      seen: set[int] = set()
+      for band_key in self._band_keys(category, signature):
+        for story in self._buckets.get(band_key) or []:
+          if id(story) in seen or story.seen_at < cutoff:
+            continue
+          seen.add(id(story))
+          if facts_conflict(facts, story.facts):
+            continue
+          score = estimate_jaccard(signature, story.signature)
+          if score > best_score:
+            best, best_score = story, score
+
+      if best is not None and best_score >= self.threshold:
+        # Index this wording too so later variants can match either phrasing.
+        best.seen_at = now
+        self._add(_IndexedStory(category=category, key=best.key, signature=signature, facts=facts, seen_at=now))
+        return best.key, best_score
+
+      self._add(_IndexedStory(category=category, key=key, signature=signature, facts=facts, seen_at=now))
+      return key, None
@@ -1,9 +1,44 @@
 import os
+import threading
+import time
+from collections import OrderedDict
 
-from supabase import Client, ClientOptions, create_client
+import httpx
+import jwt
+from supabase import AsyncClient, AsyncClientOptions, Client, ClientOptions, acreate_client, create_client
 
+# Clients are cached for the life of the process: one admin client, plus an
+# LRU of per-token user clients (SUPABASE_USER_CLIENT_CACHE_SIZE) that expire
+# with the token. Every PostgREST session runs on one shared pooled transport,
+# so connections and TLS sessions are reused across clients and users.
 
-def get_supabase_admin_client() -> Client:
+_lock = threading.Lock()
+_transport: httpx.HTTPTransport | None = None
+_admin_client: Client | None = None
+_user_clients: "OrderedDict[str, tuple[Client, float]]" = OrderedDict()
+_async_transport: httpx.AsyncHTTPTransport | None = None
+_async_admin_client: AsyncClient | None = None
+_async_user_clients: "OrderedDict[str, tuple[AsyncClient, float]]" = OrderedDict()
+
+
+def _env_int(name: str, default: int) -> int:
+  raw = os.getenv(name)
+  if raw is None or raw == "":
+    return default
+  try:
+    return int(raw)
+  except Exception:
+    return default
+
+
+def _pool_limits() -> httpx.Limits:
+  return httpx.Limits(
+    max_connections=max(1, _env_int("SUPABASE_HTTP_MAX_CONNECTIONS", 50)),
+    max_keepalive_connections=max(1, _env_int("SUPABASE_HTTP_MAX_KEEPALIVE_CONNECTIONS", 20)),
+  )
+
+
+def _admin_credentials() -> tuple[str, str]:
   url = os.getenv("SUPABASE_URL")
   key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 
@@ -11,14 +46,10 @@ def get_supabase_admin_client() -> Client:
     raise RuntimeError("Missing SUPABASE_URL")
   if not key:
     raise RuntimeError("Missing SUPABASE_SERVICE_ROLE_KEY")
-
-  try:
-    return create_client(url, key)
-  except Exception as e:
-    raise RuntimeError(f"Failed to init Supabase admin client: {e}")
+  return url, key
 
 
-def get_supabase_user_client(access_token: str) -> Client:
+def _user_credentials(access_token: str) -> tuple[str, str]:
   url = os.getenv("SUPABASE_URL")
   anon_key = os.getenv("SUPABASE_ANON_KEY")
   service_role_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
@@ -38,17 +69,180 @@ def get_supabase_user_client(access_token: str) -> Client:
         "The Python supabase client requires a JWT API key; set SUPABASE_SERVICE_ROLE_KEY or use a legacy anon key."
       )
     api_key = service_role_key
+  return url, api_key
+
+
+def _token_expiry(access_token: str) -> float:
+  # The token was verified by auth before it gets here; exp only bounds how
+  # long its client is kept.
+  ttl = time.time() + max(0, _env_int("SUPABASE_USER_CLIENT_TTL_SECONDS", 3600))
+  try:
+    exp = jwt.decode(access_token, options={"verify_signature": False}).get("exp")
+  except Exception:
+    return ttl
+  return min(ttl, float(exp)) if isinstance(exp, (int, float)) else ttl
+
+
+def _cached_user_client(cache: OrderedDict, access_token: str):
+  entry = cache.get(access_token)
+  if entry is None:
+    return None
+  client, expires_at = entry
+  if expires_at <= time.time():
+    del cache[access_token]
+    return None
+  cache.move_to_end(access_token)
+  return client
+
+
+def _store_user_client(cache: OrderedDict, access_token: str, client) -> None:
+  max_size = _env_int("SUPABASE_USER_CLIENT_CACHE_SIZE", 256)
+  if max_size <= 0:
+    return
+  cache[access_token] = (client, _token_expiry(access_token))
+  cache.move_to_end(access_token)
+  while len(cache) > max_size:
+    cache.popitem(last=False)
+
+
+def _get_transport() -> httpx.HTTPTransport:
+  global _transport
+  if _transport is None:
+    _transport = httpx.HTTPTransport(http2=True, limits=_pool_limits())
+  return _transport
+
 
-  # Note: anon key + user JWT enables RLS enforcement with auth.uid().
+def _share_transport(client: Client) -> Client:
+  # Rebuild the PostgREST session with the same settings on the shared pool.
+  postgrest = client.postgrest
+  session = postgrest.session
+  postgrest.session = type(session)(
+    base_url=session.base_url,
+    headers=session.headers,
+    timeout=session.timeout,
+    follow_redirects=True,
+    transport=_get_transport(),
+  )
+  session.close()
+  return client
+
+
+def get_supabase_admin_client() -> Client:
+  global _admin_client
+  url, key = _admin_credentials()
+  with _lock:
+    if _admin_client is None:
+      try:
+        _admin_client = _share_transport(create_client(url, key))
+      except Exception as e:
+        raise RuntimeError(f"Failed to init Supabase admin client: {e}")
+    return _admin_client
+
+
+def get_supabase_user_client(access_token: str) -> Client:
+  url, api_key = _user_credentials(access_token)
+  with _lock:
+    client = _cached_user_client(_user_clients, access_token)
+    if client is not None:
+      return client
+
+    # Note: anon key + user JWT enables RLS enforcement with auth.uid().
+    try:
+      client = _share_transport(
+        create_client(
+          url,
+          api_key,
+          options=ClientOptions(
+            headers={
+              "Authorization": f"Bearer {access_token}",
+            }
+          ),
+        )
+      )
+    except Exception as e:
+      raise RuntimeError(f"Failed to init Supabase user client: {e}")
+    _store_user_client(_user_clients, access_token, client)
+    return client
+
+
+# Async variants for `async def` endpoints, so PostgREST reads do not hold a
+# worker thread while waiting on the network. Their pool belongs to the app's
+# event loop and is closed from the lifespan.
+
+
+def _get_async_transport() -> httpx.AsyncHTTPTransport:
+  global _async_transport
+  if _async_transport is None:
+    _async_transport = httpx.AsyncHTTPTransport(http2=True, limits=_pool_limits())
+  return _async_transport
+
+
+async def _share_async_transport(client: AsyncClient) -> AsyncClient:
+  postgrest = client.postgrest
+  session = postgrest.session
+  postgrest.session = type(session)(
+    base_url=session.base_url,
+    headers=session.headers,
+    timeout=session.timeout,
+    follow_redirects=True,
+    transport=_get_async_transport(),
+  )
+  await session.aclose()
+  return client
+
+
+async def get_supabase_admin_client_async() -> AsyncClient:
+  global _async_admin_client
+  url, key = _admin_credentials()
+  if _async_admin_client is None:
+    try:
+      client = await _share_async_transport(await acreate_client(url, key))
+    except Exception as e:
+      raise RuntimeError(f"Failed to init Supabase admin client: {e}")
+    # Concurrent first calls can all get here; the first to finish wins and
+    # the others' clients are dropped (their session is the shared pool, so
+    # there is nothing to close).
+    if _async_admin_client is None:
+      _async_admin_client = client
+  return _async_admin_client
+
+
+async def get_supabase_user_client_async(access_token: str) -> AsyncClient:
+  url, api_key = _user_credentials(access_token)
+  client = _cached_user_client(_async_user_clients, access_token)
+  if client is not None:
+    return client
   try:
-    return create_client(
-      url,
-      api_key,
-      options=ClientOptions(
-        headers={
-          "Authorization": f"Bearer {access_token}",
-        }
-      ),
+    client = await _share_async_transport(
+      await acreate_client(
+        url,
+        api_key,
+        options=AsyncClientOptions(
+          headers={
+            "Authorization": f"Bearer {access_token}",
+          }
+        ),
+      )
     )
   except Exception as e:
     raise RuntimeError(f"Failed to init Supabase user client: {e}")
+  _store_user_client(_async_user_clients, access_token, client)
+  return client
+
+
+async def aclose_supabase_clients() -> None:
+  global _transport, _admin_client, _async_transport, _async_admin_client
+  with _lock:
+    transport = _transport
+    _transport = None
+    _admin_client = None
+    _user_clients.clear()
+  if transport is not None:
+    transport.close()
+
+  async_transport = _async_transport
+  _async_transport = None
+  _async_admin_client = None
+  _async_user_clients.clear()
+  if async_transport is not None:
+    await async_transport.aclose()
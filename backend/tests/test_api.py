@@ -0,0 +1,241 @@
+import copy
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import main
+
+
+class _Query:
+  def __init__(self, db, table):
+    self.db, self.table = db, table
+    self.op, self.payload, self.on_conflict = "select", None, None
+    self.columns, self.filters, self.orders, self.n = None, [], [], None
+
+  def select(self, columns="*"):
+    self.columns = None if columns == "*" else [c.strip() for c in columns.split(",")]
+    return self
+
+  def upsert(self, rows, on_conflict=None):
+    self.op, self.payload, self.on_conflict = "upsert", rows, on_conflict
+    return self
+
+  def update(self, payload):
+    self.op, self.payload = "update", payload
+    return self
+
+  def delete(self):
+    self.op = "delete"
+    return self
+
+  def eq(self, col, value):
+    self.filters.append(lambda r: r.get(col) == value)
+    return self
+
+  def lt(self, col, value):
+    self.filters.append(lambda r: r.get(col) is not None and str(r.get(col)) < str(value))
+    return self
+
+  def in_(self, col, values):
+    self.filters.append(lambda r: r.get(col) in values)
+    return self
+
+  def order(self, col, desc=False):
+    self.orders.append((col, desc))
+    return self
+
+  def limit(self, n):
+    self.n = n
+    return self
+
+  def _project(self, row):
+    # Plain columns and PostgREST JSON paths ("alias:col->key" / "->>key").
+    if not self.columns:
+      return copy.deepcopy(row)
+    out = {}
+    for col in self.columns:
+      alias, _, path = col.rpartition(":")
+      source, _, key = path.replace("->>", "->").partition("->")
+      out[alias or source] = copy.deepcopy((row.get(source) or {}).get(key) if key else row.get(source))
+    return out
+
+  def _run(self):
+    self.db.reads += self.op == "select"
+    rows = self.db.tables.setdefault(self.table, [])
+    if self.op == "upsert":
+      keys = [k.strip() for k in (self.on_conflict or "").split(",") if k.strip()]
+      for item in self.payload if isinstance(self.payload, list) else [self.payload]:
+        rows[:] = [r for r in rows if not keys or any(r.get(k) != item.get(k) for k in keys)]
+        rows.append(copy.deepcopy(item))
+      return _Res(copy.deepcopy(self.payload))
+    matched = [r for r in rows if all(f(r) for f in self.filters)]
+    if self.op == "delete":
+      rows[:] = [r for r in rows if r not in matched]
+      return _Res(matched)
+    if self.op == "update":
+      for r in matched:
+        r.update(copy.deepcopy(self.payload))
+      return _Res(copy.deepcopy(matched))
+    for col, desc in reversed(self.orders):
+      matched.sort(key=lambda r: str(r.get(col)), reverse=desc)
+    return _Res([self._project(r) for r in matched[: self.n]])
+
+
+class _Res:
+  def __init__(self, data):
+    self.data, self.error = data, None
+
+
+class _SyncQuery(_Query):
+  def execute(self):
+    return self._run()
+
+
+class _AsyncQuery(_Query):
+  async def execute(self):
+    return self._run()
+
+
+class _Db:
+  def __init__(self):
+    self.tables: dict[str, list] = {}
+    self.reads = 0
+
+
+@pytest.fixture
+def api(monkeypatch):
+  db = _Db()
+
+  class _Sync:
+    def table(self, name):
+      return _SyncQuery(db, name)
+
+  class _Async:
+    def table(self, name):
+      return _AsyncQuery(db, name)
+
+  async def _async_client():
+    return _Async()
+
+  monkeypatch.setattr(main, "get_supabase_admin_client", lambda: _Sync())
+  monkeypatch.setattr(main, "get_supabase_admin_client_async", _async_client)
+  monkeypatch.setenv("ADMIN_API_KEY", "admin")
+  main._feed_cache.clear()
+  return TestClient(main.app), db, _Sync()
+
+
+def _card(i, updated_at):
+  return {
+    "id": f"id{i:02d}",
+    "category": "tech",
+    "published": True,
+    "card": {"title": f"t{i}"},
+    "created_at": updated_at,
+    "updated_at": updated_at,
+  }
+
+
+def test_cleanup_rebuilds_feed_snapshots(api):
+  client, db, sync = api
+  now = datetime.now(timezone.utc)
+  stale = (now - timedelta(days=2)).isoformat()
+  db.tables["news_feed_cards"] = [_card(i, now.isoformat()) for i in range(2)] + [_card(i, stale) for i in range(2, 5)]
+  main.refresh_feed_snapshots(sync, max_per_category=None)
+
+  before = client.get("/news/feed?limit=10").json()["data"]
+  assert len(before) == 5
+
+  res = client.post("/jobs/daily/cleanup", headers={"X-Admin-Key": "admin"}).json()
+  assert res["deleted"]["news_feed_cards"] == 3
+  assert res["feed_snapshots_rebuilt"] is True
+
+  reads = db.reads
+  after = client.get("/news/feed?limit=10").json()["data"]
+  assert [r["id"] for r in after] == ["id01", "id00"]
+  assert db.reads == reads + 1  # served from the rebuilt snapshot
+
+
+def test_cleanup_prunes_card_cache(api, monkeypatch):
+  client, db, _ = api
+  monkeypatch.setenv("NEWS_CARD_CACHE_RETENTION_DAYS", "7")
+  now = datetime.now(timezone.utc)
+  db.tables["news_card_cache"] = [
+    {"cache_key": "old", "card": {}, "created_at": (now - timedelta(days=8)).isoformat()},
+    {"cache_key": "new", "card": {}, "created_at": (now - timedelta(days=1)).isoformat()},
+  ]
+
+  res = client.post("/jobs/daily/cleanup", headers={"X-Admin-Key": "admin"}).json()
+  assert res["deleted"]["news_card_cache"] == 1
+  assert [r["cache_key"] for r in db.tables["news_card_cache"]] == ["new"]
+
+  monkeypatch.setenv("NEWS_CARD_CACHE_RETENTION_DAYS", "0")
+  db.tables["news_card_cache"][0]["created_at"] = (now - timedelta(days=30)).isoformat()
+  res = client.post("/jobs/daily/cleanup", headers={"X-Admin-Key": "admin"}).json()
+  assert res["deleted"]["news_card_cache"] == 0
+
+
+def _get(client, url, if_none_match=None):
+  headers = {"Accept-Encoding": "identity"}
+  if if_none_match is not None:
+    headers["If-None-Match"] = if_none_match
+  return client.get(url, headers=headers)
+
+
+def test_feed_if_none_match_variants(api):
+  client, db, _ = api
+  now = datetime.now(timezone.utc).isoformat()
+  db.tables["news_feed_cards"] = [_card(i, now) for i in range(3)]
+
+  first = _get(client, "/news/feed?limit=5")
+  etag = first.headers["etag"]
+  assert first.status_code == 200 and etag.startswith('"')
+
+  for header in [etag, f"W/{etag}", f'"other", {etag}', "*"]:
+    r = _get(client, "/news/feed?limit=5", header)
+    assert r.status_code == 304, header
+    assert r.content == b""
+    assert r.headers["etag"] == etag
+
+  r = _get(client, "/news/feed?limit=5", '"other"')
+  assert r.status_code == 200
+  assert r.json() == first.json()
+
+
+def test_feed_etag_changes_after_publish(api):
+  client, db, _ = api
+  now = datetime.now(timezone.utc)
+  db.tables["news_feed_cards"] = [_card(i, now.isoformat()) for i in range(3)]
+  etag = _get(client, "/news/feed?limit=5").headers["etag"]
+
+  db.tables["news_feed_cards"][0]["updated_at"] = (now + timedelta(seconds=5)).isoformat()
+  main.bump_publish_generation()
+  r = _get(client, "/news/feed?limit=5", etag)
+  assert r.status_code == 200
+  assert r.headers["etag"] != etag
+
+
+def test_brief_revalidation_follows_the_edition_index(api):
+  client, db, _ = api
+  today = datetime.now(main._app_tz()).date().isoformat()
+  base = {"brief_date": today, "audience": "global"}
+  db.tables["news_daily_brief_editions"] = [
+    {**base, "edition": "morning", "brief": {"overview": "m"}, "updated_at": "2026-10-17T06:00:00+00:00"},
+  ]
+
+  first = _get(client, "/news/brief")
+  etag = first.headers["etag"]
+  assert first.json()["brief"] == {"overview": "m"}
+
+  reads = db.reads
+  r = _get(client, "/news/brief", f'W/{etag}')
+  assert (r.status_code, r.content, r.headers["etag"]) == (304, b"", etag)
+  assert db.reads == reads + 1  # only the edition index
+
+  db.tables["news_daily_brief_editions"].append(
+    {**base, "edition": "midday", "brief": {"overview": "d"}, "updated_at": "2026-10-17T12:00:00+00:00"}
+  )
+  r = _get(client, "/news/brief", etag)
+  assert r.status_code == 200
+  assert r.headers["etag"] != etag
+  assert r.json()["latest_edition"] == "midday"
@@ -0,0 +1,128 @@
+import asyncio
+import time
+
+import httpx
+import jwt
+import pytest
+from fastapi import HTTPException
+
+from backend import auth
+
+_SECRET = "test-secret-at-least-32-bytes-long!!"
+
+
+@pytest.fixture(autouse=True)
+def _env(monkeypatch):
+  monkeypatch.setenv("SUPABASE_URL", "https://proj.supabase.co")
+  monkeypatch.setenv("SUPABASE_ANON_KEY", "anon")
+  monkeypatch.setenv("SUPABASE_JWT_SECRET", _SECRET)
+  monkeypatch.delenv("AUTH_TOKEN_VERIFICATION", raising=False)
+  monkeypatch.delenv("AUTH_REMOTE_FALLBACK", raising=False)
+  auth._token_cache.clear()
+  yield
+  auth._token_cache.clear()
+
+
+def _token(**overrides):
+  claims = {
+    "sub": "user-1",
+    "email": "a@example.com",
+    "aud": "authenticated",
+    "iss": "https://proj.supabase.co/auth/v1",
+    "exp": int(time.time()) + 3600,
+    **overrides,
+  }
+  return jwt.encode(claims, _SECRET, algorithm="HS256")
+
+
+class _FakeHttp:
+  def __init__(self, status_code=200, payload=None):
+    self.calls = 0
+    self._resp = httpx.Response(status_code, json=payload or {"id": "remote-user", "email": None})
+
+  def get(self, url, headers=None):
+    self.calls += 1
+    return self._resp
+
+
+def test_verifies_locally_and_caches(monkeypatch):
+  http = _FakeHttp()
+  monkeypatch.setattr(auth, "_get_sync_http", lambda: http)
+  decodes = []
+  real_local = auth._local_claims
+  monkeypatch.setattr(auth, "_local_claims", lambda t: decodes.append(t) or real_local(t))
+
+  token = _token()
+  user = auth.get_current_user(f"Bearer {token}")
+  assert (user.id, user.email, user.access_token) == ("user-1", "a@example.com", token)
+  assert auth.get_current_user(f"Bearer {token}") is user
+  assert len(decodes) == 1
+  assert http.calls == 0
+
+
+@pytest.mark.parametrize(
+  "overrides",
+  [{"exp": int(time.time()) - 60}, {"aud": "anon"}, {"iss": "https://other.example/auth/v1"}],
+)
+def test_rejects_invalid_claims_without_remote_call(monkeypatch, overrides):
+  http = _FakeHttp()
+  monkeypatch.setattr(auth, "_get_sync_http", lambda: http)
+  with pytest.raises(HTTPException) as exc:
+    auth.get_current_user(f"Bearer {_token(**overrides)}")
+  assert exc.value.status_code == 401
+  assert http.calls == 0
+
+
+def test_bad_signature_is_rejected(monkeypatch):
+  monkeypatch.setattr(auth, "_get_sync_http", lambda: _FakeHttp())
+  forged = jwt.encode(jwt.decode(_token(), options={"verify_signature": False}), "x" * 32, algorithm="HS256")
+  with pytest.raises(HTTPException):
+    auth.get_current_user(f"Bearer {forged}")
+
+
+def test_falls_back_to_remote_without_secret(monkeypatch):
+  monkeypatch.delenv("SUPABASE_JWT_SECRET")
+  http = _FakeHttp()
+  monkeypatch.setattr(auth, "_get_sync_http", lambda: http)
+
+  token = _token()
+  assert auth.get_current_user(f"Bearer {token}").id == "remote-user"
+  assert auth.get_current_user(f"Bearer {token}").id == "remote-user"
+  assert http.calls == 1
+
+  auth._token_cache.clear()
+  monkeypatch.setenv("AUTH_REMOTE_FALLBACK", "0")
+  with pytest.raises(HTTPException):
+    auth.get_current_user(f"Bearer {token}")
+
+
+class _FakeAsyncHttp(_FakeHttp):
+  async def get(self, url, headers=None):
+    return super().get(url, headers=headers)
+
+
+def test_remote_mode_verifies_every_request(monkeypatch):
+  monkeypatch.setenv("AUTH_TOKEN_VERIFICATION", "remote")
+  http, ahttp = _FakeHttp(), _FakeAsyncHttp()
+  monkeypatch.setattr(auth, "_get_sync_http", lambda: http)
+  monkeypatch.setattr(auth, "_get_async_http", lambda: ahttp)
+
+  token = _token()
+  for _ in range(3):
+    assert auth.get_current_user(f"Bearer {token}").id == "remote-user"
+    assert asyncio.run(auth.get_current_user_async(f"Bearer {token}")).id == "remote-user"
+  assert (http.calls, ahttp.calls) == (3, 3)
+  assert auth._token_cache.get(token) is None
+
+  # A locally cached entry from before the switch is not served either.
+  auth._remember(token, auth.AuthenticatedUser(id="cached", email=None, access_token=token), time.time() + 60)
+  assert auth.get_current_user(f"Bearer {token}").id == "remote-user"
+  assert http.calls == 4
+
+
+def test_cache_entry_expires_with_token():
+  user = auth.AuthenticatedUser(id="u", email=None, access_token="t")
+  auth._remember("t", user, time.time() + 0.05)
+  assert auth._token_cache.get("t") is user
+  time.sleep(0.06)
+  assert auth._token_cache.get("t") is None
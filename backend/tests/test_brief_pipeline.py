@@ -1,3 +1,8 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
 from backend import brief_pipeline
 
 
@@ -25,3 +30,257 @@ def test_topic_payload_extracts_compact_items():
   ]
   payload = brief_pipeline._topic_payload(rows)
   assert payload == [{"title": "T", "what_happened": "W", "url": "https://example.com"}]
+
+
+def test_fallback_topic_section_uses_selected_rows():
+  work = brief_pipeline._TopicWork(
+    topic="tech",
+    rows=[{"cluster_id": "c1", "category": "tech", "card": {"title": "T", "sources": [{"url": "https://e"}]}}],
+  )
+  section = brief_pipeline._fallback_topic_section(work, per_topic_limit=5, reason="deadline")
+  assert section["mode"] == "no_llm"
+  assert section["reason"] == "deadline"
+  assert [it["title"] for it in section["items"]] == ["T"]
+
+  empty = brief_pipeline._fallback_topic_section(brief_pipeline._TopicWork(topic="tech"), per_topic_limit=5, reason="deadline")
+  assert empty["items"] == []
+
+
+class _CardsQuery:
+  def __init__(self, rows, calls):
+    self._rows = rows
+    self._calls = calls
+
+  def __getattr__(self, name):
+    def _chain(*args, **kwargs):
+      self._calls.append(name)
+      return self
+
+    return _chain
+
+  def execute(self):
+    class _Resp:
+      data = self._rows
+    return _Resp()
+
+
+def test_select_cards_by_topic_is_one_query(monkeypatch):
+  rows = [
+    {"cluster_id": "c1", "category": "tech", "card": {}},
+    {"cluster_id": "c2", "category": "sports", "card": {}},
+    {"cluster_id": "c3", "category": "tech", "card": {}},
+    {"cluster_id": "c4", "category": "other", "card": {}},
+  ]
+  calls: list = []
+
+  class _Supabase:
+    def table(self, name):
+      assert name == "news_feed_cards"
+      return _CardsQuery(rows, calls)
+
+  monkeypatch.setattr(brief_pipeline, "get_supabase_admin_client", lambda: _Supabase())
+  out = brief_pipeline._select_cards_by_topic(
+    hours=24, topics=["tech", "sports", "science"], max_rows=100, per_topic_limit=5
+  )
+  assert [r["cluster_id"] for r in out["tech"]] == ["c1", "c3"]
+  assert [r["cluster_id"] for r in out["sports"]] == ["c2"]
+  assert out["science"] == []
+  assert "in_" in calls
+
+
+class _FeedCardsQuery:
+  def __init__(self, rows, queries):
+    self._rows, self._queries, self._filters, self._n = rows, queries, [], None
+
+  def select(self, *_):
+    return self
+
+  def eq(self, col, value):
+    self._filters.append(lambda r: r.get(col) == value)
+    return self
+
+  def gte(self, col, value):
+    self._filters.append(lambda r: r.get(col) >= value)
+    return self
+
+  def in_(self, col, values):
+    self._filters.append(lambda r: r.get(col) in values)
+    return self
+
+  def order(self, col, desc=False):
+    self._order = (col, desc)
+    return self
+
+  def limit(self, n):
+    self._n = n
+    return self
+
+  def execute(self):
+    self._queries.append(self._filters)
+    col, desc = self._order
+    rows = sorted((r for r in self._rows if all(f(r) for f in self._filters)), key=lambda r: r[col], reverse=desc)
+    return type("Res", (), {"data": rows[: self._n]})()
+
+
+def test_select_cards_by_topic_requeries_topics_pushed_out_by_the_cap(monkeypatch):
+  now = datetime.now(timezone.utc)
+
+  def _row(i, category, minutes_ago):
+    stamp = (now - timedelta(minutes=minutes_ago)).isoformat()
+    return {"cluster_id": f"{category}{i}", "category": category, "published": True, "card": {}, "updated_at": stamp}
+
+  # Tech fills the 20-row cap with newer cards than anything in science.
+  rows = [_row(i, "tech", i) for i in range(30)] + [_row(i, "science", 60 + i) for i in range(4)]
+  queries: list = []
+
+  class _Supabase:
+    def table(self, name):
+      return _FeedCardsQuery(rows, queries)
+
+  monkeypatch.setattr(brief_pipeline, "get_supabase_admin_client", lambda: _Supabase())
+  out = brief_pipeline._select_cards_by_topic(hours=24, topics=["tech", "science"], max_rows=20, per_topic_limit=5)
+  assert len(out["tech"]) == 20  # filled from the batch query, no re-query
+  assert [r["cluster_id"] for r in out["science"]] == [f"science{i}" for i in range(4)]
+  assert len(queries) == 2
+
+  queries.clear()
+  brief_pipeline._select_cards_by_topic(hours=24, topics=["tech", "science"], max_rows=100, per_topic_limit=5)
+  assert len(queries) == 1  # under the cap: one round trip
+
+
+def test_topic_fingerprint_ignores_order_and_tracks_versions():
+  rows = [{"cluster_id": "c1", "updated_at": "t1"}, {"cluster_id": "c2", "updated_at": "t2"}]
+  fp = brief_pipeline._topic_fingerprint("tech", rows)
+  assert brief_pipeline._topic_fingerprint("tech", list(reversed(rows))) == fp
+  assert brief_pipeline._topic_fingerprint("sports", rows) != fp
+  assert brief_pipeline._topic_fingerprint("tech", [rows[0], {"cluster_id": "c2", "updated_at": "t3"}]) != fp
+
+
+def test_topic_section_reuses_matching_previous_edition(monkeypatch):
+  rows = [{"cluster_id": "c1", "category": "tech", "updated_at": "t1", "card": {"title": "T"}}]
+  previous = {"topic": "tech", "mode": "llm", "overview": "cached", "fingerprint": brief_pipeline._topic_fingerprint("tech", rows)}
+
+  def _no_llm(**_):
+    raise AssertionError("LLM should not be called")
+
+  monkeypatch.setattr(brief_pipeline, "_maybe_llm_topic_brief", _no_llm)
+  work = brief_pipeline._TopicWork(topic="tech", rows=rows, previous=("morning", previous))
+  brief_pipeline._build_topic_section(work, hours=24, per_topic_limit=5)
+  assert work.section["overview"] == "cached"
+  assert work.section["reused_from"] == "morning"
+  assert [it["title"] for it in work.section["items"]] == ["T"]
+
+
+def test_topic_section_past_deadline_skips_the_llm(monkeypatch):
+  rows = [{"cluster_id": "c1", "category": "tech", "updated_at": "t1", "card": {"title": "T"}}]
+
+  def _no_llm(**_):
+    raise AssertionError("LLM should not be called")
+
+  monkeypatch.setattr(brief_pipeline, "_maybe_llm_topic_brief", _no_llm)
+  work = brief_pipeline._TopicWork(topic="tech", rows=rows)
+  brief_pipeline._build_topic_section(work, hours=24, per_topic_limit=5, deadline=time.monotonic() - 1)
+  assert (work.section["mode"], work.section["reason"]) == ("no_llm", "deadline")
+  assert "fingerprint" not in work.section
+  assert [it["title"] for it in work.section["items"]] == ["T"]
+
+
+def test_call_llm_json_stops_provider_fallback_at_deadline(monkeypatch):
+  def _unreachable(**_):
+    raise AssertionError("provider should not be called")
+
+  monkeypatch.setattr(brief_pipeline, "_llm_primary_provider", lambda: "openai")
+  monkeypatch.setattr(brief_pipeline, "_llm_fallback_provider", lambda: "anthropic")
+  monkeypatch.setattr(brief_pipeline, "_call_openai_chat", _unreachable)
+  monkeypatch.setattr(brief_pipeline, "_call_anthropic_messages", _unreachable)
+  parsed, qa = brief_pipeline._call_llm_json(
+    system="s", user={}, temperature=0, max_tokens=10, purpose="topic_brief", deadline=time.monotonic() - 1
+  )
+  assert parsed is None
+  assert (qa["ok"], qa["error"], qa["tried"]) == (False, "deadline", [])
+
+
+def test_earlier_editions_walks_the_edition_order():
+  assert brief_pipeline._earlier_editions("morning") == []
+  assert brief_pipeline._earlier_editions("evening") == ["morning", "midday"]
+  assert brief_pipeline._earlier_editions("late-night") == []
+
+
+class _EditionsQuery:
+  def __init__(self, db, table):
+    self.db, self.table, self.op, self.payload, self.filters, self.columns = db, table, "select", None, [], None
+
+  def select(self, columns):
+    self.columns = [c.strip() for c in columns.split(",")]
+    return self
+
+  def _project(self, row):
+    # Plain columns and PostgREST JSON paths ("alias:col->key" / "->>key").
+    if not self.columns:
+      return dict(row)
+    out = {}
+    for col in self.columns:
+      alias, _, path = col.rpartition(":")
+      source, _, key = path.replace("->>", "->").partition("->")
+      out[alias or source] = (row.get(source) or {}).get(key) if key else row.get(source)
+    return out
+
+  def eq(self, col, value):
+    self.filters.append(lambda r: r.get(col) == value)
+    return self
+
+  def in_(self, col, values):
+    self.filters.append(lambda r: r.get(col) in values)
+    return self
+
+  def limit(self, *_):
+    return self
+
+  def upsert(self, rows, **_):
+    self.op, self.payload = "upsert", rows
+    return self
+
+  def update(self, payload):
+    self.op, self.payload = "update", payload
+    return self
+
+  def execute(self):
+    rows = self.db.setdefault(self.table, [])
+    if self.op == "upsert":
+      for row in self.payload:
+        rows[:] = [r for r in rows if r["edition"] != row["edition"]] + [dict(row)]
+    matched = [r for r in rows if all(f(r) for f in self.filters)]
+    if self.op == "update":
+      for r in matched:
+        r.update(self.payload)
+    return type("Res", (), {"data": [self._project(r) for r in matched]})()
+
+
+@pytest.mark.parametrize("edition, stored", [("late-night", "morning"), ("evening", "evening")])
+def test_run_daily_brief_accepts_any_edition(monkeypatch, edition, stored):
+  db: dict = {"news_daily_brief_editions": [], "news_daily_briefs": []}
+  if stored == "evening":
+    db["news_daily_brief_editions"].append(
+      {
+        "brief_date": brief_pipeline._utc_today_date(),
+        "audience": "global",
+        "edition": "morning",
+        "brief": {"overview": "earlier", "topics": []},
+        "updated_at": "t1",
+      }
+    )
+
+  class _Supabase:
+    def table(self, name):
+      return _EditionsQuery(db, name)
+
+  monkeypatch.setattr(brief_pipeline, "get_supabase_admin_client", lambda: _Supabase())
+  monkeypatch.setattr(brief_pipeline, "_select_cards_by_topic", lambda **kw: {t: [] for t in kw["topics"]})
+  monkeypatch.setattr(brief_pipeline, "_maybe_llm_overview", lambda brief: brief)
+  monkeypatch.setenv("DAILY_BRIEF_TOPICS", "tech")
+  monkeypatch.setenv("DAILY_BRIEF_PRECOMPRESS", "0")
+
+  res = brief_pipeline.run_daily_brief(edition=edition)
+  assert res.edition == stored
+  row = next(r for r in db["news_daily_brief_editions"] if r["edition"] == stored)
+  assert row["brief"]["previous_overviews"] == (["earlier"] if stored == "evening" else [])
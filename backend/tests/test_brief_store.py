@@ -0,0 +1,95 @@
+import base64
+import gzip
+import json
+
+from backend import brief_store
+
+
+def test_legacy_container_shapes():
+  editions, latest = brief_store.legacy_editions(
+    {"editions": {"morning": {"overview": "m"}, "evening": {"overview": "e"}, "bad": None}, "latest_edition": "evening"}
+  )
+  assert editions == {"morning": {"overview": "m"}, "evening": {"overview": "e"}}
+  assert latest == "evening"
+
+  flat = {"overview": "old"}
+  assert brief_store.legacy_editions(flat) == ({"morning": flat}, "morning")
+  assert brief_store.legacy_editions(None) == ({}, None)
+
+
+def test_index_orders_editions_and_picks_latest_write():
+  index = brief_store.edition_index(
+    [
+      {"edition": "evening", "updated_at": "2026-10-17T06:00:00+00:00"},
+      {"edition": "morning", "updated_at": "2026-10-17T12:00:00+00:00"},
+      {"edition": None},
+    ]
+  )
+  assert brief_store.available_editions(index) == ["morning", "evening"]
+  assert brief_store.latest_edition(index) == "morning"
+  assert brief_store.latest_edition({}) is None
+
+
+def test_latest_edition_breaks_ties_by_edition_order():
+  stamp = "2026-10-17T12:00:00+00:00"
+  assert brief_store.latest_edition({"midday": stamp, "morning": stamp}) == "midday"
+
+
+class _Query:
+  def __init__(self, db, op=None, payload=None):
+    self.db, self.op, self.payload, self.eqs = db, op, payload, {}
+
+  def select(self, cols):
+    self.op = "select"
+    return self
+
+  def update(self, payload):
+    return _Query(self.db, "update", payload)
+
+  def eq(self, col, value):
+    self.eqs[col] = value
+    return self
+
+  def in_(self, col, values):
+    self.eqs[col] = lambda v: v in values
+    return self
+
+  def _match(self, row):
+    return all(v(row.get(k)) if callable(v) else row.get(k) == v for k, v in self.eqs.items())
+
+  def execute(self):
+    rows = [r for r in self.db if self._match(r)]
+    if self.op == "update":
+      for r in rows:
+        r.update(self.payload)
+    return type("Res", (), {"data": [dict(r) for r in rows]})()
+
+
+class _Supabase:
+  def __init__(self, rows):
+    self.rows = rows
+
+  def table(self, name):
+    assert name == brief_store.EDITIONS_TABLE
+    return _Query(self.rows)
+
+
+def test_store_encoded_editions_renders_each_edition_against_the_index(monkeypatch):
+  monkeypatch.setattr(brief_store, "supported_encodings", lambda: ("gzip",))
+  base = {"brief_date": "2026-10-17", "audience": "global"}
+  rows = [
+    {**base, "edition": "morning", "brief": {"overview": "m"}, "updated_at": "t1", "body_br": "stale"},
+    {**base, "edition": "midday", "brief": {"overview": "d"}, "updated_at": "t2"},
+  ]
+  encoded = brief_store.store_encoded_editions(_Supabase(rows), brief_date="2026-10-17", audience="global")
+  assert encoded == ["morning", "midday"]
+
+  index = {"morning": "t1", "midday": "t2"}
+  for row in rows:
+    assert row["body_key"] == brief_store.index_key(index)
+    assert row["body_br"] is None
+    payload = json.loads(gzip.decompress(base64.b64decode(row["body_gzip"])))
+    assert payload == brief_store.edition_payload(
+      audience="global", brief_date="2026-10-17", edition=row["edition"], index=index, brief=row["brief"]
+    )
+    assert payload["latest_edition"] == "midday"
@@ -0,0 +1,61 @@
+import json
+import threading
+
+from backend import coach_service
+
+
+def test_json_string_field_stream_decodes_across_chunks():
+  payload = json.dumps({"tip": "x", "reply": 'Say "hi"\nthen ask é 😀', "confidence": 0.5})
+  field = coach_service._JsonStringFieldStream("reply")
+  out = "".join(field.feed(payload[i : i + 3]) for i in range(0, len(payload), 3))
+  assert out == 'Say "hi"\nthen ask é 😀'
+  assert field.done
+
+
+def test_json_string_field_stream_ignores_missing_field():
+  field = coach_service._JsonStringFieldStream("reply")
+  assert field.feed('{"tip": "x"}') == ""
+  assert not field.done
+
+
+def test_stream_message_stores_reply_when_client_disconnects(monkeypatch):
+  stored = []
+  done = threading.Event()
+
+  def _stream(*, result, **kwargs):
+    for part in ["Hi", " there", "!"]:
+      yield part
+    result["reply"] = ("Hi there!", {"ok": True}, "m", "v1")
+
+  def _store(session_id, reply):
+    stored.append((session_id, reply))
+    done.set()
+    return {"content": reply[0]}
+
+  monkeypatch.setattr(coach_service, "_begin_message", lambda *a: ({"mode": "coach"}, {"id": "u1"}, []))
+  monkeypatch.setattr(coach_service, "_stream_coach_reply", _stream)
+  monkeypatch.setattr(coach_service, "_store_coach_message", _store)
+
+  _, events = coach_service.stream_message("user", "token", "s1", "hello")
+  assert next(events) == ("token", {"text": "Hi"})
+  events.close()
+
+  assert done.wait(2)
+  assert stored == [("s1", ("Hi there!", {"ok": True}, "m", "v1"))]
+
+
+def test_stream_message_stores_reply_once_when_consumed(monkeypatch):
+  stored = []
+
+  def _stream(*, result, **kwargs):
+    yield "Hi"
+    result["reply"] = ("Hi", {"ok": True}, "m", "v1")
+
+  monkeypatch.setattr(coach_service, "_begin_message", lambda *a: ({"mode": "coach"}, {"id": "u1"}, []))
+  monkeypatch.setattr(coach_service, "_stream_coach_reply", _stream)
+  monkeypatch.setattr(coach_service, "_store_coach_message", lambda s, r: stored.append(r) or {"content": r[0]})
+
+  _, events = coach_service.stream_message("user", "token", "s1", "hello")
+  assert list(events)[-1] == ("done", {"coach_message": {"content": "Hi"}})
+  events.close()
+  assert len(stored) == 1
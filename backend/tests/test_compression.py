@@ -0,0 +1,64 @@
+import gzip
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from backend import compression
+
+
+def test_acceptable_encodings_honours_q_values():
+  assert compression.acceptable_encodings("gzip, deflate, br", ("br", "gzip")) == ["br", "gzip"]
+  assert compression.acceptable_encodings("br;q=0.5, gzip", ("br", "gzip")) == ["gzip", "br"]
+  assert compression.acceptable_encodings("gzip;q=0, *;q=0.1", ("br", "gzip")) == ["br"]
+  assert compression.acceptable_encodings(None, ("gzip",)) == []
+
+
+def _client():
+  app = FastAPI()
+  app.add_middleware(compression.CompressionMiddleware, minimum_size=100)
+
+  @app.get("/big")
+  def big():
+    return JSONResponse({"text": "brief " * 200}, headers={"ETag": '"abc"'})
+
+  @app.get("/small")
+  def small():
+    return {"ok": True}
+
+  @app.get("/encoded")
+  def encoded():
+    body = gzip.compress(b'{"pre":"' + b"x" * 300 + b'"}')
+    return Response(body, media_type="application/json", headers={"Content-Encoding": "gzip"})
+
+  @app.get("/stream")
+  def stream():
+    return StreamingResponse(iter([b"data: x" * 50, b"data: y" * 50]), media_type="text/event-stream")
+
+  return TestClient(app)
+
+
+def test_large_json_is_compressed_with_weak_etag():
+  r = _client().get("/big", headers={"Accept-Encoding": "gzip"})
+  assert r.headers["content-encoding"] == "gzip"
+  assert r.headers["etag"] == 'W/"abc"'
+  assert r.headers["vary"] == "Accept-Encoding"
+  assert r.json() == {"text": "brief " * 200}
+
+
+def test_identity_clients_still_get_vary():
+  r = _client().get("/big", headers={"Accept-Encoding": "identity"})
+  assert "content-encoding" not in r.headers
+  assert r.headers["etag"] == '"abc"'
+  assert r.headers["vary"] == "Accept-Encoding"
+
+
+def test_small_encoded_and_streamed_responses_pass_through():
+  client = _client()
+  assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+  r = client.get("/encoded", headers={"Accept-Encoding": "gzip"})
+  # Decoded once by the client, so it was not compressed a second time.
+  assert r.json() == {"pre": "x" * 300}
+  r = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+  assert "content-encoding" not in r.headers
+  assert r.text == "data: x" * 50 + "data: y" * 50
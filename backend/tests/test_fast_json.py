@@ -0,0 +1,22 @@
+import json
+
+import pytest
+
+from backend import fast_json
+
+pytestmark = pytest.mark.skipif(fast_json.orjson is None, reason="orjson not installed")
+
+
+def test_fast_response_matches_json_response():
+  payload = {"data": [{"id": "a", "card": {"title": "Zürich — “quotes”", "n": 1.5, "tags": None}}], "next_cursor": None}
+  fast = fast_json.FastJSONResponse(payload)
+  assert json.loads(fast.body) == payload
+  assert fast.body == fast_json.JSONResponse(payload).body
+  assert fast.media_type == "application/json"
+
+
+def test_fast_path_is_opt_in(monkeypatch):
+  monkeypatch.delenv("API_FAST_JSON", raising=False)
+  assert type(fast_json.json_response({})) is fast_json.JSONResponse
+  monkeypatch.setenv("API_FAST_JSON", "1")
+  assert isinstance(fast_json.json_response({}, headers={"ETag": '"x"'}), fast_json.FastJSONResponse)
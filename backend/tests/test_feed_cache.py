@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from backend import feed_cache
+
+
+def _cache(monkeypatch, ttl="60"):
+  monkeypatch.setenv("TEST_FEED_CACHE_TTL", ttl)
+  return feed_cache.ReadThroughCache(ttl_env="TEST_FEED_CACHE_TTL", default_ttl_seconds=60)
+
+
+def test_concurrent_misses_share_one_load(monkeypatch):
+  cache = _cache(monkeypatch)
+  loads = []
+
+  async def _load():
+    loads.append(1)
+    await asyncio.sleep(0.01)
+    return ["row"]
+
+  async def _run():
+    return await asyncio.gather(*(cache.get(("k",), _load) for _ in range(20)))
+
+  results = asyncio.run(_run())
+  assert results == [["row"]] * 20
+  assert len(loads) == 1
+
+  asyncio.run(cache.get(("k",), _load))
+  assert len(loads) == 1
+  assert cache.hits == 1
+
+
+def test_publish_generation_invalidates(monkeypatch):
+  cache = _cache(monkeypatch)
+  values = iter([1, 2])
+
+  async def _load():
+    return next(values)
+
+  assert asyncio.run(cache.get("k", _load)) == 1
+  assert asyncio.run(cache.get("k", _load)) == 1
+  feed_cache.bump_publish_generation()
+  assert asyncio.run(cache.get("k", _load)) == 2
+
+
+def test_failed_load_is_not_cached(monkeypatch):
+  cache = _cache(monkeypatch)
+  calls = []
+
+  async def _load():
+    calls.append(1)
+    if len(calls) == 1:
+      raise RuntimeError("boom")
+    return "ok"
+
+  with pytest.raises(RuntimeError):
+    asyncio.run(cache.get("k", _load))
+  assert asyncio.run(cache.get("k", _load)) == "ok"
+
+
+def test_zero_ttl_disables_cache(monkeypatch):
+  cache = _cache(monkeypatch, ttl="0")
+  calls = []
+
+  async def _load():
+    calls.append(1)
+    return "v"
+
+  asyncio.run(cache.get("k", _load))
+  asyncio.run(cache.get("k", _load))
+  assert len(calls) == 2
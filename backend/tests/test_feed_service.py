@@ -0,0 +1,172 @@
+import asyncio
+import re
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from backend import feed_service
+
+# Minimal evaluator for the PostgREST logic trees feed_service emits.
+_TOKEN = re.compile(r'\s*(and\(|or\(|\)|,|[a-z_]+\.(?:not\.in|eq|lt)\.(?:"(?:[^"\\]|\\.)*"|\((?:"(?:[^"\\]|\\.)*",?)*\)))')
+
+
+def _unquote(v):
+  return re.sub(r"\\(.)", r"\1", v[1:-1])
+
+
+def _parse(tokens, i):
+  items = []
+  while i < len(tokens) and tokens[i] != ")":
+    tok = tokens[i]
+    if tok in {"and(", "or("}:
+      sub, i = _parse(tokens, i + 1)
+      fn = all if tok == "and(" else any
+      items.append(lambda row, sub=sub, fn=fn: fn(p(row) for p in sub))
+    elif tok != ",":
+      col, op, value = re.match(r"([a-z_]+)\.(not\.in|eq|lt)\.(.*)", tok).groups()
+      if op == "not.in":
+        values = {_unquote(v) for v in re.findall(r'"(?:[^"\\]|\\.)*"', value)}
+        items.append(lambda row, col=col, values=values: row[col] not in values)
+      elif op == "eq":
+        items.append(lambda row, col=col, v=_unquote(value): row[col] == v)
+      else:
+        items.append(lambda row, col=col, v=_unquote(value): row[col] < v)
+    i += 1
+  return items, i
+
+
+class _Query:
+  def __init__(self, rows):
+    self.rows = rows
+    self.pred = lambda row: True
+    self.eqs = {}
+    self.ordered = False
+    self.n = None
+
+  def select(self, *_):
+    return self
+
+  def eq(self, col, value):
+    self.eqs[col] = value
+    return self
+
+  def or_(self, filters):
+    items, _ = _parse(_TOKEN.findall(filters), 0)
+    self.pred = lambda row: any(p(row) for p in items)
+    return self
+
+  def order(self, *_, **__):
+    self.ordered = True
+    return self
+
+  def limit(self, n):
+    self.n = n
+    return self
+
+  async def execute(self):
+    rows = [r for r in self.rows if self.pred(r) and all(r.get(k) == v for k, v in self.eqs.items())]
+    if self.ordered:
+      rows.sort(key=lambda r: (r["updated_at"], r["id"]), reverse=True)
+    return type("Res", (), {"data": rows[: self.n], "error": None})()
+
+
+class _Supabase:
+  def __init__(self, rows, snapshots=()):
+    self.tables = {"news_feed_cards": rows, "news_feed_snapshots": list(snapshots)}
+    self.queries = 0
+
+  def table(self, name):
+    self.queries += 1
+    return _Query(self.tables[name])
+
+
+def _rows():
+  cats = ["world", "tech", "tech", "sport", "tech", "world", "tech", "tech", "sport", "tech"] * 3
+  return [
+    {"id": f"id{i:02d}", "category": c, "published": True, "card": {}, "updated_at": f"2026-10-17T06:{59 - i:02d}:00+00:00"}
+    for i, c in enumerate(cats)
+  ]
+
+
+def _pages(supabase, **kwargs):
+  diversified = bool(kwargs.get("diversify") or kwargs.get("max_per_category"))
+  after, out = None, []
+  while True:
+    page = asyncio.run(feed_service.load_news_feed(supabase, after=after, **kwargs))
+    out.append(page["data"])
+    if not page["next_cursor"]:
+      return out
+    after = feed_service.decode_cursor(page["next_cursor"], diversified=diversified)
+
+
+def test_plain_pages_walk_the_feed_once():
+  rows = _rows()
+  pages = _pages(_Supabase(rows), limit=7, diversify=False, max_per_category=None)
+  served = [r["id"] for page in pages for r in page]
+  assert served == [r["id"] for r in rows]
+  assert [len(p) for p in pages] == [7, 7, 7, 7, 2]
+
+
+def test_diversified_pages_serve_each_row_once():
+  rows = _rows()
+  pages = _pages(_Supabase(rows), limit=6, diversify=True, max_per_category=2)
+  served = [r["id"] for page in pages for r in page]
+  assert sorted(served) == sorted(r["id"] for r in rows)
+  assert len(served) == len(set(served))
+  first = [r["category"] for r in pages[0]]
+  assert first == ["world", "tech", "sport", "world", "tech", "sport"]
+
+
+@pytest.mark.parametrize("diversify", [False, True])
+def test_snapshot_first_page_continues_live(diversify):
+  rows = _rows()
+  snapshots = feed_service.build_feed_snapshots(rows[:12], max_per_category=None)
+  built_at = datetime.now(timezone.utc).isoformat()
+  snapshots = [{**s, "has_more": True, "built_at": built_at} for s in snapshots]  # pretend 12 is the window
+  supabase = _Supabase(rows, snapshots)
+
+  first = asyncio.run(feed_service.load_news_feed(supabase, limit=5, diversify=diversify, max_per_category=None))
+  assert supabase.queries == 1
+  assert first["data"] == next(s for s in snapshots if s["key"] == ("diversified" if diversify else "plain"))["rows"][:5]
+
+  served = [r["id"] for r in first["data"]]
+  after = feed_service.decode_cursor(first["next_cursor"], diversified=diversify)
+  while after:
+    page = asyncio.run(
+      feed_service.load_news_feed(supabase, limit=5, diversify=diversify, max_per_category=None, after=after)
+    )
+    served += [r["id"] for r in page["data"]]
+    after = page["next_cursor"] and feed_service.decode_cursor(page["next_cursor"], diversified=diversify)
+  assert sorted(served) == sorted(r["id"] for r in rows)
+  assert len(served) == len(set(served))
+
+
+def test_diversify_rows_round_robins_with_cap():
+  rows = [{"id": i, "category": c} for i, c in enumerate("aaaabbc")]
+  page, order, leftover = feed_service.diversify_rows(rows, limit=10, max_per_category=2)
+  assert [r["category"] for r in page] == ["a", "b", "c", "a", "b"]
+  assert order == ["a", "b", "c"]
+  assert leftover
+
+
+def test_cursor_must_match_mode():
+  page = asyncio.run(
+    feed_service.load_news_feed(_Supabase(_rows()), limit=5, diversify=False, max_per_category=None)
+  )
+  with pytest.raises(ValueError):
+    feed_service.decode_cursor(page["next_cursor"], diversified=True)
+  with pytest.raises(ValueError):
+    feed_service.decode_cursor("not-a-cursor", diversified=False)
+
+
+def test_expired_snapshot_is_not_served(monkeypatch):
+  now = datetime(2026, 10, 17, 12, tzinfo=timezone.utc)
+  snapshot = {"rows": [{"id": "a", "category": "tech"}], "has_more": False}
+  fresh = {**snapshot, "built_at": (now - timedelta(minutes=5)).isoformat()}
+  old = {**snapshot, "built_at": (now - timedelta(hours=7)).isoformat()}
+  assert feed_service.page_from_snapshot(fresh, limit=5, diversified=False, now=now)["data"] == snapshot["rows"]
+  assert feed_service.page_from_snapshot(old, limit=5, diversified=False, now=now) is None
+  assert feed_service.page_from_snapshot(snapshot, limit=5, diversified=False, now=now) is None
+
+  monkeypatch.setenv("NEWS_FEED_SNAPSHOT_MAX_AGE_SECONDS", "0")
+  assert feed_service.page_from_snapshot(old, limit=5, diversified=False, now=now) is not None
@@ -0,0 +1,23 @@
+import pytest
+
+from backend import llm_clients
+
+
+def test_record_then_replay(monkeypatch, tmp_path):
+  monkeypatch.setenv("LLM_RECORDING_PATH", str(tmp_path / "rec.jsonl"))
+  request = {"model": "m", "messages": [{"role": "user", "content": "hi"}]}
+
+  monkeypatch.setenv("LLM_PROVIDER_MODE", "record")
+  assert llm_clients.complete("openai", request, lambda: "hello") == "hello"
+
+  monkeypatch.setenv("LLM_PROVIDER_MODE", "replay")
+  monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+  llm_clients._recordings.clear()  # force a reload from disk
+
+  def _live():
+    raise AssertionError("replay must not call the provider")
+
+  assert llm_clients.provider_api_key("openai") == "replay"
+  assert llm_clients.complete("openai", request, _live) == "hello"
+  with pytest.raises(RuntimeError, match="llm_replay_miss"):
+    llm_clients.complete("openai", {**request, "model": "other"}, _live)
@@ -1,3 +1,5 @@
+from datetime import datetime, timedelta, timezone
+
 from backend import news_pipeline
 
 
@@ -43,3 +45,333 @@ def test_validate_card_requires_sources_and_url():
   ok, issues = news_pipeline._validate_card(card, url=url, category="tech", title="Test")
   assert ok is False
   assert "sources:empty" in issues
+
+
+def test_fetch_order_round_robins_categories():
+  by_cat = {
+    "a": [{"id": "a1"}, {"id": "a2"}, {"id": "a3"}],
+    "b": [{"id": "b1"}],
+    "c": [{"id": "c1"}, {"id": "c2"}],
+  }
+  order = news_pipeline._fetch_order(["a", "b", "c"], by_cat)
+  assert [s["id"] for s in order] == ["a1", "b1", "c1", "a2", "c2", "a3"]
+
+
+def test_conditional_headers_use_stored_validators():
+  src = {"etag": '"abc"', "last_modified": "Mon, 05 Jan 2026 10:00:00 GMT"}
+  assert news_pipeline._conditional_headers(src) == {
+    "If-None-Match": '"abc"',
+    "If-Modified-Since": "Mon, 05 Jan 2026 10:00:00 GMT",
+  }
+  assert news_pipeline._conditional_headers({"etag": None, "last_modified": ""}) == {}
+
+
+def _rss(n: int) -> bytes:
+  items = "".join(
+    f"<item><title>Story {i}</title><link>https://example.com/{i}</link>"
+    f"<description>Summary {i}.</description><pubDate>Mon, 05 Jan 2026 10:00:00 GMT</pubDate></item>"
+    for i in range(n)
+  )
+  return f"<?xml version='1.0'?><rss><channel><title>Feed</title>{items}</channel></rss>".encode()
+
+
+def test_stream_parse_feed_stops_early():
+  body = _rss(5000)
+  chunks = [body[i : i + 512] for i in range(0, len(body), 512)]
+  stream = news_pipeline._BoundedByteStream(chunks, max_bytes=10_000_000)
+  title, entries = news_pipeline._stream_parse_feed(stream, max_entries=20)
+  assert title == "Feed"
+  assert len(entries) == 20
+  assert entries[0] == {
+    "title": "Story 0",
+    "link": "https://example.com/0",
+    "summary": "Summary 0.",
+    "published": "Mon, 05 Jan 2026 10:00:00 GMT",
+  }
+  assert stream.bytes_read < len(body) // 10
+
+
+def test_stream_parse_feed_keeps_entries_from_truncated_body():
+  body = _rss(50)
+  stream = news_pipeline._BoundedByteStream([body], max_bytes=len(body) // 2)
+  _, entries = news_pipeline._stream_parse_feed(stream, max_entries=100)
+  assert stream.truncated is True
+  assert 0 < len(entries) < 50
+
+
+def test_stream_parse_feed_body_of_exactly_max_bytes_is_complete():
+  body = _rss(10)
+  stream = news_pipeline._BoundedByteStream([body[:100], body[100:]], max_bytes=len(body))
+  title, entries = news_pipeline._stream_parse_feed(stream, max_entries=100)
+  assert stream.truncated is False
+  assert title == "Feed"
+  assert len(entries) == 10
+
+
+def test_stream_parse_feed_reparses_malformed_body():
+  body = _rss(10).replace(b"Summary 5.", b"Summary &bogus; 5.")
+  stream = news_pipeline._BoundedByteStream([body], max_bytes=len(body) + 1)
+  _, entries = news_pipeline._stream_parse_feed(stream, max_entries=100)
+  assert stream.truncated is False
+  assert [e["title"] for e in entries] == [f"Story {i}" for i in range(10)]
+
+
+def test_stream_parse_feed_atom():
+  body = (
+    b"<feed xmlns='http://www.w3.org/2005/Atom'><title>Atom</title>"
+    b"<entry><title>A</title><link href='https://example.com/a'/><summary>S</summary>"
+    b"<updated>2026-01-05T10:00:00Z</updated></entry></feed>"
+  )
+  title, entries = news_pipeline._stream_parse_feed(news_pipeline._BoundedByteStream([body], 1_000_000), max_entries=5)
+  assert title == "Atom"
+  assert entries == [{"title": "A", "link": "https://example.com/a", "summary": "S", "published": "2026-01-05T10:00:00Z"}]
+
+
+class _RecordingTable:
+  def __init__(self, calls: list, rows: list):
+    self._calls = calls
+    self._rows = rows
+
+  def upsert(self, payload, **kwargs):
+    self._calls.append(payload)
+    self._rows.extend({"id": f"{p['source_id']}|{p['url']}", **p} for p in payload)
+    return self
+
+  def execute(self):
+    class _Resp:
+      data = list(self._rows)
+    self._rows.clear()
+    return _Resp()
+
+
+class _RecordingSupabase:
+  def __init__(self):
+    self.calls: list = []
+    self._rows: list = []
+
+  def table(self, name):
+    assert name == "news_articles_raw"
+    return _RecordingTable(self.calls, self._rows)
+
+
+def test_upsert_articles_bulk_maps_ids_by_source_and_url():
+  articles = [
+    news_pipeline._PendingArticle(
+      category="tech", source_id=sid, url=url, title="t", summary=None, payload={"source_id": sid, "url": url}
+    )
+    for sid, url in [("s1", "https://a"), ("s2", "https://a"), ("s1", "https://b")]
+  ]
+  supabase = _RecordingSupabase()
+  round_trips = news_pipeline._upsert_articles_bulk(supabase, articles, batch_size=2)
+  assert round_trips == 2
+  assert [len(c) for c in supabase.calls] == [2, 1]
+  assert [a.article_id for a in articles] == ["s1|https://a", "s2|https://a", "s1|https://b"]
+
+
+def test_rate_limiter_spaces_calls(monkeypatch):
+  clock = {"t": 100.0}
+  sleeps: list = []
+
+  def _sleep(s):
+    sleeps.append(s)
+    clock["t"] += s
+
+  monkeypatch.setattr(news_pipeline.time, "monotonic", lambda: clock["t"])
+  monkeypatch.setattr(news_pipeline.time, "sleep", _sleep)
+  limiter = news_pipeline._RateLimiter(120)
+  for _ in range(3):
+    limiter.acquire()
+  assert sleeps == [0.5, 0.5]
+
+
+def test_rate_limiter_disabled():
+  limiter = news_pipeline._RateLimiter(0)
+  limiter.acquire()
+  assert limiter.interval == 0.0
+
+
+def test_card_content_key_covers_inputs_and_model():
+  job = news_pipeline._CardJob(
+    cache_key=("tech", "k"), cluster_id="c1", category="tech", title="T", url="https://a", summary="S"
+  )
+  key = news_pipeline._card_content_key(job, model="m1", prompt_version="v1")
+  other_cluster = news_pipeline._CardJob(
+    cache_key=("tech", "k2"), cluster_id="c2", category="tech", title="T", url="https://a", summary="S"
+  )
+  assert news_pipeline._card_content_key(other_cluster, model="m1", prompt_version="v1") == key
+  assert news_pipeline._card_content_key(job, model="m2", prompt_version="v1") != key
+  assert news_pipeline._card_content_key(job, model="m1", prompt_version="v2") != key
+
+
+class _ClusterQuery:
+  def __init__(self, db, table):
+    self.db, self.table, self.op, self.payload, self.filters = db, table, "select", None, []
+
+  def select(self, *_):
+    return self
+
+  def insert(self, rows):
+    self.op, self.payload = "insert", rows
+    return self
+
+  def update(self, payload):
+    self.op, self.payload = "update", payload
+    return self
+
+  def eq(self, col, value):
+    self.filters.append(lambda r: r.get(col) == value)
+    return self
+
+  def in_(self, col, values):
+    self.filters.append(lambda r: r.get(col) in values)
+    return self
+
+  def upsert(self, rows, **_):
+    self.op, self.payload = "upsert", rows
+    return self
+
+  def execute(self):
+    self.db.calls.append((self.table, self.op))
+    rows = self.db.tables.setdefault(self.table, [])
+    if self.op == "upsert":
+      # Upserts return no rows; with failing_writes nothing is written either.
+      self.db.writes.append((self.table, self.op, self.payload))
+      if not self.db.failing_writes:
+        rows.extend(self.payload if isinstance(self.payload, list) else [self.payload])
+      return type("Res", (), {"data": []})()
+    if self.op == "insert":
+      returned = []
+      for item in self.payload:
+        row = {**item, "id": f"new-{item['normalized_key']}"}
+        rows.append(row)
+        # Rows the insert did not hand back must be found by the re-read.
+        if item["normalized_key"] not in self.db.unreturned:
+          returned.append(dict(row))
+      return type("Res", (), {"data": returned})()
+    matched = [r for r in rows if all(f(r) for f in self.filters)]
+    if self.op == "update":
+      for r in matched:
+        r.update(self.payload)
+    return type("Res", (), {"data": [dict(r) for r in matched]})()
+
+
+class _ClusterSupabase:
+  def __init__(self, clusters=(), cards=(), unreturned=()):
+    self.tables = {"news_story_clusters": list(clusters), "news_feed_cards": list(cards)}
+    self.unreturned = set(unreturned)
+    self.calls: list = []
+    self.writes: list = []
+    self.failing_writes = False
+
+  def table(self, name):
+    return _ClusterQuery(self, name)
+
+
+def test_resolve_clusters_covers_existing_stale_new_and_reread():
+  stale_seen = (datetime.now(timezone.utc) - timedelta(hours=72)).isoformat()
+  fresh_seen = datetime.now(timezone.utc).isoformat()
+  supabase = _ClusterSupabase(
+    clusters=[
+      {"id": "c-a", "category": "tech", "normalized_key": "a", "last_seen_at": fresh_seen, "status": "active"},
+      {"id": "c-b", "category": "tech", "normalized_key": "b", "last_seen_at": stale_seen, "status": "active"},
+    ],
+    cards=[{"cluster_id": "c-a", "updated_at": "t-a"}],
+    unreturned={"d"},
+  )
+  candidates = {("tech", k): f"title {k}" for k in "abcd"}
+  candidates[("sports", "e")] = "title e"
+
+  out = news_pipeline._resolve_clusters(supabase, candidates, stale_hours=48)
+
+  assert out[("tech", "a")] == {"cluster_id": "c-a", "card_updated_at": "t-a"}
+  assert out[("tech", "b")]["cluster_id"] == "new-b"
+  assert {out[k]["cluster_id"] for k in [("tech", "c"), ("tech", "d"), ("sports", "e")]} == {"new-c", "new-d", "new-e"}
+  archived = next(r for r in supabase.tables["news_story_clusters"] if r["id"] == "c-b")
+  assert archived["status"] == "archived" and archived["normalized_key"].startswith("b-archived-")
+
+  # One lookup per category, the stale archive, one bulk insert, one re-read
+  # for the row the insert did not return, and one card lookup.
+  assert supabase.calls == [
+    ("news_story_clusters", "select"),
+    ("news_story_clusters", "update"),
+    ("news_story_clusters", "select"),
+    ("news_story_clusters", "insert"),
+    ("news_story_clusters", "select"),
+    ("news_feed_cards", "select"),
+  ]
+
+
+def test_resolve_clusters_round_trips_do_not_grow_per_key():
+  supabase = _ClusterSupabase()
+  candidates = {("tech", f"k{i}"): f"title {i}" for i in range(150)}
+  out = news_pipeline._resolve_clusters(supabase, candidates, stale_hours=48)
+  assert len(out) == 150
+  # 150 keys: two chunked lookups, one insert, two chunked card lookups.
+  assert [op for _, op in supabase.calls] == ["select", "select", "insert", "select", "select"]
+
+
+def test_encoded_chunks_cap_count_and_encoded_length():
+  urls = [f"https://example.com/{'x' * 50}/{i}?q=a b" for i in range(10)]
+  chunks = news_pipeline._encoded_chunks(urls, size=4, max_chars=200)
+  assert [v for c in chunks for v in c] == urls
+  for chunk in chunks:
+    assert len(chunk) <= 4
+    assert sum(len(news_pipeline.quote(v, safe="")) + 1 for v in chunk) <= 200 or len(chunk) == 1
+  assert news_pipeline._encoded_chunks(["y" * 500], max_chars=200) == [["y" * 500]]
+
+
+def test_upsert_articles_bulk_rereads_in_length_capped_chunks(monkeypatch):
+  urls = [f"https://example.com/{'long-path/' * 100}{i}" for i in range(6)]
+  db = _ClusterSupabase()
+  db.tables["news_articles_raw"] = [{"id": f"id{i}", "source_id": "s1", "url": u} for i, u in enumerate(urls)]
+  articles = [
+    news_pipeline._PendingArticle(category="tech", source_id="s1", url=u, title="t", summary=None, payload={})
+    for u in urls
+  ]
+
+  in_filters = []
+  orig_in = _ClusterQuery.in_
+
+  def _in(self, col, values):
+    in_filters.append(list(values))
+    return orig_in(self, col, values)
+
+  monkeypatch.setattr(_ClusterQuery, "in_", _in)
+  # The upsert hands back no rows, so every id comes from the re-read.
+  news_pipeline._upsert_articles_bulk(db, articles, batch_size=100)
+
+  assert [a.article_id for a in articles] == [f"id{i}" for i in range(6)]
+  assert len(in_filters) > 1
+  for values in in_filters:
+    assert sum(len(news_pipeline.quote(v, safe="")) + 1 for v in values) <= news_pipeline._IN_FILTER_MAX_CHARS
+
+
+def test_category_budget_counts_accepted_entries_not_writes(monkeypatch):
+  # Articles are written in bulk after every feed is consumed, so an entry
+  # whose write fails still uses its slot of the per-category budget.
+  monkeypatch.setenv("NEWS_MAX_ENTRIES_PER_CATEGORY", "3")
+  monkeypatch.setenv("NEWS_CONDITIONAL_GET", "0")
+  sources = [
+    {"id": f"s{i}", "name": f"s{i}", "source_type": "rss", "url": f"https://feed{i}", "category": "tech", "enabled": True}
+    for i in range(2)
+  ]
+  db = _ClusterSupabase()
+  db.tables["news_sources"] = sources
+  db.failing_writes = True
+
+  def _fetches(pool, client, srcs, **kwargs):
+    out = {}
+    for src in srcs:
+      fut = news_pipeline.Future()
+      entries = [{"title": f"{src['id']} story {j}", "link": f"{src['url']}/{j}"} for j in range(2)]
+      fut.set_result(news_pipeline._FeedFetch(source=src, status_code=200, entries=entries))
+      out[str(src["id"])] = fut
+    return out
+
+  monkeypatch.setattr(news_pipeline, "get_supabase_admin_client", lambda: db)
+  monkeypatch.setattr(news_pipeline, "_submit_feed_fetches", _fetches)
+  res = news_pipeline.run_news_pipeline()
+
+  assert res.articles_fetched == 3
+  assert res.articles_upserted == 0
+  assert [len(rows) for table, op, rows in db.writes if table == "news_articles_raw"] == [3]
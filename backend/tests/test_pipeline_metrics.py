@@ -0,0 +1,50 @@
+from backend import pipeline_metrics
+
+
+def test_percentile_nearest_rank():
+  values = [float(v) for v in range(1, 21)]
+  assert pipeline_metrics._percentile(values, 50) == 10.0
+  assert pipeline_metrics._percentile(values, 95) == 19.0
+  assert pipeline_metrics._percentile([], 50) is None
+
+
+class _Query:
+  def __init__(self, log):
+    self._log = log
+
+  def select(self, *_):
+    return _Query(self._log)
+
+  def eq(self, *_):
+    return self
+
+  def execute(self):
+    self._log.append("execute")
+    return "ok"
+
+
+class _Supabase:
+  def __init__(self):
+    self.log: list = []
+
+  def table(self, _name):
+    return _Query(self.log)
+
+
+def test_instrumented_supabase_counts_round_trips_per_stage():
+  metrics = pipeline_metrics.PipelineMetrics()
+  raw = _Supabase()
+  supabase = metrics.instrument(raw)
+
+  supabase.table("t").select("*").execute()  # no active stage: not recorded
+  with metrics.stage("article_upsert"):
+    assert supabase.table("t").select("*").eq("a", 1).execute() == "ok"
+    supabase.table("t").select("*").execute()
+  with metrics.timed("fetch"):
+    pass
+
+  summary = metrics.summary()
+  assert raw.log == ["execute"] * 3
+  assert summary["article_upsert"]["calls"] == 2
+  assert summary["fetch"]["calls"] == 1
+  assert summary["article_upsert"]["wall_ms"] >= summary["article_upsert"]["p50_ms"]
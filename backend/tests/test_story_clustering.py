@@ -0,0 +1,86 @@
+import json
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+
+from backend import news_pipeline, story_clustering
+
+_CORPUS = Path(__file__).resolve().parents[1] / "scripts" / "fixtures" / "story_corpus.json"
+
+
+def test_assign_merges_near_duplicates_within_category():
+  index = story_clustering.StoryIndex()
+  key, score = index.assign("sports", "k1", "Dodgers win World Series in Game 6")
+  assert (key, score) == ("k1", None)
+
+  key, score = index.assign("sports", "k2", "Dodgers win the World Series in Game 6")
+  assert key == "k1"
+  assert score is not None and score >= index.threshold
+
+  key, _ = index.assign("sports", "k3", "Kenyan runner breaks marathon world record in Chicago")
+  assert key == "k3"
+
+  key, _ = index.assign("culture", "k4", "Dodgers win World Series in Game 6")
+  assert key == "k4"
+
+
+@pytest.mark.parametrize(
+  "first, second",
+  [
+    ("Fed holds rates", "Fed raises rates"),
+    (
+      "Fed holds interest rates steady, signals two cuts this year",
+      "Fed raises interest rates, signals two more hikes this year",
+    ),
+    ("Tesla recalls 200,000 vehicles over steering defect", "Toyota recalls 200,000 vehicles over steering defect"),
+    ("Lakers beat Celtics 112-105 behind LeBron James", "Lakers beat Celtics 118-110 in overtime behind LeBron James"),
+  ],
+)
+def test_hard_negatives_stay_separate(first, second):
+  index = story_clustering.StoryIndex()
+  index.assign("news", "k1", first)
+  key, score = index.assign("news", "k2", second)
+  assert (key, score) == ("k2", None)
+
+
+def test_guards_allow_aliases_and_rewording():
+  index = story_clustering.StoryIndex()
+  index.assign(
+    "economics",
+    "k1",
+    "ECB holds interest rates steady as inflation cools The European Central Bank left rates unchanged.",
+    title="ECB holds interest rates steady as inflation cools",
+  )
+  key, _ = index.assign(
+    "economics",
+    "k2",
+    "European Central Bank holds interest rates steady as inflation cools The ECB kept borrowing costs on hold.",
+    title="European Central Bank holds interest rates steady as inflation cools",
+  )
+  assert key == "k1"
+
+
+def test_fixture_corpus_merges_duplicates_without_false_merges():
+  # Indexed exactly like the pipeline: headline plus the lead's first sentence.
+  articles = json.loads(_CORPUS.read_text(encoding="utf-8"))["articles"]
+  index = story_clustering.StoryIndex()
+  stories: dict[tuple[str, str], set[str]] = {}
+  for i, a in enumerate(articles):
+    text = news_pipeline._cluster_input(a["title"], a.get("summary"))
+    key, _ = index.assign(a["category"], f"k{i}", text, title=a["title"])
+    stories.setdefault((a["category"], key), set()).add(a["story"])
+
+  assert all(len(s) == 1 for s in stories.values())
+  true_stories = len({(a["category"], a["story"]) for a in articles})
+  assert len(stories) <= true_stories + 2  # out of len(articles) == 60 exact keys
+
+
+def test_prune_drops_stories_outside_window():
+  now = datetime(2026, 1, 5, tzinfo=timezone.utc)
+  index = story_clustering.StoryIndex(window=timedelta(hours=24))
+  index.assign("tech", "k1", "Apple unveils iPhone 17 with thinner design", now=now - timedelta(hours=30))
+  index.prune(now)
+  assert len(index) == 0
+  key, _ = index.assign("tech", "k2", "Apple unveils iPhone 17 with a thinner design", now=now)
+  assert key == "k2"
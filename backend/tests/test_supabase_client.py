@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+import jwt
+import pytest
+
+from backend import supabase_client
+
+_KEY = jwt.encode({"role": "service_role"}, "k" * 32, algorithm="HS256")
+
+
+@pytest.fixture(autouse=True)
+def _env(monkeypatch):
+  monkeypatch.setenv("SUPABASE_URL", "https://proj.supabase.co")
+  monkeypatch.setenv("SUPABASE_ANON_KEY", _KEY)
+  monkeypatch.setenv("SUPABASE_SERVICE_ROLE_KEY", _KEY)
+  asyncio.run(supabase_client.aclose_supabase_clients())
+  yield
+  asyncio.run(supabase_client.aclose_supabase_clients())
+
+
+def _token(sub, exp_in=3600):
+  return jwt.encode({"sub": sub, "exp": int(time.time()) + exp_in}, "s" * 32, algorithm="HS256")
+
+
+def test_admin_client_is_shared():
+  a = supabase_client.get_supabase_admin_client()
+  assert supabase_client.get_supabase_admin_client() is a
+  assert a.postgrest.session._transport is supabase_client._transport
+
+
+def test_user_clients_cached_per_token_on_one_transport(monkeypatch):
+  monkeypatch.setenv("SUPABASE_USER_CLIENT_CACHE_SIZE", "2")
+  t1, t2, t3 = _token("a"), _token("b"), _token("c")
+  c1 = supabase_client.get_supabase_user_client(t1)
+  assert supabase_client.get_supabase_user_client(t1) is c1
+  assert c1.postgrest.session.headers["Authorization"] == f"Bearer {t1}"
+
+  c2 = supabase_client.get_supabase_user_client(t2)
+  assert c2 is not c1
+  assert c1.postgrest.session._transport is c2.postgrest.session._transport
+
+  supabase_client.get_supabase_user_client(t3)  # evicts t1, the least recently used
+  assert list(supabase_client._user_clients) == [t2, t3]
+
+
+def test_user_client_expires_with_token():
+  token = _token("a", exp_in=-1)
+  c1 = supabase_client.get_supabase_user_client(token)
+  assert supabase_client.get_supabase_user_client(token) is not c1
+
+
+def test_async_admin_client_is_shared_across_concurrent_first_calls(monkeypatch):
+  real_create = supabase_client.acreate_client
+  created = []
+
+  async def _slow_create(*args, **kwargs):
+    await asyncio.sleep(0.01)  # both callers are past the None check by now
+    client = await real_create(*args, **kwargs)
+    created.append(client)
+    return client
+
+  monkeypatch.setattr(supabase_client, "acreate_client", _slow_create)
+
+  async def _run():
+    a, b = await asyncio.gather(
+      supabase_client.get_supabase_admin_client_async(), supabase_client.get_supabase_admin_client_async()
+    )
+    return a, b, await supabase_client.get_supabase_admin_client_async()
+
+  a, b, c = asyncio.run(_run())
+  assert len(created) == 2
+  assert a is b is c is created[0]
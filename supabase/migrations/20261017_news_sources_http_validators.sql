@@ -0,0 +1,3 @@
+-- HTTP cache validators for conditional feed polling (If-None-Match / If-Modified-Since).
+alter table public.news_sources add column if not exists etag text;
+alter table public.news_sources add column if not exists last_modified text;
@@ -0,0 +1,10 @@
+-- Content-addressed cache of LLM-generated news cards, keyed by a hash of the
+-- card inputs (category, title, summary, url, model, prompt_version).
+create table if not exists public.news_card_cache (
+  cache_key text primary key,
+  card jsonb not null,
+  qa jsonb,
+  model text,
+  prompt_version text,
+  created_at timestamptz not null default now()
+);
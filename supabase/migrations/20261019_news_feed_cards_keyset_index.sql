@@ -0,0 +1,4 @@
+-- Keyset pagination for /news/feed orders published cards by (updated_at, id).
+create index if not exists news_feed_cards_published_keyset_idx
+  on public.news_feed_cards (updated_at desc, id desc)
+  where published;
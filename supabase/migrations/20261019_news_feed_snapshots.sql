@@ -0,0 +1,9 @@
+-- Ranked /news/feed snapshots written by the news pipeline after each publish
+-- ('plain' and 'diversified'); the API slices a first page from one row.
+create table if not exists public.news_feed_snapshots (
+  key text primary key,
+  rows jsonb not null,
+  max_per_category integer,
+  has_more boolean not null default false,
+  built_at timestamptz not null default now()
+);
@@ -0,0 +1,11 @@
+-- One row per daily brief edition, so an edition is read and written on its
+-- own instead of through the news_daily_briefs container holding every edition.
+create table if not exists public.news_daily_brief_editions (
+  brief_date date not null,
+  audience text not null,
+  edition text not null,
+  brief jsonb not null,
+  created_at timestamptz not null default now(),
+  updated_at timestamptz not null default now(),
+  primary key (brief_date, audience, edition)
+);
@@ -0,0 +1,8 @@
+-- Precompressed /news/brief bodies per edition, written by the brief job after
+-- each run. body_gzip / body_br hold base64-encoded bytes; body_key is the key
+-- of the edition index the body was rendered against, so the API can tell when
+-- a later edition has made it stale.
+alter table public.news_daily_brief_editions
+  add column if not exists body_key text,
+  add column if not exists body_gzip text,
+  add column if not exists body_br text;
@@ -0,0 +1,4 @@
+-- /jobs/daily/cleanup prunes news_card_cache rows older than
+-- NEWS_CARD_CACHE_RETENTION_DAYS by created_at.
+create index if not exists news_card_cache_created_at_idx
+  on public.news_card_cache (created_at);